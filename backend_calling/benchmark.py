@@ -0,0 +1,412 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import logging
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import workbook_cache
+from generate_jsons import process_single_response
+from http_client import HttpClient
+from job_registry import JobRegistry, response_job_names
+from output_writer import write_json
+from requesting_api import HoursWorked, JobPriority, NonSourceJobs, ScenarioParamFactory
+from results_format import wrap_results
+from shards import DEFAULT_GROUP_BY, write_sharded_results
+from stub_server import OptimizeStub, query_key, start_server, synthetic_response
+from sweep import DEFAULT_MAX_WORKERS, Combination, build_combinations
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPEAT = 5
+DEFAULT_TOLERANCE = 0.1
+# Distinct synthetic responses per size; scenarios cycle through them
+FIXTURE_RESPONSES = 4
+# Requests sent in the HTTP stage, one productivity rate's worth of scenarios
+HTTP_REQUESTS = 96
+
+
+class Size(NamedTuple):
+    """Dimensions of a benchmark fixture."""
+    name: str
+    jobs: int
+    productivity_rates: int
+
+
+SIZES = {
+    "realistic": Size("realistic", 112, 3),
+    "large": Size("large", 448, 12),
+}
+
+
+class Fixture(NamedTuple):
+    """Synthetic inputs for the benchmark stages at one size."""
+    size: Size
+    combinations: List[Combination]
+    responses: List[Dict[str, Any]]
+
+
+class StageResult(NamedTuple):
+    """Measurements of one stage at one size."""
+    stage: str
+    size: str
+    seconds: float
+    items: int
+    peak_bytes: int
+
+    @property
+    def throughput(self) -> float:
+        """Return the number of items processed per second."""
+        return self.items / self.seconds if self.seconds > 0 else float("inf")
+
+
+def build_fixture(size: Size) -> Fixture:
+    """
+    Build the scenario grid and synthetic responses for a size.
+
+    Args:
+        size: Dimensions of the fixture
+
+    Returns:
+        Fixture with the scenario grid and FIXTURE_RESPONSES responses
+    """
+    job_names = [f"Job {i:04d}" for i in range(size.jobs)]
+    combinations = build_combinations(
+        [0.5 * (i + 1) for i in range(size.productivity_rates)],
+        [True, False],
+        list(HoursWorked),
+        list(JobPriority),
+        list(NonSourceJobs)
+    )
+    responses = [
+        synthetic_response(job_names, f"{size.name}-{i}")
+        for i in range(FIXTURE_RESPONSES)
+    ]
+    return Fixture(size, combinations, responses)
+
+
+@contextmanager
+def _snapshot_at(path: Path) -> Iterator[None]:
+    """Point the workbook cache at another snapshot file, starting cold."""
+    original = workbook_cache.SNAPSHOT_PATH
+    workbook_cache.SNAPSHOT_PATH = path
+    workbook_cache.clear_cache()
+    try:
+        yield
+    finally:
+        workbook_cache.SNAPSHOT_PATH = original
+        workbook_cache.clear_cache()
+
+
+# A stage returns a function running it once and the number of items it handles
+Stage = Callable[[Fixture, ExitStack], Tuple[Callable[[], Any], int]]
+
+
+def stage_workbook_parse(fixture: Fixture, stack: ExitStack) -> Tuple[Callable[[], Any], int]:
+    """Parse every input sheet from Excel, as on a run without a snapshot."""
+    snapshot = Path(stack.enter_context(tempfile.TemporaryDirectory())) / "snapshot.json"
+    stack.enter_context(_snapshot_at(snapshot))
+
+    def run() -> None:
+        workbook_cache.clear_cache()
+        if snapshot.exists():
+            snapshot.unlink()
+        workbook_cache.compile_snapshot()
+
+    return run, len(workbook_cache.SNAPSHOT_SHEETS)
+
+
+def stage_workbook_snapshot(fixture: Fixture, stack: ExitStack) -> Tuple[Callable[[], Any], int]:
+    """Load every input sheet from a compiled snapshot."""
+    snapshot = Path(stack.enter_context(tempfile.TemporaryDirectory())) / "snapshot.json"
+    stack.enter_context(_snapshot_at(snapshot))
+    workbook_cache.compile_snapshot()
+
+    def run() -> None:
+        workbook_cache.clear_cache()
+        workbook_cache.compile_snapshot()
+
+    return run, len(workbook_cache.SNAPSHOT_SHEETS)
+
+
+def stage_params(fixture: Fixture, stack: ExitStack) -> Tuple[Callable[[], Any], int]:
+    """Build the query string of every scenario with a new parameter factory."""
+    workbook_cache.compile_snapshot()
+
+    def run() -> None:
+        factory = ScenarioParamFactory()
+        for c in fixture.combinations:
+            factory.build_query(c.steering, c.productivity, c.hours, c.priority, c.non_source)
+
+    return run, len(fixture.combinations)
+
+
+def stage_http(fixture: Fixture, stack: ExitStack) -> Tuple[Callable[[], Any], int]:
+    """Fetch and decode responses from an in-process stub without latency."""
+    queries = [f"scenario={i}" for i in range(HTTP_REQUESTS)]
+    responses = fixture.responses
+    stub = OptimizeStub(recorded={
+        query_key(query): responses[i % len(responses)] for i, query in enumerate(queries)
+    })
+    server, url = start_server(stub)
+    stack.callback(server.server_close)
+    stack.callback(server.shutdown)
+    client = HttpClient(pool_size=DEFAULT_MAX_WORKERS)
+    stack.callback(client.close)
+
+    for query in queries:
+        # Encode every response up front, so the stage measures transfer
+        stub.respond(query)
+
+    def run() -> None:
+        with ThreadPoolExecutor(max_workers=DEFAULT_MAX_WORKERS) as executor:
+            list(executor.map(lambda query: client.get(url, params=query).json(), queries))
+
+    return run, len(queries)
+
+
+def stage_process(fixture: Fixture, stack: ExitStack) -> Tuple[Callable[[], Any], int]:
+    """Process one response per scenario into the columnar format."""
+    id_lookup, total_id = _job_ids(fixture.responses[0])
+
+    def run() -> None:
+        for i in range(len(fixture.combinations)):
+            process_single_response(
+                fixture.responses[i % len(fixture.responses)], id_lookup, total_id
+            )
+
+    return run, len(fixture.combinations)
+
+
+def stage_job_lookups(fixture: Fixture, stack: ExitStack) -> Tuple[Callable[[], Any], int]:
+    """Register the jobs of a response with a new job registry."""
+    response = fixture.responses[0]
+    return lambda: JobRegistry().register(response_job_names(response)), 1
+
+
+def stage_write(fixture: Fixture, stack: ExitStack) -> Tuple[Callable[[], Any], int]:
+    """Write the model results as plain and gzip JSON."""
+    output_dir = Path(stack.enter_context(tempfile.TemporaryDirectory()))
+    scenarios = _scenarios(fixture)
+    return (
+        lambda: write_json(output_dir / "model-results.json", wrap_results(scenarios), depth=2),
+        len(scenarios)
+    )
+
+
+def stage_shards(fixture: Fixture, stack: ExitStack) -> Tuple[Callable[[], Any], int]:
+    """Write the scenario shards and their manifest."""
+    output_dir = Path(stack.enter_context(tempfile.TemporaryDirectory()))
+    scenarios = _scenarios(fixture)
+    return lambda: write_sharded_results(output_dir, scenarios, DEFAULT_GROUP_BY), len(scenarios)
+
+
+def _job_ids(response: Dict[str, Any]) -> Tuple[Dict[str, int], int]:
+    """Return the job IDs of a new registry holding the jobs of a response, and the total's ID."""
+    registry = JobRegistry()
+    registry.register(response_job_names(response))
+    return registry.id_lookup, registry.total_id
+
+
+def _scenarios(fixture: Fixture) -> Dict[str, Dict[str, Any]]:
+    """Return columnar results for every scenario of a fixture."""
+    id_lookup, total_id = _job_ids(fixture.responses[0])
+    processed = [
+        process_single_response(response, id_lookup, total_id)
+        for response in fixture.responses
+    ]
+    return {
+        c.key: processed[i % len(processed)]
+        for i, c in enumerate(fixture.combinations)
+    }
+
+
+# Stages in pipeline order; workbook stages read the real inputs, so they
+# only run at the realistic size
+STAGES: Dict[str, Stage] = {
+    "workbook_parse": stage_workbook_parse,
+    "workbook_snapshot": stage_workbook_snapshot,
+    "params": stage_params,
+    "http": stage_http,
+    "process": stage_process,
+    "job_lookups": stage_job_lookups,
+    "write": stage_write,
+    "shards": stage_shards,
+}
+INPUT_STAGES = ("workbook_parse", "workbook_snapshot", "params")
+
+
+def measure(
+    stage: str,
+    fixture: Fixture,
+    repeat: int = DEFAULT_REPEAT
+) -> StageResult:
+    """
+    Time a stage and measure its peak memory.
+
+    The wall time is the median of the timed runs. Peak memory is taken
+    from one extra run under tracemalloc, which would distort the timings.
+
+    Args:
+        stage: Name of the stage in STAGES
+        fixture: Inputs for the stage
+        repeat: Number of timed runs
+
+    Returns:
+        Measurements of the stage
+    """
+    with ExitStack() as stack:
+        run, items = STAGES[stage](fixture, stack)
+        run()  # Warm up
+
+        times = []
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return StageResult(stage, fixture.size.name, statistics.median(times), items, peak)
+
+
+def load_results(path: Path) -> Dict[Tuple[str, str], StageResult]:
+    """Load saved results, keyed by stage and size."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return {
+        (r["stage"], r["size"]): StageResult(
+            r["stage"], r["size"], r["seconds"], r["items"], r["peak_bytes"]
+        )
+        for r in data["results"]
+    }
+
+
+def save_results(path: Path, results: List[StageResult]) -> None:
+    """Save results with a description of the machine they were measured on."""
+    data = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [r._asdict() for r in results]
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+
+def format_results(
+    results: List[StageResult],
+    baseline: Optional[Dict[Tuple[str, str], StageResult]] = None
+) -> str:
+    """Return the results as a table, with the change against a baseline."""
+    header = f"{'stage':<18} {'size':<10} {'wall (s)':>10} {'items/s':>12} {'peak (MB)':>10}"
+    if baseline is not None:
+        header += f" {'vs baseline':>12}"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        line = (
+            f"{r.stage:<18} {r.size:<10} {r.seconds:>10.4f} "
+            f"{r.throughput:>12.1f} {r.peak_bytes / 1e6:>10.1f}"
+        )
+        if baseline is not None:
+            before = baseline.get((r.stage, r.size))
+            change = f"{r.seconds / before.seconds - 1:+.1%}" if before else "new"
+            line += f" {change:>12}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the stages of the data pipeline on synthetic fixtures."
+    )
+    parser.add_argument(
+        "--sizes",
+        default="realistic",
+        help=f"Comma separated fixture sizes, from {', '.join(SIZES)}"
+    )
+    parser.add_argument(
+        "--stages",
+        default=",".join(STAGES),
+        help="Comma separated stages to run, in pipeline order by default"
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=DEFAULT_REPEAT,
+        help="Number of timed runs per stage"
+    )
+    parser.add_argument("--save", type=Path, help="Save the results as a baseline")
+    parser.add_argument("--compare", type=Path, help="Baseline to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="Fraction a stage may be slower than the baseline before failing"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(
+        level=logging.WARNING,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        force=True
+    )
+
+    sizes = [SIZES[name.strip()] for name in args.sizes.split(",")]
+    stages = [name.strip() for name in args.stages.split(",")]
+    unknown = [name for name in stages if name not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stages {unknown}, expected any of {list(STAGES)}")
+
+    results = []
+    for size in sizes:
+        fixture = build_fixture(size)
+        for stage in stages:
+            if stage in INPUT_STAGES and size.name != "realistic":
+                continue
+            results.append(measure(stage, fixture, args.repeat))
+            print(format_results(results[-1:]).splitlines()[-1], file=sys.stderr)
+
+    baseline = load_results(args.compare) if args.compare else None
+    print(format_results(results, baseline))
+
+    if args.save:
+        save_results(args.save, results)
+
+    if baseline is not None:
+        regressions = [
+            r for r in results
+            if (r.stage, r.size) in baseline
+            and r.seconds > baseline[(r.stage, r.size)].seconds * (1 + args.tolerance)
+        ]
+        if regressions:
+            print(
+                f"{len(regressions)} stages slower than the baseline by more than "
+                f"{args.tolerance:.0%}: {', '.join(f'{r.stage}/{r.size}' for r in regressions)}"
+            )
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional
+
+import numpy as np
+
+from output_writer import write_json
+from results_format import METRICS
+from scenario_aggregates import to_json_lists
+
+logger = logging.getLogger(__name__)
+
+SERIES_VERSION = 1
+SERIES_DIR = "charts"
+# Bars in the shortage bar chart
+SHORTAGE_BARS = 10
+# Values below this magnitude are drawn as zero, as in the frontend
+SMALL_VALUE = 20
+
+# Steps of the three waterfall charts, in drawing order
+WATERFALL_STEPS = {
+    "supply": ("labor_supply", "net_labor_change"),
+    "demand": ("productivity", "expansion_demand", "reduction_demand", "vacancies", "labor_supply"),
+    "gap": ("total_supply", "superfluous_workers", "transitions_in", "shortage", "total_demand"),
+}
+
+
+def _round(values: np.ndarray) -> np.ndarray:
+    """Round like Math.round and draw small values as zero, as the frontend does."""
+    rounded = np.floor(values + 0.5)
+    return np.where(np.abs(rounded) < SMALL_VALUE, 0, rounded)
+
+
+def display_label(label: str) -> str:
+    """Return a job label as drawn in the charts, keeping its line breaks."""
+    return label.replace("\\-", "-")
+
+
+def waterfall_series(workforce_changes: Any) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Compute the bars of the three waterfall charts for every job at once.
+
+    Reproduces getSupplyData, getDemandData and getGapData with
+    processLeftData and processRightData of the frontend: supply bars are
+    stacked left to right, demand bars right to left, and the gap bars have
+    fixed bases.
+
+    Args:
+        workforce_changes: Columnar workforceChanges, one array per metric
+            in METRICS order, indexed by job ID
+
+    Returns:
+        Per chart, (step, job) arrays of bar values and bar bases, NaN for
+        jobs without workforce changes
+    """
+    columns = np.array(workforce_changes, dtype=float)
+    metric = {name: columns[i] for i, name in enumerate(METRICS)}
+
+    supply = _round(np.stack([metric[name] for name in WATERFALL_STEPS["supply"]]))
+    supply_base = np.cumsum(supply, axis=0) - supply
+
+    demand = _round(np.stack([metric[name] for name in WATERFALL_STEPS["demand"]]))
+    demand_base = np.cumsum(demand[::-1], axis=0)[::-1] - demand
+
+    total_supply = metric["labor_supply"] + metric["net_labor_change"]
+    total_demand = (
+        metric["labor_supply"] + metric["vacancies"] + metric["expansion_demand"]
+        + metric["reduction_demand"] + metric["productivity"]
+    )
+    superfluous = metric["superfluous_workers"] - metric["transitions_out"]
+    gap = _round(np.stack([
+        total_supply,
+        -np.floor(superfluous + 0.5),
+        metric["transitions_in"],
+        metric["shortage"],
+        total_demand,
+    ]))
+    zero = np.where(np.isnan(total_supply), np.nan, 0)
+    gap_base = np.stack([
+        zero,
+        np.floor(total_supply + 0.5),
+        total_supply - superfluous,
+        total_supply - superfluous + metric["transitions_in"],
+        zero,
+    ])
+
+    return {
+        "supply": {"value": supply, "base": supply_base},
+        "demand": {"value": demand, "base": demand_base},
+        "gap": {"value": gap, "base": gap_base},
+    }
+
+
+def chart_series(result: Mapping[str, Any], job_lookup: Mapping[int, str]) -> Dict[str, Any]:
+    """
+    Build the chart-ready series of a scenario.
+
+    Waterfall arrays are per step, in WATERFALL_STEPS order, indexed by job
+    ID, like columnar workforceChanges. Per job, "max" is the highest bar
+    top of the three charts and "min" the lowest bar bottom, as
+    calculateWaterfallMinimum computes it, which set the axis domain. Both
+    are null for jobs without workforce changes. The shortage bars are
+    the jobs with the largest remaining shortage, largest first, with their
+    display labels.
+
+    Args:
+        result: Full (not delta) scenario result in columnar format
+        job_lookup: Job labels by job ID, including the total
+
+    Returns:
+        Chart series of the scenario
+    """
+    charts = waterfall_series(result["workforceChanges"])
+    tops = np.concatenate([chart["base"] + chart["value"] for chart in charts.values()])
+    present = ~np.isnan(tops[0])
+    top = np.full(tops.shape[1], np.nan)
+    top[present] = tops[:, present].max(axis=0)
+    # Negative bars extend below their base
+    bottoms = np.concatenate([
+        np.where(chart["value"] >= 0, chart["base"], chart["base"] + chart["value"])
+        for chart in charts.values()
+    ])
+    bottom = np.full(bottoms.shape[1], np.nan)
+    bottom[present] = bottoms[:, present].min(axis=0)
+
+    shortages = result["remainingShortages"]
+    # Stable sort, so equal shortages keep their order as in Array.prototype.sort
+    order = sorted(
+        range(len(shortages["jobId"])),
+        key=lambda i: -shortages["shortage"][i]
+    )[:SHORTAGE_BARS]
+    bars = [shortages["jobId"][i] for i in order]
+
+    return {
+        "version": SERIES_VERSION,
+        "steps": {name: list(steps) for name, steps in WATERFALL_STEPS.items()},
+        "waterfall": {
+            name: {part: to_json_lists(values) for part, values in chart.items()}
+            for name, chart in charts.items()
+        },
+        "max": to_json_lists(top),
+        "min": to_json_lists(bottom),
+        "shortageBars": {
+            "jobId": bars,
+            "label": [display_label(job_lookup[job_id]) for job_id in bars],
+            "shortage": [shortages["shortage"][i] for i in order]
+        }
+    }
+
+
+def write_chart_series(
+    output_dir: Path,
+    results: Mapping[str, Dict[str, Any]],
+    job_lookup: Mapping[int, str],
+    indent: Optional[int] = None
+) -> int:
+    """
+    Write the chart series of every scenario, plain and compressed.
+
+    Each scenario gets a file named after its settings key in SERIES_DIR,
+    so a client loads only the scenario on screen. Files of scenarios that
+    are no longer published are removed.
+
+    Args:
+        output_dir: Directory to create SERIES_DIR in
+        results: Full (not delta) columnar scenario results by settings key
+        job_lookup: Job labels by job ID, including the total
+        indent: Number of spaces to indent with, or None to minify
+
+    Returns:
+        Number of scenarios written
+    """
+    series_dir = output_dir / SERIES_DIR
+    series_dir.mkdir(parents=True, exist_ok=True)
+
+    current = set()
+    for key, result in results.items():
+        write_json(series_dir / f"{key}.json", chart_series(result, job_lookup), indent=indent)
+        current.update((f"{key}.json", f"{key}.json.gz"))
+
+    for path in series_dir.iterdir():
+        if path.name not in current:
+            path.unlink()
+
+    logger.info(f"Wrote chart series of {len(results)} scenarios to {series_dir}")
+    return len(results)
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_DIR = Path(__file__).resolve().parent / "checkpoints"
+
+
+class CheckpointState(NamedTuple):
+    """State of a sweep recovered from a checkpoint log."""
+    job_lookup: Optional[Dict[int, str]]
+    results: Dict[str, Dict[str, Any]]
+    failures: Dict[str, str]
+
+
+class CheckpointLog:
+    """
+    An append-only JSON Lines log of a sweep's progress.
+
+    Every processed result and every failure is appended as a record. Writes
+    are flushed to the operating system immediately and fsynced in batches,
+    so a crash loses at most the last unsynced batch.
+
+    Record types:
+        lookup: The job lookup used to assign job IDs in the results
+        result: The processed result for a combination key
+        failure: The error that made a combination fail
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        fsync_every: int = 10,
+        fsync_interval: float = 5.0
+    ) -> None:
+        """
+        Initialize the checkpoint log.
+
+        Args:
+            path: Path to the JSON Lines file
+            fsync_every: Number of records after which to fsync
+            fsync_interval: Seconds after which to fsync pending records
+        """
+        self.path = Path(path)
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._file = None
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def load(self) -> CheckpointState:
+        """
+        Read the state recorded in the log.
+
+        A later record for a key replaces an earlier one, so a result
+        recorded after a failure marks the key as completed. A truncated
+        final line, left by a crash mid-write, is ignored.
+
+        Returns:
+            The job lookup, completed results and failed keys
+        """
+        job_lookup = None
+        results = {}
+        failures = {}
+
+        if not self.path.exists():
+            return CheckpointState(job_lookup, results, failures)
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning(
+                        f"Skipping unreadable checkpoint record at "
+                        f"{self.path}:{line_number}"
+                    )
+                    continue
+
+                if record["type"] == "lookup":
+                    job_lookup = {int(i): name for i, name in record["jobs"].items()}
+                elif record["type"] == "result":
+                    results[record["key"]] = record["result"]
+                    failures.pop(record["key"], None)
+                elif record["type"] == "failure":
+                    failures[record["key"]] = record["error"]
+
+        return CheckpointState(job_lookup, results, failures)
+
+    def reset(self) -> None:
+        """Discard all recorded progress."""
+        self.close()
+        if self.path.exists():
+            self.path.unlink()
+
+    def record_lookup(self, job_lookup: Dict[int, str]) -> None:
+        """Record the job lookup used for the results."""
+        self._append({"type": "lookup", "jobs": job_lookup})
+
+    def record_result(self, key: str, result: Dict[str, Any]) -> None:
+        """Record the processed result for a combination."""
+        self._append({"type": "result", "key": key, "result": result})
+
+    def record_failure(self, key: str, error: str) -> None:
+        """Record that a combination failed."""
+        self._append({"type": "failure", "key": key, "error": error})
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        """Append a record and fsync once the batch is full or stale."""
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Terminate a record truncated by a crash so it stays separate
+            truncated = False
+            if self.path.exists() and self.path.stat().st_size > 0:
+                with open(self.path, "rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    truncated = f.read(1) != b"\n"
+
+            self._file = open(self.path, "a", encoding="utf-8")
+            if truncated:
+                self._file.write("\n")
+
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self._pending += 1
+
+        if (
+            self._pending >= self.fsync_every or
+            time.monotonic() - self._last_sync >= self.fsync_interval
+        ):
+            self.sync()
+
+    def sync(self) -> None:
+        """Force all records written so far to disk."""
+        if self._file is not None and self._pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        """Sync and close the log file."""
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
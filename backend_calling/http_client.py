@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import RateLimiter
+from run_profiler import count, timed
+from sweep_metrics import SweepMetrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 10.0
+# The optimizer can take minutes for a single scenario
+DEFAULT_READ_TIMEOUT = 300.0
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_BASE = 1.0
+DEFAULT_BACKOFF_MAX = 60.0
+
+# Status codes of failures that may succeed when the request is repeated
+RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+# Transport failures that may succeed when the request is repeated
+RETRY_EXCEPTIONS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+
+
+def retry_after(response: requests.Response) -> Optional[float]:
+    """
+    Return the number of seconds a response asks the client to wait.
+
+    Args:
+        response: HTTP response
+
+    Returns:
+        Seconds from the Retry-After header, or None when it is absent or
+        invalid
+    """
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_shared_client: Optional[HttpClient] = None
+_shared_client_lock = threading.Lock()
+
+
+class HttpClient:
+    """
+    Keep-alive HTTP client for the optimization API.
+
+    A single session with a connection pool is shared by all requests, so
+    only the first request to a host pays for the TCP and TLS handshakes.
+    GET requests are retried on transport failures and retryable status
+    codes, with exponential backoff and full jitter between attempts, or
+    longer when the API sends a Retry-After. With a rate limiter every
+    attempt waits for its turn and reports its outcome to the limiter.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_base: float = DEFAULT_BACKOFF_BASE,
+        backoff_max: float = DEFAULT_BACKOFF_MAX,
+        limiter: Optional[RateLimiter] = None,
+        metrics: Optional[SweepMetrics] = None
+    ) -> None:
+        """
+        Initialize the client.
+
+        Args:
+            pool_size: Connections kept open per host; use at least the
+                number of concurrent requests
+            connect_timeout: Seconds to wait for a connection
+            read_timeout: Seconds to wait for the server between bytes
+            max_retries: Number of times a failed request is repeated
+            backoff_base: Upper bound in seconds of the first backoff
+            backoff_max: Upper bound in seconds of any backoff
+            limiter: Rate limiter pacing the requests, if any
+            metrics: Sweep metrics recording every attempt, if any
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limiter = limiter
+        self.metrics = metrics
+        self.retries = 0
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @classmethod
+    def shared(cls) -> HttpClient:
+        """Return the client shared by all requests in this process."""
+        global _shared_client
+        with _shared_client_lock:
+            if _shared_client is None:
+                _shared_client = cls()
+            return _shared_client
+
+    def backoff(self, attempt: int) -> float:
+        """Return a random delay in seconds before the given retry attempt."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def get(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        params: Any = None
+    ) -> requests.Response:
+        """
+        Send a GET request, retrying failures that may be transient.
+
+        Args:
+            url: URL to request
+            headers: HTTP request headers
+            params: Query parameters, as a dictionary or an encoded string
+
+        Returns:
+            The successful response
+
+        Raises:
+            requests.RequestException: If the last attempt fails
+        """
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                with timed("rate_limit"):
+                    self.limiter.acquire()
+            start = time.monotonic()
+            wait = None
+            try:
+                with timed("request"):
+                    response = self.session.get(
+                        url,
+                        headers=headers,
+                        params=params,
+                        timeout=self.timeout
+                    )
+                    count("response_bytes", len(response.content))
+            except RETRY_EXCEPTIONS as e:
+                latency = time.monotonic() - start
+                if self.limiter is not None:
+                    self.limiter.record(None, latency)
+                if self.metrics is not None:
+                    self.metrics.request(None, latency)
+                if attempt >= self.max_retries:
+                    raise
+                reason = type(e).__name__
+            else:
+                latency = time.monotonic() - start
+                if response.status_code in RETRY_STATUSES:
+                    wait = retry_after(response)
+                if self.limiter is not None:
+                    self.limiter.record(response.status_code, latency, wait)
+                if self.metrics is not None:
+                    self.metrics.request(response.status_code, latency, len(response.content))
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response
+                reason = f"status {response.status_code}"
+                response.close()
+
+            delay = max(self.backoff(attempt), wait or 0.0)
+            attempt += 1
+            with self._lock:
+                self.retries += 1
+            count("retries", 1)
+            logger.warning(
+                f"Request failed with {reason}, retrying in {delay:.1f}s "
+                f"({attempt}/{self.max_retries})"
+            )
+            with timed("backoff"):
+                time.sleep(delay)
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self.session.close()
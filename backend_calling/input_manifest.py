@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+from requesting_api import CATEGORIES_FILE, PART_TIME_FILE, HoursWorked, scenario_file
+from sweep import Combination
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+CODE_DIR = Path(__file__).resolve().parent
+
+# Modules that shape the request parameters and processed results of every scenario
+SCENARIO_CODE = (
+    "requesting_api.py",
+    "workbook_cache.py",
+    "sweep.py",
+    "response_arrays.py",
+    "results_format.py",
+    "job_registry.py",
+)
+# Modules that only shape the job labels
+LABEL_CODE = ("job_names.py",)
+
+
+def scenario_inputs(combination: Combination) -> List[str]:
+    """
+    Return the input workbooks the request of a combination is built from.
+
+    Mirrors the files ScenarioParamFactory reads for each dimension: the
+    steering workbook always, the category workbook for the priority and
+    non-source jobs, and the part-time workbook only for part-time hours.
+
+    Args:
+        combination: Combination to list the inputs of
+
+    Returns:
+        Workbook paths, relative to the backend_calling directory
+    """
+    inputs = [scenario_file(combination.steering), CATEGORIES_FILE]
+    if combination.hours == HoursWorked.PART_TIME:
+        inputs.append(PART_TIME_FILE)
+    return inputs
+
+
+class InputManifest:
+    """
+    Records which inputs every scenario result was built from.
+
+    For every settings key the manifest stores a fingerprint: the SHA-256
+    of each input workbook and code module the scenario depends on, and
+    the options its result was processed with. A scenario is stale when
+    its current fingerprint differs from the recorded one, so after an
+    input changes only the scenarios reading that input are rebuilt. The
+    job labels have their own fingerprint.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        code: Sequence[str] = (),
+        options: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Initialize an empty manifest.
+
+        Args:
+            path: Path of the JSON manifest
+            code: Modules besides SCENARIO_CODE that shape every result,
+                such as the generator script
+            options: Settings the results are processed with
+        """
+        self.path = Path(path)
+        self.code = tuple(SCENARIO_CODE) + tuple(code)
+        self.options = options or {}
+        self.scenarios: Dict[str, Dict[str, Any]] = {}
+        self.labels: Optional[Dict[str, Any]] = None
+        self._digests: Dict[str, str] = {}
+
+    def _digest(self, name: str, path: Path) -> str:
+        """Return the SHA-256 of a file, hashing every file once."""
+        digest = self._digests.get(name)
+        if digest is None:
+            digest = hashlib.sha256(path.read_bytes()).hexdigest()
+            self._digests[name] = digest
+        return digest
+
+    def _code_digests(self, modules: Iterable[str]) -> Dict[str, str]:
+        """Return the SHA-256 of code modules by module file name."""
+        return {name: self._digest(name, CODE_DIR / name) for name in modules}
+
+    def fingerprint(self, combination: Combination) -> Dict[str, Any]:
+        """Return the current fingerprint of a combination's result."""
+        files = {path: self._digest(path, Path(path)) for path in scenario_inputs(combination)}
+        files.update(self._code_digests(self.code))
+        return {"files": files, "options": self.options}
+
+    def label_fingerprint(self) -> Dict[str, Any]:
+        """Return the current fingerprint of the job labels."""
+        return {"files": self._code_digests(LABEL_CODE)}
+
+    def load(self) -> None:
+        """Read the recorded fingerprints, if the manifest exists."""
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            logger.warning(f"Ignoring input manifest {self.path} of another version")
+            return
+        self.scenarios = data["scenarios"]
+        self.labels = data.get("labels")
+
+    def stale(self, combinations: Iterable[Combination]) -> List[Combination]:
+        """
+        Return the combinations whose inputs changed since they were recorded.
+
+        Combinations without a recorded fingerprint are stale as well.
+
+        Args:
+            combinations: Combinations to check
+
+        Returns:
+            Stale combinations, in the given order
+        """
+        return [
+            combination for combination in combinations
+            if self.scenarios.get(combination.key) != self.fingerprint(combination)
+        ]
+
+    def changed_inputs(self, combinations: Iterable[Combination]) -> List[str]:
+        """Return the inputs whose hash differs from a recorded fingerprint."""
+        changed = set()
+        for combination in combinations:
+            recorded = self.scenarios.get(combination.key)
+            if recorded is None:
+                continue
+            for path, digest in self.fingerprint(combination)["files"].items():
+                if recorded["files"].get(path) != digest:
+                    changed.add(path)
+        return sorted(changed)
+
+    def record(self, combination: Combination) -> None:
+        """Record the current fingerprint of a combination's result."""
+        self.scenarios[combination.key] = self.fingerprint(combination)
+
+    def labels_changed(self) -> bool:
+        """Return whether the job labels changed since they were recorded."""
+        return self.labels != self.label_fingerprint()
+
+    def record_labels(self) -> None:
+        """Record the current fingerprint of the job labels."""
+        self.labels = self.label_fingerprint()
+
+    def save(self) -> None:
+        """Write the manifest, replacing the file in one step."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.path.with_name(f".{self.path.name}.tmp")
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": MANIFEST_VERSION,
+                    "labels": self.labels,
+                    "scenarios": self.scenarios
+                },
+                f,
+                indent=2
+            )
+        os.replace(temp, self.path)
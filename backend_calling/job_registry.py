@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Union
+
+from checkpoint import DEFAULT_CHECKPOINT_DIR
+from requesting_api import BackendRequest
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_VERSION = 1
+DEFAULT_REGISTRY_PATH = Path(__file__).resolve().parent / "job-registry.json"
+# Name of the job that sums all other jobs
+TOTAL_JOB = "Totaal"
+
+
+def registry_path(base_url: Optional[str] = None) -> Path:
+    """
+    Return the path of the registry for an optimize endpoint.
+
+    Only the production endpoint uses the committed registry; any other
+    endpoint, such as a stub server, gets a registry of its own next to the
+    checkpoints, so its jobs never end up in the committed IDs.
+
+    Args:
+        base_url: URL of the optimize endpoint, None for production
+
+    Returns:
+        Path of the JSON registry
+    """
+    if base_url is None or base_url == BackendRequest.BASE_URL:
+        return DEFAULT_REGISTRY_PATH
+    digest = hashlib.sha256(base_url.encode("utf-8")).hexdigest()[:16]
+    return DEFAULT_CHECKPOINT_DIR / f"job-registry-{digest}.json"
+
+
+def response_job_names(response_data: Dict[str, Any]) -> Set[str]:
+    """
+    Return the names of every job an API response refers to.
+
+    Args:
+        response_data: Raw API response
+
+    Returns:
+        Job names in the shortages, the shortage components and the
+        sources and targets of the transitions
+    """
+    names = set(response_data["shortages_by_job"])
+    names.update(response_data["shortage_components"])
+    for source, targets in response_data["transitions"].items():
+        names.add(source)
+        names.update(targets)
+    return names
+
+
+class JobRegistry:
+    """
+    Persistent, append-only assignment of job IDs.
+
+    A job keeps the ID it was first registered with in every later run, so
+    results of different runs, checkpoints and client caches agree on the
+    IDs. A new registry numbers the jobs of the first response in name
+    order and gives the total the next ID; jobs that appear later get the
+    next free ID. IDs are dense, so every ID below num_jobs is assigned.
+    """
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_REGISTRY_PATH) -> None:
+        """
+        Initialize an empty registry.
+
+        Args:
+            path: Path of the JSON registry
+        """
+        self.path = Path(path)
+        self.names: List[str] = []
+        self._ids: Dict[str, int] = {}
+
+    @property
+    def num_jobs(self) -> int:
+        """Number of job IDs, including the total."""
+        return len(self.names)
+
+    @property
+    def total_id(self) -> int:
+        """Job ID of the total."""
+        return self._ids[TOTAL_JOB]
+
+    @property
+    def job_lookup(self) -> Dict[int, str]:
+        """Job names by job ID."""
+        return dict(enumerate(self.names))
+
+    @property
+    def id_lookup(self) -> Dict[str, int]:
+        """Job IDs by job name."""
+        return dict(self._ids)
+
+    def _assign(self, names: Iterable[str]) -> None:
+        for name in names:
+            self._ids[name] = len(self.names)
+            self.names.append(name)
+
+    def load(self) -> None:
+        """Read the registered jobs, if the registry exists."""
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        # Renumbering would silently change the meaning of published IDs
+        if data.get("version") != REGISTRY_VERSION:
+            raise ValueError(f"Unsupported job registry version {data.get('version')!r} in {self.path}")
+        self.names = []
+        self._ids = {}
+        self._assign(data["jobs"])
+        if len(self._ids) != len(self.names):
+            raise ValueError(f"Job registry {self.path} lists a job twice")
+
+    def register(self, names: Iterable[str]) -> List[str]:
+        """
+        Assign IDs to jobs that have none yet.
+
+        Args:
+            names: Job names, for example from response_job_names()
+
+        Returns:
+            Names of the newly registered jobs, in ID order
+        """
+        added = sorted(set(names) - self._ids.keys() - {TOTAL_JOB})
+        if not self.names:
+            added.append(TOTAL_JOB)
+        self._assign(added)
+        return added
+
+    def adopt(self, job_lookup: Dict[int, str]) -> bool:
+        """
+        Take over the IDs of a job lookup recorded by an earlier run.
+
+        The lookup and the registry agree when one numbers a prefix of the
+        jobs of the other; the registry then grows to the longer of the two.
+
+        Args:
+            job_lookup: Job names by job ID, as stored in a checkpoint
+
+        Returns:
+            Whether the lookup agrees with the registry, so results built
+            with it can be used
+        """
+        names = [job_lookup[i] for i in range(len(job_lookup))]
+        shorter = min(len(names), len(self.names))
+        if names[:shorter] != self.names[:shorter]:
+            return False
+        self._assign(names[len(self.names):])
+        return True
+
+    def save(self) -> None:
+        """Write the registry, replacing the file in one step."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.path.with_name(f".{self.path.name}.tmp")
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(
+                {"version": REGISTRY_VERSION, "jobs": self.names},
+                f,
+                ensure_ascii=False,
+                indent=2
+            )
+        os.replace(temp, self.path)
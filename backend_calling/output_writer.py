@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Iterator, Mapping, Optional, Union
+
+
+def iter_json_chunks(
+    data: Any,
+    indent: Optional[int] = None,
+    depth: int = 1,
+    _level: int = 0
+) -> Iterator[str]:
+    """
+    Encode a value as JSON one mapping entry at a time.
+
+    With an indent the output is identical to ``json.dumps(data, indent=indent,
+    ensure_ascii=False)``; without one it is minified.
+
+    Args:
+        data: Value to encode
+        indent: Number of spaces to indent with, or None to minify
+        depth: Number of nested mapping levels to encode entry by entry
+
+    Yields:
+        Consecutive pieces of the JSON document
+    """
+    if depth == 0 or not isinstance(data, Mapping) or not data:
+        if indent is None:
+            yield json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+            return
+        # Nested values are encoded at the top level and shifted in; newlines
+        # inside strings are escaped, so every newline is structural
+        encoded = json.dumps(data, ensure_ascii=False, indent=indent)
+        yield encoded.replace("\n", "\n" + " " * indent * _level)
+        return
+
+    if indent is None:
+        yield "{"
+        for i, (key, value) in enumerate(data.items()):
+            yield ("," if i else "") + json.dumps(str(key), ensure_ascii=False) + ":"
+            yield from iter_json_chunks(value, indent, depth - 1, _level + 1)
+        yield "}"
+        return
+
+    padding = " " * indent * (_level + 1)
+    yield "{\n"
+    for i, (key, value) in enumerate(data.items()):
+        yield (",\n" if i else "") + padding + json.dumps(str(key), ensure_ascii=False) + ": "
+        yield from iter_json_chunks(value, indent, depth - 1, _level + 1)
+    yield "\n" + " " * indent * _level + "}"
+
+
+def write_json(
+    path: Union[str, Path],
+    data: Mapping[Any, Any],
+    plain: bool = True,
+    compressed: bool = True,
+    indent: Optional[int] = None,
+    depth: int = 1
+) -> None:
+    """
+    Write a mapping as JSON to a plain file and a gzip file in a single pass.
+
+    Each chunk is encoded once and written to both outputs. Outputs are
+    written to temporary files and renamed into place, so readers never
+    see a partially written file.
+
+    Args:
+        path: Path of the plain JSON file; the gzip file gets a .gz suffix
+        data: Mapping to write
+        plain: Whether to write the plain JSON file
+        compressed: Whether to write the gzip file
+        indent: Number of spaces to indent with, or None to minify
+        depth: Number of nested mapping levels to encode entry by entry
+    """
+    path = Path(path)
+    targets = []
+    if plain:
+        targets.append(path)
+    if compressed:
+        targets.append(path.with_name(path.name + ".gz"))
+    temporaries = [target.with_name(target.name + ".tmp") for target in targets]
+
+    try:
+        with ExitStack() as stack:
+            outputs = []
+            for target, temporary in zip(targets, temporaries):
+                raw = stack.enter_context(open(temporary, "wb"))
+                if target.suffix == ".gz":
+                    # A fixed timestamp keeps unchanged outputs byte-identical
+                    raw = stack.enter_context(
+                        gzip.GzipFile(filename=path.name, mode="wb", fileobj=raw, mtime=0)
+                    )
+                outputs.append(raw)
+
+            for chunk in iter_json_chunks(data, indent, depth):
+                encoded = chunk.encode("utf-8")
+                for output in outputs:
+                    output.write(encoded)
+
+        for target, temporary in zip(targets, temporaries):
+            os.replace(temporary, target)
+    finally:
+        for temporary in temporaries:
+            if temporary.exists():
+                temporary.unlink()
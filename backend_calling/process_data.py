@@ -1,12 +1,18 @@
 from __future__ import annotations
 
+import argparse
 import json
-import gzip
 import logging
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 
 from job_names import job_name_mapping
+from output_writer import write_json
+from results_format import DEFAULT_SCENARIO, encode_deltas, encode_result, wrap_results
+from scenario_aggregates import write_aggregates
+from chart_series import write_chart_series
+from shards import DEFAULT_GROUP_BY, parse_group_by, write_sharded_results
+from sweep import delta_parents
 
 # Set up logging
 logging.basicConfig(
@@ -46,7 +52,12 @@ def validate_data_structure(data: Dict[str, Any]) -> bool:
         return False
 
 
-def process_and_compress_data():
+def process_and_compress_data(
+    pretty: bool = False,
+    group_by: Optional[Tuple[str, ...]] = DEFAULT_GROUP_BY,
+    delta: bool = False,
+    chart_series: bool = False
+):
     """Process raw data files, map job names, and create compressed versions."""
     try:
         input_dir = Path("../raw_data")
@@ -73,25 +84,41 @@ def process_and_compress_data():
             for i, name in job_lookup.items()
         }
         
-        # Save and compress job names
+        indent = 2 if pretty else None
+        
+        # Save job names, plain and compressed
         logger.info("Saving and compressing job names...")
-        job_names_path = output_dir / "job-names.json.gz"
-        with gzip.open(job_names_path, "wt", encoding="utf-8") as f:
-            json.dump(final_job_lookup, f, ensure_ascii=False, indent=2)
+        write_json(output_dir / "job-names.json", final_job_lookup, indent=indent)
             
-        # Save and compress model results
+        # Save model results in the columnar format, plain and compressed
         logger.info("Saving and compressing model results...")
-        model_results_path = output_dir / "model-results.json.gz"
-        with gzip.open(model_results_path, "wt", encoding="utf-8") as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
-            
-        # Save uncompressed versions
-        logger.info("Saving uncompressed versions...")
-        with open(output_dir / "job-names.json", "w", encoding="utf-8") as f:
-            json.dump(final_job_lookup, f, ensure_ascii=False, indent=2)
-            
-        with open(output_dir / "model-results.json", "w", encoding="utf-8") as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
+        encoded = scenarios = {
+            key: encode_result(result, len(job_lookup))
+            for key, result in results.items()
+        }
+        if delta:
+            scenarios = encode_deltas(encoded, delta_parents(encoded, DEFAULT_SCENARIO))
+        write_json(
+            output_dir / "model-results.json",
+            wrap_results(scenarios),
+            indent=indent,
+            depth=2
+        )
+        
+        # Save scenario shards for on-demand loading
+        if group_by is not None:
+            logger.info("Saving scenario shards...")
+            write_sharded_results(output_dir, scenarios, group_by, indent=indent)
+        
+        # Save cross-scenario aggregates for comparison views
+        logger.info("Saving cross-scenario aggregates...")
+        labels = {int(i): name for i, name in final_job_lookup.items()}
+        write_aggregates(output_dir, encoded, labels, indent=indent)
+        
+        # Save chart-ready series, so the frontend does not rebuild them
+        if chart_series:
+            logger.info("Saving chart series...")
+            write_chart_series(output_dir, encoded, labels, indent=indent)
             
         logger.info("Data processing and compression completed successfully!")
         
@@ -101,4 +128,35 @@ def process_and_compress_data():
 
 
 if __name__ == "__main__":
-    process_and_compress_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Publish the raw model results.")
+    parser.add_argument(
+        "--pretty",
+        action="store_true",
+        help="Indent the JSON output instead of minifying it"
+    )
+    parser.add_argument(
+        "--shard-by",
+        type=parse_group_by,
+        default=",".join(DEFAULT_GROUP_BY),
+        help=(
+            "Comma separated settings to group scenario shards by, "
+            "'scenario' for one shard per scenario or 'none' to skip sharding"
+        )
+    )
+    parser.add_argument(
+        "--delta",
+        action="store_true",
+        help="Store scenarios as deltas against their nearest neighbour"
+    )
+    parser.add_argument(
+        "--chart-series",
+        action="store_true",
+        help="Also write chart-ready waterfall and shortage bar series per scenario"
+    )
+    args = parser.parse_args()
+    process_and_compress_data(
+        pretty=args.pretty,
+        group_by=args.shard_by,
+        delta=args.delta,
+        chart_series=args.chart_series
+    )
\ No newline at end of file
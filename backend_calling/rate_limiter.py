@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INITIAL_RATE = 2.0
+DEFAULT_MIN_RATE = 0.1
+DEFAULT_MAX_RATE = 50.0
+DEFAULT_INCREASE = 0.2
+DEFAULT_DECREASE = 0.5
+# A response is slow when it takes this many times the usual latency
+DEFAULT_SLOW_FACTOR = 3.0
+# Responses needed before latencies are used to judge health
+LATENCY_WARMUP = 5
+LATENCY_SMOOTHING = 0.2
+
+
+class RateLimiter:
+    """
+    Adaptive token bucket limiting the request rate to the API.
+
+    Tokens are added at the current rate and every request takes one. The
+    rate is adjusted with additive increase, multiplicative decrease
+    (AIMD): every healthy response raises it by a fixed step, while a
+    throttled, failed or unusually slow response cuts it by a factor, and
+    other client errors leave it as it is. Cuts
+    are applied at most once per typical response time, so a burst of
+    failures from requests already in flight counts as one. A Retry-After
+    from the API pauses all requests until it has passed.
+    """
+
+    def __init__(
+        self,
+        initial_rate: float = DEFAULT_INITIAL_RATE,
+        min_rate: float = DEFAULT_MIN_RATE,
+        max_rate: float = DEFAULT_MAX_RATE,
+        increase: float = DEFAULT_INCREASE,
+        decrease: float = DEFAULT_DECREASE,
+        slow_factor: float = DEFAULT_SLOW_FACTOR,
+        burst: float = 1.0
+    ) -> None:
+        """
+        Initialize the limiter.
+
+        Args:
+            initial_rate: Requests per second to start with
+            min_rate: Lowest rate the limiter backs off to
+            max_rate: Highest rate the limiter speeds up to
+            increase: Requests per second added after a healthy response
+            decrease: Factor the rate is multiplied by after a bad response
+            slow_factor: Multiple of the usual latency at which a response
+                counts as slow
+            burst: Number of requests that may be sent back to back
+        """
+        if not 0 < min_rate <= initial_rate <= max_rate:
+            raise ValueError(
+                f"Expected 0 < min_rate <= initial_rate <= max_rate, got "
+                f"{min_rate}, {initial_rate}, {max_rate}"
+            )
+        self.rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.slow_factor = slow_factor
+        self.capacity = max(burst, 1.0)
+
+        self.requests = 0
+        self.responses = 0
+        self.slowdowns = 0
+        self.latency: Optional[float] = None
+
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = float("-inf")
+        self._started: Optional[float] = None
+
+    def _refill(self, now: float) -> None:
+        """Add the tokens accumulated since the last update."""
+        since = max(self._updated, self._paused_until)
+        if now > since:
+            self._tokens = min(self.capacity, self._tokens + (now - since) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> None:
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    self.requests += 1
+                    if self._started is None:
+                        self._started = now
+                    return
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def _slow_down(self, now: float) -> None:
+        """Cut the rate, unless it was cut within the last response time."""
+        if now - self._last_decrease < (self.latency or 0.0):
+            return
+        self._last_decrease = now
+        previous = self.rate
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        self.slowdowns += 1
+        logger.info(f"Reducing request rate from {previous:.2f}/s to {self.rate:.2f}/s")
+
+    def record(
+        self,
+        status: Optional[int],
+        latency: float,
+        retry_after: Optional[float] = None
+    ) -> None:
+        """
+        Adjust the rate to the outcome of a request.
+
+        Args:
+            status: HTTP status code, or None when no response was received
+            latency: Seconds the request took
+            retry_after: Seconds the API asked to wait, if any
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.responses += 1
+
+            # Other client errors come from the request, not from the load on
+            # the API, so they neither raise nor cut the rate
+            client_error = status is not None and 400 <= status < 500 and status != 429
+            slow = (
+                self.latency is not None
+                and self.responses > LATENCY_WARMUP
+                and latency > self.slow_factor * self.latency
+            )
+            if status is None or status == 429 or status >= 500 or (slow and not client_error):
+                self._slow_down(now)
+            elif not client_error:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+            if retry_after is not None:
+                self._paused_until = max(self._paused_until, now + retry_after)
+
+            if status is not None and status < 400:
+                if self.latency is None:
+                    self.latency = latency
+                else:
+                    self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+
+    def effective_rate(self) -> float:
+        """Return the average number of requests per second so far."""
+        with self._lock:
+            if self._started is None:
+                return 0.0
+            elapsed = time.monotonic() - self._started
+            return self.requests / elapsed if elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        """Return a one line summary for the log."""
+        return (
+            f"Rate limiter: {self.requests} requests at {self.effective_rate():.2f}/s, "
+            f"final limit {self.rate:.2f}/s, {self.slowdowns} slowdowns"
+        )
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
 import json
+import threading
 from enum import Enum
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
 
-import pandas as pd
 import requests
 
+from http_client import HttpClient
+from run_profiler import timed
+from workbook_cache import read_columns
+
 
 class JobPriority(str, Enum):
     """Available job priority categories."""
@@ -31,78 +36,71 @@ class HoursWorked(str, Enum):
     HEALTHCARE = "healthcare"
 
 
-class BackendRequest:
+# Parameters of a scenario dimension and their URL-encoded query parts
+Fragment = Tuple[Dict[str, Any], Dict[str, str]]
+
+# Input workbooks, relative to the backend_calling directory
+CATEGORIES_FILE = "data/Priority and non-source jobs (categories).xlsx"
+PART_TIME_FILE = "data/Deeltijdfactor.xlsx"
+
+
+def scenario_file(government_steering: bool) -> str:
     """
-    A class to handle workforce optimization API requests.
+    Return the path of the scenario workbook.
     
-    This class manages the construction and execution of requests to the workforce
-    optimization API, handling various parameters and data processing requirements.
+    Args:
+        government_steering: Whether to use government steering
     
-    Attributes:
-        BASE_URL: The base URL for the workforce optimization API
-        headers: HTTP headers for the API request
-        params: Parameters for the optimization request
+    Returns:
+        Path to the scenario file
     """
+    suffix = "met" if government_steering else "zonder"
+    return f"data/Scenario - {suffix} overheidssturing.xlsx"
+
+
+_shared_factory: Optional[ScenarioParamFactory] = None
+_shared_factory_lock = threading.Lock()
+
+
+class ScenarioParamFactory:
+    """
+    A class to build optimization request parameters for scenario combinations.
     
-    BASE_URL = "https://workforce-optimizer-backend-production.up.railway.app/optimize/"
+    Each scenario dimension contributes a fixed fragment of the request
+    parameters. The fragments are computed once per factory, both as JSON
+    encoded values and as URL-encoded query string parts, so building the
+    parameters for a combination is a cheap merge.
+    """
     
-    def __init__(
-        self,
-        government_steering: bool,
-        productivity_increase: float,
-        hours_worked: HoursWorked,
-        job_priority: JobPriority,
-        non_source_jobs: NonSourceJobs
-    ) -> None:
-        """
-        Initialize the BackendRequest with the specified parameters.
-        
-        Args:
-            government_steering: Whether to use government steering in optimization
-            productivity_increase: Productivity increase factor
-            hours_worked: Category of hours worked
-            job_priority: Category of job priorities
-            non_source_jobs: Category of non-source jobs
-        """
-        self.headers = self._get_headers()
-        self.params = self._get_base_params(productivity_increase)
-        self.government_steering = government_steering
-        self._load_scenario_data(government_steering)
-        self._priority_override(job_priority)
-        self._non_source_jobs_override(non_source_jobs)
-        self._set_additional_hours(hours_worked)
-
+    def __init__(self) -> None:
+        """Initialize an empty fragment cache."""
+        self._fragments: Dict[Tuple[str, Any], Fragment] = {}
+        self._lock = threading.Lock()
+        self._template = self._get_base_params()
+        self._encoded_template = self._encode(self._template)
     
-    def _get_headers(self) -> Dict[str, str]:
-        """Return the HTTP request headers."""
-        return {
-            "accept": "application/json, text/plain, */*",
-            "accept-language": "en-US,en;q=0.9",
-            "origin": "https://workforce-optimizer-dev.up.railway.app",
-            "referer": "https://workforce-optimizer-dev.up.railway.app/",
-            "sec-fetch-dest": "empty",
-            "sec-fetch-mode": "cors",
-            "sec-fetch-site": "same-site",
-            "user-agent": (
-                "Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA58N) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/131.0.0.0 Mobile Safari/537.36"
-            )
-        }
+    @classmethod
+    def shared(cls) -> ScenarioParamFactory:
+        """Return the factory shared by all requests in this process."""
+        global _shared_factory
+        with _shared_factory_lock:
+            if _shared_factory is None:
+                _shared_factory = cls()
+            return _shared_factory
     
-    def _get_base_params(self, productivity_increase: float) -> Dict:
+    def _get_base_params(self) -> Dict:
         """
         Return the base optimization parameters.
         
-        Args:
-            productivity_increase: The productivity increase factor
+        Scenario dependent parameters are included as placeholders so that
+        merged parameters keep a fixed key order.
         
         Returns:
             Dictionary of base parameters for the optimization
         """
         return {
             "automation_level": 0,
-            "productivity_increase": 0.002 * productivity_increase,
+            "productivity_increase": 0.0,
             "easy_cutoff": 0.45,
             "medium_cutoff": 0.3,
             "difficult_cutoff": 0.15,
@@ -118,7 +116,11 @@ class BackendRequest:
             "women_25_55": 83.6,
             "women_55_75": 40.9,
             "fraction_55_more_years": 0.1,
-            "additional_hours_worked": "{}"
+            "additional_hours_worked": "{}",
+            "change_dict": "{}",
+            "priority_jobs": "[]",
+            "non_source_jobs": "[]",
+            "productivity_increase_per_job": "{}"
         }
     
     def _get_scenario_file(self, government_steering: bool) -> str:
@@ -131,8 +133,7 @@ class BackendRequest:
         Returns:
             Path to the scenario file
         """
-        suffix = "met" if government_steering else "zonder"
-        return f"data/Scenario - {suffix} overheidssturing.xlsx"
+        return scenario_file(government_steering)
     
     def _read_excel_data(
         self,
@@ -154,34 +155,16 @@ class BackendRequest:
             Dictionary of non-zero values from the Excel data
         """
         try:
-            df = pd.read_excel(file_path, sheet_name=sheet_name)
-            data = df.set_index(index_col)[value_col].dropna().to_dict()
+            columns = read_columns(file_path, sheet_name=sheet_name)
+            data = {
+                k: v
+                for k, v in zip(columns[index_col], columns[value_col])
+                if v is not None
+            }
             return {k: v for k, v in data.items() if v != 0}
         except Exception as e:
             raise ValueError(f"Error reading Excel file {file_path}: {str(e)}")
     
-    def _read_excel_list(
-        self,
-        file_path: str,
-        sheet_name: str,
-        column: str
-    ) -> List[str]:
-        """
-        Read and process Excel data into a list.
-        
-        Args:
-            file_path: Path to the Excel file
-            sheet_name: Name of the sheet to read
-            column: Column to extract values from
-        
-        Returns:
-            List of non-null values from the specified column
-        """
-        try:
-            return pd.read_excel(file_path, sheet_name=sheet_name)[column].dropna().tolist()
-        except Exception as e:
-            raise ValueError(f"Error reading Excel file {file_path}: {str(e)}")
-    
     def _process_productivity_changes(self, data: Dict) -> Dict:
         """
         Convert productivity percentage strings to decimal values.
@@ -200,27 +183,25 @@ class BackendRequest:
         except ValueError as e:
             raise ValueError(f"Error processing productivity changes: {str(e)}")
     
-    def _load_scenario_data(self, government_steering: bool) -> None:
+    def _load_scenario_data(self, government_steering: bool) -> Dict[str, str]:
         """
-        Load all scenario data from Excel file.
+        Load the steering dependent parameters from the scenario Excel file.
+        
+        Priority and non-source jobs are not read from the scenario file as
+        they are always replaced by the selected categories.
         
         Args:
             government_steering: Whether to use government steering
+        
+        Returns:
+            Dictionary with the JSON encoded change and productivity parameters
         """
         file_path = self._get_scenario_file(government_steering)
         
         try:
             # Load change dictionary
-            self.params["change_dict"] = json.dumps(
-                self._read_excel_data(file_path, "Labor Demand", "Job", "Demand Change")
-            )
-            
-            # Load priority and non-source jobs
-            self.params["priority_jobs"] = json.dumps(
-                self._read_excel_list(file_path, "Constraints", "Priority Jobs")
-            )
-            self.params["non_source_jobs"] = json.dumps(
-                self._read_excel_list(file_path, "Constraints", "Non-Source Jobs")
+            change_dict = self._read_excel_data(
+                file_path, "Labor Demand", "Job", "Demand Change"
             )
             
             # Load and process productivity increases
@@ -231,22 +212,28 @@ class BackendRequest:
                 "Productivity Change"
             )
             
-            self.params["productivity_increase_per_job"] = json.dumps(
-                self._process_productivity_changes(productivity_data)
-            )
+            return {
+                "change_dict": json.dumps(change_dict),
+                "productivity_increase_per_job": json.dumps(
+                    self._process_productivity_changes(productivity_data)
+                )
+            }
         except Exception as e:
             raise ValueError(f"Error loading scenario data: {str(e)}")
     
-    def _priority_override(self, job_priority: JobPriority) -> None:
+    def _priority_override(self, job_priority: JobPriority) -> Dict[str, str]:
         """
-        Override the job priority parameter.
+        Return the job priority parameter for a priority category.
         
         Args:
             job_priority: Category of job priorities to use
+        
+        Returns:
+            Dictionary with the JSON encoded priority jobs
         """
         try:
-            priority_df = pd.read_excel(
-                "data/Priority and non-source jobs (categories).xlsx",
+            priority_columns = read_columns(
+                CATEGORIES_FILE,
                 skiprows=1
             )
             
@@ -261,22 +248,27 @@ class BackendRequest:
             }
             
             column = priority_mapping[job_priority]
-            self.params["priority_jobs"] = json.dumps(
-                priority_df[column].dropna().tolist()
-            )
+            return {
+                "priority_jobs": json.dumps(
+                    [v for v in priority_columns[column] if v is not None]
+                )
+            }
         except Exception as e:
             raise ValueError(f"Error overriding job priorities: {str(e)}")
     
-    def _non_source_jobs_override(self, non_source_jobs: NonSourceJobs) -> None:
+    def _non_source_jobs_override(self, non_source_jobs: NonSourceJobs) -> Dict[str, str]:
         """
-        Override the non-source jobs parameter.
+        Return the non-source jobs parameter for a non-source category.
         
         Args:
             non_source_jobs: Category of non-source jobs to use
+        
+        Returns:
+            Dictionary with the JSON encoded non-source jobs
         """
         try:
-            non_source_df = pd.read_excel(
-                "data/Priority and non-source jobs (categories).xlsx",
+            non_source_columns = read_columns(
+                CATEGORIES_FILE,
                 skiprows=1,
                 sheet_name="Non-source jobs"
             )
@@ -288,9 +280,11 @@ class BackendRequest:
             }
             
             column = mapping[non_source_jobs]
-            self.params["non_source_jobs"] = json.dumps(
-                non_source_df[column].dropna().tolist()
-            )
+            return {
+                "non_source_jobs": json.dumps(
+                    [v for v in non_source_columns[column] if v is not None]
+                )
+            }
         except Exception as e:
             raise ValueError(f"Error overriding non-source jobs: {str(e)}")
         
@@ -305,22 +299,26 @@ class BackendRequest:
             List of all job names
         """
         try:
-            df = pd.read_excel(file_path, sheet_name="Labor Demand")
-            return df["Job"].dropna().unique().tolist()
+            columns = read_columns(file_path, sheet_name="Labor Demand")
+            return list(dict.fromkeys(v for v in columns["Job"] if v is not None))
         except Exception as e:
             raise ValueError(f"Error reading jobs from Excel file: {str(e)}")
     
     def _get_part_time_names(self) -> List[str]:
         """
-        TODO: This method should return a list of job names that are considered part-time.
-        Currently returns an empty list as a placeholder.
+        Return the job names with a part time factor of at most 0.8.
         
         Returns:
             List of job names for part-time workers
         """
-        df = pd.read_excel("data/deeltijdfactor.xlsx")
-        df.columns = ['Job Name', 'Part Time Factor']
-        part_time_jobs = df[df['Part Time Factor'] < 0.801]['Job Name'].tolist()
+        # The first column holds the job names and the second the factors,
+        # whatever their headers and any columns after them
+        columns = list(read_columns(PART_TIME_FILE).values())
+        job_names, part_time_factors = columns[0], columns[1]
+        part_time_jobs = [
+            job for job, factor in zip(job_names, part_time_factors)
+            if factor is not None and factor < 0.801
+        ]
         return part_time_jobs
     
     def _get_healthcare_names(self) -> List[str]:
@@ -341,12 +339,20 @@ class BackendRequest:
             'Verpleegkundigen (mbo)'
         ]
     
-    def _set_additional_hours(self, hours_worked: HoursWorked) -> None:
+    def _set_additional_hours(
+        self,
+        hours_worked: HoursWorked,
+        government_steering: bool
+    ) -> Dict[str, str]:
         """
-        Set the additional hours worked parameter based on the selected category.
+        Return the additional hours worked parameter for the selected category.
         
         Args:
             hours_worked: Category of hours worked to apply
+            government_steering: Whether to use government steering
+        
+        Returns:
+            Dictionary with the JSON encoded additional hours per job
         """
         hours_dict = {}
         extra_hours = 2/40  # 2 hours extra as a fraction of 40-hour work week
@@ -355,7 +361,7 @@ class BackendRequest:
             hours_dict = {}
         elif hours_worked == HoursWorked.EVERYONE:
             # Get all jobs from the scenario file
-            file_path = self._get_scenario_file(self.government_steering)
+            file_path = self._get_scenario_file(government_steering)
             all_jobs = self._get_all_jobs(file_path)
             hours_dict = {job: extra_hours for job in all_jobs}
         elif hours_worked == HoursWorked.HEALTHCARE:
@@ -365,7 +371,226 @@ class BackendRequest:
             part_time_jobs = self._get_part_time_names()
             hours_dict = {job: extra_hours for job in part_time_jobs}
         
-        self.params["additional_hours_worked"] = json.dumps(hours_dict)
+        return {"additional_hours_worked": json.dumps(hours_dict)}
+    
+    def _fragment(
+        self,
+        dimension: str,
+        value: Any,
+        build: Callable[[], Dict[str, Any]]
+    ) -> Fragment:
+        """
+        Return the cached fragment for a dimension value, building it once.
+        
+        Args:
+            dimension: Name of the scenario dimension
+            value: Value of the dimension
+            build: Function returning the parameters for the value
+        
+        Returns:
+            Tuple of the parameters and their URL-encoded query parts
+        """
+        key = (dimension, value)
+        fragment = self._fragments.get(key)
+        if fragment is None:
+            with self._lock:
+                fragment = self._fragments.get(key)
+                if fragment is None:
+                    params = build()
+                    fragment = (params, self._encode(params))
+                    self._fragments[key] = fragment
+        return fragment
+    
+    def _encode(self, params: Dict[str, Any]) -> Dict[str, str]:
+        """Return the URL-encoded query part of each parameter."""
+        return {name: urlencode({name: value}) for name, value in params.items()}
+    
+    def _fragments_for(
+        self,
+        government_steering: bool,
+        productivity_increase: float,
+        hours_worked: HoursWorked,
+        job_priority: JobPriority,
+        non_source_jobs: NonSourceJobs
+    ) -> List[Fragment]:
+        """Return the fragments making up the parameters of a combination."""
+        # Only the EVERYONE hours category depends on the steering file
+        hours_key = (
+            hours_worked,
+            government_steering if hours_worked == HoursWorked.EVERYONE else None
+        )
+        return [
+            self._fragment(
+                "productivity",
+                productivity_increase,
+                lambda: {"productivity_increase": 0.002 * productivity_increase}
+            ),
+            self._fragment(
+                "steering",
+                government_steering,
+                lambda: self._load_scenario_data(government_steering)
+            ),
+            self._fragment(
+                "priority",
+                job_priority,
+                lambda: self._priority_override(job_priority)
+            ),
+            self._fragment(
+                "non_source",
+                non_source_jobs,
+                lambda: self._non_source_jobs_override(non_source_jobs)
+            ),
+            self._fragment(
+                "hours",
+                hours_key,
+                lambda: self._set_additional_hours(hours_worked, government_steering)
+            ),
+        ]
+    
+    def build(
+        self,
+        government_steering: bool,
+        productivity_increase: float,
+        hours_worked: HoursWorked,
+        job_priority: JobPriority,
+        non_source_jobs: NonSourceJobs
+    ) -> Dict[str, Any]:
+        """
+        Return the request parameters for a scenario combination.
+        
+        Args:
+            government_steering: Whether to use government steering in optimization
+            productivity_increase: Productivity increase factor
+            hours_worked: Category of hours worked
+            job_priority: Category of job priorities
+            non_source_jobs: Category of non-source jobs
+        
+        Returns:
+            Dictionary of parameters for the optimization request
+        """
+        params = dict(self._template)
+        for fragment, _ in self._fragments_for(
+            government_steering,
+            productivity_increase,
+            hours_worked,
+            job_priority,
+            non_source_jobs
+        ):
+            params.update(fragment)
+        return params
+    
+    def build_query(
+        self,
+        government_steering: bool,
+        productivity_increase: float,
+        hours_worked: HoursWorked,
+        job_priority: JobPriority,
+        non_source_jobs: NonSourceJobs
+    ) -> str:
+        """
+        Return the URL-encoded query string for a scenario combination.
+        
+        The query string is identical to the one requests builds from the
+        dictionary returned by build().
+        
+        Args:
+            government_steering: Whether to use government steering in optimization
+            productivity_increase: Productivity increase factor
+            hours_worked: Category of hours worked
+            job_priority: Category of job priorities
+            non_source_jobs: Category of non-source jobs
+        
+        Returns:
+            URL-encoded request parameters
+        """
+        encoded = dict(self._encoded_template)
+        for _, fragment in self._fragments_for(
+            government_steering,
+            productivity_increase,
+            hours_worked,
+            job_priority,
+            non_source_jobs
+        ):
+            encoded.update(fragment)
+        return "&".join(encoded.values())
+
+
+class BackendRequest:
+    """
+    A class to handle workforce optimization API requests.
+    
+    This class manages the construction and execution of requests to the workforce
+    optimization API, handling various parameters and data processing requirements.
+    
+    Attributes:
+        BASE_URL: The base URL for the workforce optimization API
+        client: HTTP client sending the request
+        headers: HTTP headers for the API request
+        params: Parameters for the optimization request
+        query: URL-encoded parameters sent with the request
+    """
+    
+    BASE_URL = "https://workforce-optimizer-backend-production.up.railway.app/optimize/"
+    
+    def __init__(
+        self,
+        government_steering: bool,
+        productivity_increase: float,
+        hours_worked: HoursWorked,
+        job_priority: JobPriority,
+        non_source_jobs: NonSourceJobs,
+        param_factory: Optional[ScenarioParamFactory] = None,
+        client: Optional[HttpClient] = None,
+        base_url: Optional[str] = None
+    ) -> None:
+        """
+        Initialize the BackendRequest with the specified parameters.
+        
+        Args:
+            government_steering: Whether to use government steering in optimization
+            productivity_increase: Productivity increase factor
+            hours_worked: Category of hours worked
+            job_priority: Category of job priorities
+            non_source_jobs: Category of non-source jobs
+            param_factory: Factory building the parameters, defaults to the
+                factory shared by all requests
+            client: HTTP client sending the request, defaults to the client
+                shared by all requests
+            base_url: URL of the optimize endpoint, such as a local stub
+                server, defaults to BASE_URL
+        """
+        factory = param_factory or ScenarioParamFactory.shared()
+        scenario = (
+            government_steering,
+            productivity_increase,
+            hours_worked,
+            job_priority,
+            non_source_jobs
+        )
+        if base_url is not None:
+            self.BASE_URL = base_url
+        self.client = client or HttpClient.shared()
+        self.headers = self._get_headers()
+        self.government_steering = government_steering
+        self.params = factory.build(*scenario)
+        self.query = factory.build_query(*scenario)
+    
+    def _get_headers(self) -> Dict[str, str]:
+        """Return the HTTP request headers."""
+        return {
+            "accept": "application/json, text/plain, */*",
+            "accept-language": "en-US,en;q=0.9",
+            "origin": "https://workforce-optimizer-dev.up.railway.app",
+            "referer": "https://workforce-optimizer-dev.up.railway.app/",
+            "sec-fetch-dest": "empty",
+            "sec-fetch-mode": "cors",
+            "sec-fetch-site": "same-site",
+            "user-agent": (
+                "Mozilla/5.0 (Linux; Android 6.0; Nexus 5 Build/MRA58N) "
+                "AppleWebKit/537.36 (KHTML, like Gecko) "
+                "Chrome/131.0.0.0 Mobile Safari/537.36"
+            )
+        }
     
     def make_request(self) -> Dict:
         """
@@ -378,17 +603,20 @@ class BackendRequest:
             requests.RequestException: If the API request fails
         """
         try:
-            response = requests.get(
+            response = self.client.get(
                 self.BASE_URL,
                 headers=self.headers,
-                params=self.params
+                params=self.query
             )
-            response.raise_for_status()
-            return response.json()
+            with timed("parse"):
+                return response.json()
         except requests.RequestException as e:
+            # Connection failures and timeouts have no response
+            if e.response is None:
+                raise requests.RequestException(f"API request failed: {str(e)}") from e
             raise requests.RequestException(
-                f"API request failed with status {response.status_code}: {str(e)}"
-            )
+                f"API request failed with status {e.response.status_code}: {str(e)}"
+            ) from e
 
 
 if __name__ == "__main__":
@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+from itertools import chain
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from results_format import METRICS
+
+# Response shortage component behind each metric, in METRICS order; the
+# demand change is split into its positive and negative part
+COMPONENTS = (
+    "workforce_2024",
+    "net_change_2035",
+    "transitions_in",
+    "transitions_out",
+    "excess_workers",
+    "shortage",
+    "productivity",
+    "demand_change_2035",
+    "demand_change_2035",
+    "vacancies_labour_friction",
+)
+EXPANSION = METRICS.index("expansion_demand")
+REDUCTION = METRICS.index("reduction_demand")
+
+# Number of inbound and outbound transitions kept per job
+DEFAULT_JOB_TRANSITIONS = 5
+
+
+class ResponseArrays(NamedTuple):
+    """Dense arrays holding a single API response."""
+    shortage_ids: np.ndarray  # Job IDs in response order
+    shortages: np.ndarray  # Shortage per entry of shortage_ids
+    component_ids: np.ndarray  # Job IDs in response order
+    components: np.ndarray  # Jobs x COMPONENTS, per entry of component_ids
+    source_ids: np.ndarray  # Job IDs of the transition rows
+    target_ids: np.ndarray  # Job IDs of the transition columns
+    transitions: np.ndarray  # Sources x targets, zero when absent
+
+
+def _round(values: np.ndarray) -> np.ndarray:
+    """Round half to even like round(), raising on values round() rejects."""
+    if not np.isfinite(values).all():
+        raise ValueError("Response contains non-finite values")
+    return np.rint(values).astype(np.int64)
+
+
+def _transition_arrays(
+    transitions: Dict[str, Dict[str, float]],
+    id_lookup: Dict[str, int]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Convert the nested transitions dictionary into a dense matrix.
+
+    Rows and columns are kept in response order, so the row-major order of
+    the matrix is the order of the flattened response. The API lists the
+    same targets in the same order for every source; otherwise columns
+    follow the order in which targets first appear.
+    """
+    rows = list(transitions.values())
+    sources = [id_lookup[name] for name in transitions]
+    targets = list(rows[0]) if rows else []
+
+    if all(list(row) == targets for row in rows):
+        values = np.fromiter(
+            chain.from_iterable(map(dict.values, rows)),
+            dtype=float,
+            count=len(rows) * len(targets)
+        )
+        matrix = values.reshape(len(rows), len(targets))
+    else:
+        targets = list(dict.fromkeys(chain.from_iterable(rows)))
+        positions = {name: i for i, name in enumerate(targets)}
+        matrix = np.zeros((len(rows), len(targets)))
+        for i, row in enumerate(rows):
+            columns = [positions[name] for name in row]
+            matrix[i, columns] = np.fromiter(row.values(), dtype=float, count=len(row))
+
+    return (
+        np.array(sources, dtype=np.int64),
+        np.array([id_lookup[name] for name in targets], dtype=np.int64),
+        matrix
+    )
+
+
+def response_arrays(
+    response_data: Dict[str, Any],
+    id_lookup: Dict[str, int]
+) -> ResponseArrays:
+    """
+    Convert an API response into dense arrays.
+
+    Args:
+        response_data: Raw API response
+        id_lookup: Dictionary mapping job names to IDs
+
+    Returns:
+        The response as arrays, with the job ID of every row and column
+    """
+    shortages = response_data["shortages_by_job"]
+    components = response_data["shortage_components"]
+    source_ids, target_ids, transitions = _transition_arrays(
+        response_data["transitions"], id_lookup
+    )
+
+    return ResponseArrays(
+        shortage_ids=np.array([id_lookup[name] for name in shortages], dtype=np.int64),
+        shortages=np.fromiter(shortages.values(), dtype=float, count=len(shortages)),
+        component_ids=np.array([id_lookup[name] for name in components], dtype=np.int64),
+        components=np.array(
+            [[values[field] for field in COMPONENTS] for values in components.values()],
+            dtype=float
+        ).reshape(len(components), len(COMPONENTS)),
+        source_ids=source_ids,
+        target_ids=target_ids,
+        transitions=transitions
+    )
+
+
+def workforce_metrics(arrays: ResponseArrays) -> np.ndarray:
+    """
+    Return the rounded workforce metrics of every job in the response.
+
+    Args:
+        arrays: Response arrays
+
+    Returns:
+        Integer array of jobs x METRICS, per entry of component_ids
+    """
+    values = arrays.components.copy()
+    values[:, EXPANSION] = np.maximum(values[:, EXPANSION], 0)
+    values[:, REDUCTION] = np.minimum(values[:, REDUCTION], 0)
+    return _round(values)
+
+
+def top_transitions(
+    arrays: ResponseArrays,
+    top_n: int = 10
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Select the largest transitions between different jobs.
+
+    Transitions are ranked by rounded amount, ties by their position in the
+    matrix, matching a stable sort of the flattened response. Only the top_n
+    candidates are sorted.
+
+    Args:
+        arrays: Response arrays
+        top_n: Number of transitions to return
+
+    Returns:
+        Source job IDs, target job IDs and rounded amounts, largest first
+    """
+    matrix = arrays.transitions
+    candidates = (matrix > 0) & (arrays.source_ids[:, None] != arrays.target_ids[None, :])
+    positions = np.flatnonzero(candidates)
+    amounts = _round(matrix.ravel()[positions])
+
+    if len(amounts) > top_n:
+        # Keep everything above the top_n-th largest amount, then the
+        # earliest transitions equal to it; positions are ascending
+        threshold = np.partition(amounts, len(amounts) - top_n)[len(amounts) - top_n]
+        above = np.flatnonzero(amounts > threshold)
+        tied = np.flatnonzero(amounts == threshold)[:top_n - len(above)]
+        keep = np.concatenate([above, tied])
+        positions, amounts = positions[keep], amounts[keep]
+
+    ranking = np.lexsort((positions, -amounts))
+    positions, amounts = positions[ranking], amounts[ranking]
+    rows, columns = np.divmod(positions, matrix.shape[1])
+    return arrays.source_ids[rows], arrays.target_ids[columns], amounts
+
+
+def _top_per_row(
+    amounts: np.ndarray,
+    row_ids: np.ndarray,
+    column_ids: np.ndarray,
+    num_jobs: int,
+    top_k: int
+) -> Dict[str, List[int]]:
+    """
+    Select the top_k largest amounts of every row as an offsets table.
+
+    Amounts are rounded, with -1 for pairs that are not a transition. Ties
+    are broken by column position, like the stable sort of top_transitions.
+    """
+    num_columns = amounts.shape[1]
+    top_k = min(top_k, num_columns)
+    # A single integer score per pair orders by amount, then column position
+    scores = amounts * num_columns + (num_columns - 1 - np.arange(num_columns))
+    if top_k < num_columns:
+        selected = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    else:
+        selected = np.broadcast_to(np.arange(num_columns), amounts.shape)
+    ranking = np.argsort(-np.take_along_axis(scores, selected, axis=1), axis=1)
+    selected = np.take_along_axis(selected, ranking, axis=1)
+    values = np.take_along_axis(amounts, selected, axis=1)
+
+    counts = np.zeros(num_jobs, dtype=np.int64)
+    counts[row_ids] = (values >= 0).sum(axis=1)
+    # Rows are stored in job ID order, each with its selected columns
+    rows = np.argsort(row_ids, kind="stable")
+    valid = values[rows] >= 0
+    return {
+        "offsets": np.concatenate([[0], np.cumsum(counts)]).tolist(),
+        "jobId": column_ids[selected[rows][valid]].tolist(),
+        "amount": values[rows][valid].tolist()
+    }
+
+
+def job_transitions(
+    arrays: ResponseArrays,
+    num_jobs: int,
+    top_k: int = DEFAULT_JOB_TRANSITIONS
+) -> Dict[str, Dict[str, List[int]]]:
+    """
+    Select the largest inbound and outbound transitions of every job.
+
+    Each direction is an offsets table indexed by job ID: the transitions
+    of job i are entries offsets[i] up to offsets[i + 1] of jobId and amount.
+    jobId is the target of outbound and the source of inbound transitions.
+
+    Args:
+        arrays: Response arrays
+        num_jobs: Number of job IDs, including the total
+        top_k: Number of transitions to keep per job and direction
+
+    Returns:
+        Dictionary with the "outbound" and "inbound" offsets tables
+    """
+    matrix = arrays.transitions
+    candidates = (matrix > 0) & (arrays.source_ids[:, None] != arrays.target_ids[None, :])
+    amounts = np.where(candidates, _round(np.where(candidates, matrix, 0)), -1)
+    return {
+        "outbound": _top_per_row(
+            amounts, arrays.source_ids, arrays.target_ids, num_jobs, top_k
+        ),
+        "inbound": _top_per_row(
+            amounts.T, arrays.target_ids, arrays.source_ids, num_jobs, top_k
+        )
+    }
+
+
+def process_response(
+    response_data: Dict[str, Any],
+    id_lookup: Dict[str, int],
+    total_id: int,
+    top_n: int = 10,
+    job_top_k: int = DEFAULT_JOB_TRANSITIONS
+) -> Dict[str, Any]:
+    """
+    Process a single API response into the columnar results format.
+
+    Args:
+        response_data: Raw API response
+        id_lookup: Dictionary mapping job names to IDs, numbering every
+            job including the total from 0
+        total_id: Job ID of the total
+        top_n: Number of top transitions to keep
+        job_top_k: Number of transitions to keep per job and direction, or
+            0 to leave out jobTransitions
+
+    Returns:
+        Scenario result in columnar format
+    """
+    num_jobs = len(id_lookup)
+    arrays = response_arrays(response_data, id_lookup)
+
+    positive = arrays.shortages > 0
+    shortage_ids = arrays.shortage_ids[positive]
+    shortages = _round(arrays.shortages[positive])
+
+    sources, targets, amounts = top_transitions(arrays, top_n)
+
+    metrics = workforce_metrics(arrays)
+    columns = np.zeros((len(METRICS), num_jobs), dtype=np.int64)
+    columns[:, arrays.component_ids] = metrics.T
+    columns[:, total_id] = metrics.sum(axis=0)
+
+    workforce_changes: List[List[Any]] = columns.tolist()
+    present = np.zeros(num_jobs, dtype=bool)
+    present[arrays.component_ids] = True
+    present[total_id] = True
+    for job_id in np.flatnonzero(~present).tolist():
+        for column in workforce_changes:
+            column[job_id] = None
+
+    result = {
+        "remainingShortages": {
+            "jobId": shortage_ids.tolist(),
+            "shortage": shortages.tolist()
+        },
+        "topTransitions": {
+            "sourceJobId": sources.tolist(),
+            "targetJobId": targets.tolist(),
+            "amount": amounts.tolist()
+        },
+        "workforceChanges": workforce_changes
+    }
+    if job_top_k > 0:
+        result["jobTransitions"] = job_transitions(arrays, num_jobs, job_top_k)
+    return result
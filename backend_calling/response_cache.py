@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parent / "cache" / "responses.sqlite3"
+DEFAULT_TTL = 7 * 24 * 3600  # One week, in seconds
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024  # Compressed bytes
+
+
+def canonical_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Return request parameters in a canonical form.
+
+    JSON encoded parameter values are decoded and re-encoded with sorted keys,
+    so parameters that only differ in dictionary ordering compare equal.
+
+    Args:
+        params: Request parameters
+
+    Returns:
+        Dictionary of canonical parameters, sorted by name
+    """
+    canonical = {}
+    for name in sorted(params):
+        value = params[name]
+        if isinstance(value, str):
+            try:
+                value = json.dumps(json.loads(value), sort_keys=True)
+            except ValueError:
+                pass
+        canonical[name] = value
+    return canonical
+
+
+def request_key(url: str, params: Dict[str, Any]) -> str:
+    """
+    Return a content hash identifying a request.
+
+    Args:
+        url: URL of the endpoint
+        params: Request parameters
+
+    Returns:
+        Hex encoded SHA-256 of the canonical request
+    """
+    payload = json.dumps(
+        {"url": url, "params": canonical_params(params)},
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    A persistent cache of optimize responses, keyed by request content hash.
+
+    Responses are stored zlib-compressed in SQLite. Entries older than the
+    TTL are treated as misses, and the least recently used entries are
+    evicted once the total compressed size exceeds the size limit.
+
+    Attributes:
+        hits: Number of lookups answered from the cache
+        misses: Number of lookups not found in the cache or expired
+        writes: Number of responses stored
+        evictions: Number of entries removed for age or size
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path] = DEFAULT_CACHE_PATH,
+        ttl: Optional[float] = DEFAULT_TTL,
+        max_size: Optional[int] = DEFAULT_MAX_SIZE,
+        refresh: bool = False
+    ) -> None:
+        """
+        Open or create the cache database.
+
+        Args:
+            path: Path to the SQLite database
+            ttl: Maximum age of an entry in seconds, or None to keep entries
+            max_size: Maximum total compressed size in bytes, or None for no limit
+            refresh: Ignore cached entries and overwrite them with new responses
+        """
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_size = max_size
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, "
+            "created_at REAL NOT NULL, "
+            "accessed_at REAL NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "body BLOB NOT NULL)"
+        )
+        self._connection.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached response for a key.
+
+        Args:
+            key: Request key from request_key()
+
+        Returns:
+            Cached response, or None on a miss
+        """
+        with self._lock:
+            if self.refresh:
+                self.misses += 1
+                return None
+
+            row = self._connection.execute(
+                "SELECT created_at, body FROM responses WHERE key = ?",
+                (key,)
+            ).fetchone()
+            now = time.time()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            if self.ttl is not None and now - row[0] > self.ttl:
+                self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._connection.commit()
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                (now, key)
+            )
+            self._connection.commit()
+            self.hits += 1
+
+        return json.loads(zlib.decompress(row[1]).decode("utf-8"))
+
+    def contains(self, key: str) -> bool:
+        """
+        Return whether get() would return a response for a key.
+
+        Lookup statistics and access times are not affected.
+
+        Args:
+            key: Request key from request_key()
+        """
+        if self.refresh:
+            return False
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT created_at FROM responses WHERE key = ?",
+                (key,)
+            ).fetchone()
+        return row is not None and (self.ttl is None or time.time() - row[0] <= self.ttl)
+
+    def put(self, key: str, response: Dict[str, Any]) -> None:
+        """
+        Store a response and evict old entries if the cache is too large.
+
+        Args:
+            key: Request key from request_key()
+            response: Response to store
+        """
+        body = zlib.compress(json.dumps(response).encode("utf-8"))
+        now = time.time()
+
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, now, now, len(body), body)
+            )
+            self.writes += 1
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self) -> None:
+        """Remove expired entries and the least recently used entries over the size limit."""
+        if self.ttl is not None:
+            cursor = self._connection.execute(
+                "DELETE FROM responses WHERE created_at < ?",
+                (time.time() - self.ttl,)
+            )
+            self.evictions += cursor.rowcount
+
+        if self.max_size is None:
+            return
+
+        total = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        if total <= self.max_size:
+            return
+
+        rows = self._connection.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        ).fetchall()
+        for key, size in rows:
+            if total <= self.max_size:
+                break
+            self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def iter_items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Yield every cached response with its request key, regardless of age.
+
+        Lookup statistics and access times are not affected.
+
+        Yields:
+            Request keys and cached responses, in insertion order
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT key, body FROM responses ORDER BY rowid"
+            ).fetchall()
+        for key, body in rows:
+            yield key, json.loads(zlib.decompress(body).decode("utf-8"))
+
+    def hit_ratio(self) -> float:
+        """Return the fraction of lookups answered from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def summary(self) -> str:
+        """Return a one-line summary of the cache statistics."""
+        return (
+            f"Response cache: {self.hits} hits, {self.misses} misses "
+            f"({self.hit_ratio():.0%} hit ratio), {self.writes} writes, "
+            f"{self.evictions} evictions"
+        )
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional, Sequence
+
+# Version 1 is the original row format: a dictionary of scenario results
+FORMAT_VERSION = 2
+
+# Scenario shown on first paint, matching the initial settings of the frontend
+DEFAULT_SCENARIO = "1.0-with-everyone-standard-standard"
+
+# Order of the metric arrays in a columnar workforceChanges entry
+METRICS = (
+    "labor_supply",
+    "net_labor_change",
+    "transitions_in",
+    "transitions_out",
+    "superfluous_workers",
+    "shortage",
+    "productivity",
+    "expansion_demand",
+    "reduction_demand",
+    "vacancies",
+)
+
+
+def encode_result(result: Dict[str, Any], num_jobs: int) -> Dict[str, Any]:
+    """
+    Convert a row format scenario result into the columnar format.
+
+    Lists of records become one array per field, and workforceChanges becomes
+    one array per metric, in METRICS order, indexed by job ID. Jobs without
+    workforce changes are null in every metric array. jobTransitions is
+    already id-indexed and is kept as is.
+
+    Args:
+        result: Scenario result in row format
+        num_jobs: Number of job IDs, including the total
+
+    Returns:
+        Scenario result in columnar format
+    """
+    shortages = result["remainingShortages"]
+    transitions = result["topTransitions"]
+
+    workforce_changes: List[List[Optional[int]]] = [
+        [None] * num_jobs for _ in METRICS
+    ]
+    for job_id, metrics in result["workforceChanges"].items():
+        for column, metric in zip(workforce_changes, METRICS):
+            column[int(job_id)] = metrics[metric]
+
+    encoded = {
+        "remainingShortages": {
+            "jobId": [s["jobId"] for s in shortages],
+            "shortage": [s["shortage"] for s in shortages]
+        },
+        "topTransitions": {
+            "sourceJobId": [t["sourceJobId"] for t in transitions],
+            "targetJobId": [t["targetJobId"] for t in transitions],
+            "amount": [t["amount"] for t in transitions]
+        },
+        "workforceChanges": workforce_changes
+    }
+    for field in ("jobTransitions", "addedValueChangePercent"):
+        if field in result:
+            encoded[field] = result[field]
+    return encoded
+
+
+def decode_result(
+    encoded: Dict[str, Any],
+    metrics: Sequence[str] = METRICS
+) -> Dict[str, Any]:
+    """
+    Convert a columnar scenario result back into the row format.
+
+    Args:
+        encoded: Scenario result in columnar format
+        metrics: Metric names in the order of the workforceChanges arrays
+
+    Returns:
+        Scenario result in row format
+    """
+    shortages = encoded["remainingShortages"]
+    transitions = encoded["topTransitions"]
+    columns = encoded["workforceChanges"]
+
+    result = {
+        "remainingShortages": [
+            {"jobId": job_id, "shortage": shortage}
+            for job_id, shortage in zip(shortages["jobId"], shortages["shortage"])
+        ],
+        "topTransitions": [
+            {"sourceJobId": source, "targetJobId": target, "amount": amount}
+            for source, target, amount in zip(
+                transitions["sourceJobId"],
+                transitions["targetJobId"],
+                transitions["amount"]
+            )
+        ],
+        "workforceChanges": {
+            str(job_id): dict(zip(metrics, values))
+            for job_id, values in enumerate(zip(*columns))
+            if values[0] is not None
+        }
+    }
+    for field in ("jobTransitions", "addedValueChangePercent"):
+        if field in encoded:
+            result[field] = encoded[field]
+    return result
+
+
+def pad_result(result: Dict[str, Any], num_jobs: int) -> Dict[str, Any]:
+    """
+    Extend the job ID indexed arrays of a result to a number of job IDs.
+
+    Results processed before new jobs were registered have shorter arrays.
+    The added jobs are null in every metric array and have no transitions.
+
+    Args:
+        result: Scenario result in row or columnar format
+        num_jobs: Number of job IDs, including the total
+
+    Returns:
+        The result, or a padded copy when its arrays are shorter
+    """
+    columns = result["workforceChanges"]
+    if isinstance(columns, list) and len(columns[0]) < num_jobs:
+        result = {
+            **result,
+            "workforceChanges": [
+                column + [None] * (num_jobs - len(column)) for column in columns
+            ]
+        }
+    tables = result.get("jobTransitions")
+    if tables and len(tables["outbound"]["offsets"]) <= num_jobs:
+        result = {
+            **result,
+            "jobTransitions": {
+                direction: {
+                    **table,
+                    "offsets": table["offsets"]
+                    + [table["offsets"][-1]] * (num_jobs + 1 - len(table["offsets"]))
+                }
+                for direction, table in tables.items()
+            }
+        }
+    return result
+
+
+def encode_delta(
+    scenario: Dict[str, Any],
+    base: Dict[str, Any],
+    base_key: str
+) -> Dict[str, Any]:
+    """
+    Encode a columnar scenario as the difference from another scenario.
+
+    Fields equal to the base are left out. workforceChanges lists only the
+    changed entries, as job IDs and values per metric index. A scenario is
+    kept in full when the delta would not be smaller.
+
+    Args:
+        scenario: Columnar scenario result to encode
+        base: Columnar scenario result to encode against
+        base_key: Settings key of the base scenario
+
+    Returns:
+        Delta encoded scenario with a "base" key, or the scenario itself
+    """
+    delta: Dict[str, Any] = {"base": base_key}
+    for field in (
+        "remainingShortages",
+        "topTransitions",
+        "jobTransitions",
+        "addedValueChangePercent"
+    ):
+        if field in scenario and scenario[field] != base.get(field):
+            delta[field] = scenario[field]
+
+    columns = scenario["workforceChanges"]
+    base_columns = base["workforceChanges"]
+    if [len(c) for c in columns] != [len(c) for c in base_columns]:
+        delta["workforceChanges"] = columns
+    else:
+        changes = {}
+        for metric, (column, base_column) in enumerate(zip(columns, base_columns)):
+            job_ids = [
+                job_id for job_id, (value, base_value) in enumerate(zip(column, base_column))
+                if value != base_value
+            ]
+            if job_ids:
+                changes[str(metric)] = [job_ids, [column[job_id] for job_id in job_ids]]
+        if changes:
+            delta["workforceChanges"] = changes
+
+    encoded_size = len(json.dumps(delta, separators=(",", ":")))
+    if encoded_size >= len(json.dumps(scenario, separators=(",", ":"))):
+        return scenario
+    return delta
+
+
+def encode_deltas(
+    scenarios: Dict[str, Dict[str, Any]],
+    parents: Dict[str, str]
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Delta encode columnar scenarios against their parents.
+
+    Args:
+        scenarios: Columnar scenario results by settings key
+        parents: Settings key of the base for each delta encoded scenario
+
+    Returns:
+        Scenario results by settings key, in the original order
+    """
+    return {
+        key: (
+            encode_delta(scenario, scenarios[parents[key]], parents[key])
+            if key in parents else scenario
+        )
+        for key, scenario in scenarios.items()
+    }
+
+
+def apply_delta(base: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reconstruct a columnar scenario from its base and its delta.
+
+    Args:
+        base: Full columnar scenario result of the base
+        delta: Delta encoded scenario result
+
+    Returns:
+        Full columnar scenario result
+    """
+    scenario = {
+        field: value for field, value in base.items()
+        if field != "workforceChanges"
+    }
+    scenario.update(
+        (field, value) for field, value in delta.items()
+        if field not in ("base", "workforceChanges")
+    )
+
+    changes = delta.get("workforceChanges")
+    if isinstance(changes, list):
+        scenario["workforceChanges"] = changes
+    else:
+        columns = [list(column) for column in base["workforceChanges"]]
+        for metric, (job_ids, values) in (changes or {}).items():
+            column = columns[int(metric)]
+            for job_id, value in zip(job_ids, values):
+                column[job_id] = value
+        scenario["workforceChanges"] = columns
+    return scenario
+
+
+def resolve_deltas(scenarios: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Reconstruct all delta encoded scenarios.
+
+    Args:
+        scenarios: Columnar scenario results, some of which may be deltas
+
+    Returns:
+        Full columnar scenario results by settings key, in the original order
+    """
+    resolved: Dict[str, Dict[str, Any]] = {}
+
+    def resolve(key: str) -> Dict[str, Any]:
+        if key not in resolved:
+            scenario = scenarios[key]
+            if "base" in scenario:
+                scenario = apply_delta(resolve(scenario["base"]), scenario)
+            resolved[key] = scenario
+        return resolved[key]
+
+    return {key: resolve(key) for key in scenarios}
+
+
+def wrap_results(scenarios: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Wrap columnar scenario results in a versioned container.
+
+    Args:
+        scenarios: Columnar scenario results by settings key
+
+    Returns:
+        Container with the format version, metric order and scenarios
+    """
+    return {
+        "version": FORMAT_VERSION,
+        "metrics": list(METRICS),
+        "scenarios": scenarios
+    }
+
+
+def unwrap_results(data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Return row format scenario results from published model results.
+
+    Args:
+        data: Published model results, in either format version
+
+    Returns:
+        Row format scenario results by settings key
+    """
+    if "version" not in data:
+        return data
+    if data["version"] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model results version {data['version']}")
+    return {
+        key: decode_result(encoded, data["metrics"])
+        for key, encoded in resolve_deltas(data["scenarios"]).items()
+    }
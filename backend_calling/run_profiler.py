@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import json
+import logging
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Sequence, Union
+
+logger = logging.getLogger(__name__)
+
+# Number of slowest combinations listed in the report
+SLOWEST = 10
+# Number of functions and allocation sites listed from cProfile and tracemalloc
+TOP_ENTRIES = 25
+
+# From Python 3.12 a cProfile profiler covers every thread, and only one
+# may be enabled at a time; before that each thread needs its own
+PROFILE_PER_THREAD = sys.version_info < (3, 12)
+
+_local = threading.local()
+
+
+class _Frame:
+    """A running timed() block."""
+
+    __slots__ = ("stage", "start", "children")
+
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+        self.start = time.perf_counter()
+        self.children = 0.0
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """
+    Time a block of code for the combination active on this thread.
+
+    Nested blocks are subtracted from the enclosing block, so every stage
+    only counts its own time. Without an active combination this does
+    nothing, so instrumented code can be used without a profiler.
+
+    Args:
+        stage: Name of the stage the block belongs to
+    """
+    active = getattr(_local, "active", None)
+    if active is None:
+        yield
+        return
+
+    profiler, key, frames = active
+    frame = _Frame(stage)
+    frames.append(frame)
+    try:
+        yield
+    finally:
+        frames.pop()
+        elapsed = time.perf_counter() - frame.start
+        if frames:
+            frames[-1].children += elapsed
+        profiler.add(key, stage, elapsed - frame.children)
+
+
+def count(metric: str, value: float) -> None:
+    """
+    Add a value to a metric of the combination active on this thread.
+
+    Args:
+        metric: Name of the metric, such as "response_bytes"
+        value: Value to add
+    """
+    active = getattr(_local, "active", None)
+    if active is not None:
+        profiler, key, _ = active
+        profiler.add(key, metric, value)
+
+
+def _percentile(values: Sequence[float], q: float) -> float:
+    """Return a percentile of sorted values, interpolating between ranks."""
+    position = (len(values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def _distribution(values: List[float]) -> Dict[str, float]:
+    """Summarize values with their total, mean and percentiles."""
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "total": sum(values),
+        "mean": sum(values) / len(values),
+        "p50": _percentile(values, 0.5),
+        "p90": _percentile(values, 0.9),
+        "p99": _percentile(values, 0.99),
+        "max": values[-1],
+    }
+
+
+class RunProfiler:
+    """
+    Collects per-combination timings and metrics of a sweep.
+
+    Work for a combination is attributed to it by running it inside
+    combination(), on whichever thread it runs. Stages are timed with
+    timed() and metrics added with count(), anywhere in the call tree.
+    Optionally each combination also runs under cProfile, and memory
+    allocations are traced for the whole run.
+
+    Attributes:
+        records: Stage seconds and metrics by settings key
+    """
+
+    # Stages reported in seconds; every other entry is a metric
+    STAGES = (
+        "cache",
+        "params",
+        "excel",
+        "rate_limit",
+        "request",
+        "backoff",
+        "parse",
+        "process",
+        "checkpoint",
+    )
+
+    def __init__(self, cprofile: bool = False, trace_memory: bool = False) -> None:
+        """
+        Initialize the profiler.
+
+        Args:
+            cprofile: Whether to run every combination under cProfile
+            trace_memory: Whether to trace memory allocations with tracemalloc
+        """
+        self.cprofile = cprofile
+        self.trace_memory = trace_memory
+        self.records: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._profiles: List[cProfile.Profile] = []
+        self._thread_profiles = threading.local()
+        self._started = time.time()
+        self._start = time.perf_counter()
+        if cprofile and not PROFILE_PER_THREAD:
+            self._profiles.append(cProfile.Profile())
+            self._profiles[0].enable()
+        if trace_memory:
+            tracemalloc.start()
+
+    def add(self, key: str, name: str, value: float) -> None:
+        """Add a value to a stage or metric of a combination."""
+        with self._lock:
+            record = self.records.setdefault(key, {})
+            record[name] = record.get(name, 0.0) + value
+
+    @contextmanager
+    def combination(self, key: str) -> Iterator[None]:
+        """
+        Attribute the work in the block to a combination.
+
+        Args:
+            key: Settings key of the combination
+        """
+        previous = getattr(_local, "active", None)
+        _local.active = (self, key, [])
+
+        profile = None
+        if self.cprofile and PROFILE_PER_THREAD and previous is None:
+            profile = getattr(self._thread_profiles, "profile", None)
+            if profile is None:
+                profile = self._thread_profiles.profile = cProfile.Profile()
+                with self._lock:
+                    self._profiles.append(profile)
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            _local.active = previous
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Build the run report.
+
+        Returns:
+            Dictionary with the run duration, the distribution of every
+            stage and metric, the slowest combinations, per-combination
+            records and, when traced, memory usage
+        """
+        with self._lock:
+            records = {key: dict(record) for key, record in self.records.items()}
+
+        names = sorted({name for record in records.values() for name in record})
+        totals = {
+            key: sum(value for name, value in record.items() if name in self.STAGES)
+            for key, record in records.items()
+        }
+        slowest = sorted(totals, key=totals.__getitem__, reverse=True)[:SLOWEST]
+
+        report = {
+            "started": self._started,
+            "duration": time.perf_counter() - self._start,
+            "combinations": len(records),
+            "stages": {
+                name: _distribution([r[name] for r in records.values() if name in r])
+                for name in names if name in self.STAGES
+            },
+            "metrics": {
+                name: _distribution([r[name] for r in records.values() if name in r])
+                for name in names if name not in self.STAGES
+            },
+            "slowest": [
+                {"key": key, "total": totals[key], **records[key]}
+                for key in slowest
+            ],
+            "records": records
+        }
+
+        if self.trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:TOP_ENTRIES]
+            report["memory"] = {
+                "current_bytes": current,
+                "peak_bytes": peak,
+                "top": [
+                    {"location": str(stat.traceback), "bytes": stat.size, "count": stat.count}
+                    for stat in top
+                ]
+            }
+        return report
+
+    def summary(self) -> str:
+        """Return the per-stage percentiles as log lines."""
+        stages = self.report()["stages"]
+        lines = [f"Stage timings over {len(self.records)} combinations (seconds):"]
+        for name in self.STAGES:
+            if name in stages:
+                s = stages[name]
+                lines.append(
+                    f"  {name:<11} total {s['total']:8.2f}  p50 {s['p50']:7.3f}  "
+                    f"p90 {s['p90']:7.3f}  p99 {s['p99']:7.3f}  max {s['max']:7.3f}"
+                )
+        return "\n".join(lines)
+
+    def write(self, path: Union[str, Path]) -> None:
+        """
+        Write the run report as JSON, and the cProfile statistics next to it.
+
+        With cProfile the combined statistics of all threads are dumped to
+        a .prof file, for pstats or snakeviz, and the top functions by
+        cumulative time are written to a .txt file.
+
+        Args:
+            path: Path of the JSON report
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+        if self._profiles:
+            if not PROFILE_PER_THREAD:
+                self._profiles[0].disable()
+            stats = pstats.Stats(*self._profiles)
+            stats.dump_stats(path.with_suffix(".prof"))
+            text = io.StringIO()
+            pstats.Stats(*self._profiles, stream=text).sort_stats("cumulative").print_stats(TOP_ENTRIES)
+            path.with_suffix(".txt").write_text(text.getvalue(), encoding="utf-8")
+        logger.info(f"Wrote run report to {path}")
+
+    def close(self) -> None:
+        """Stop profiling and tracing memory allocations."""
+        if self.cprofile and not PROFILE_PER_THREAD:
+            self._profiles[0].disable()
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import argparse
+import logging
+import warnings
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional
+
+import numpy as np
+
+from output_writer import write_json
+from job_registry import TOTAL_JOB
+from results_format import DEFAULT_SCENARIO, METRICS, encode_result
+from scenario_query import load_published
+
+logger = logging.getLogger(__name__)
+
+AGGREGATES_VERSION = 1
+AGGREGATES_NAME = "model-aggregates.json"
+# Metrics aggregated per job: the workforce metrics and the remaining shortage
+AGGREGATE_METRICS = METRICS + ("remaining_shortage",)
+# Scenario totals that scenarios are ranked by, and whether lower ranks better
+RANKED = {
+    "shortage": True,
+    "addedValueChangePercent": False,
+}
+# Decimals of the published means and percentages; other values are integers
+DECIMALS = 4
+# Scenario totals that are percentages rather than worker counts
+PERCENTAGES = ("addedValueChangePercent",)
+
+
+def result_matrix(
+    results: Mapping[str, Dict[str, Any]],
+    num_jobs: int,
+    total_id: int
+) -> np.ndarray:
+    """
+    Stack scenario results into one (scenario, job, metric) array.
+
+    The metrics are AGGREGATE_METRICS. Values absent from a result are NaN,
+    so they drop out of every aggregate. That includes the remaining
+    shortage of jobs without workforce changes; the remaining shortage of
+    other jobs not in remainingShortages is 0. The remaining shortage of the
+    total is the sum of the remaining shortages of all jobs.
+
+    Args:
+        results: Scenario results in row or columnar format, by settings key
+        num_jobs: Number of job IDs, including the total
+        total_id: Job ID of the total
+
+    Returns:
+        Float array with one row per result, in the order of results
+    """
+    matrix = np.full((len(results), num_jobs, len(AGGREGATE_METRICS)), np.nan)
+    for row, result in enumerate(results.values()):
+        if isinstance(result["workforceChanges"], dict):
+            result = encode_result(result, num_jobs)
+        # None converts to NaN
+        matrix[row, :, :-1] = np.array(result["workforceChanges"], dtype=float).T
+        shortages = result["remainingShortages"]
+        remaining = matrix[row, :, -1]
+        remaining[:] = np.where(np.isnan(matrix[row, :, 0]), np.nan, 0)
+        remaining[shortages["jobId"]] = shortages["shortage"]
+        remaining[total_id] = np.nansum(remaining)
+    return matrix
+
+
+def _rank(values: np.ndarray, ascending: bool) -> np.ndarray:
+    """Return the competition rank of every value, NaN for NaN values."""
+    keys = values if ascending else -values
+    present = ~np.isnan(keys)
+    ordered = np.sort(keys[present])
+    ranks = np.full(len(values), np.nan)
+    ranks[present] = np.searchsorted(ordered, keys[present], side="left") + 1
+    return ranks
+
+
+def to_json_lists(values: np.ndarray, decimals: Optional[int] = None) -> List[Any]:
+    """
+    Convert an array to nested lists of JSON values.
+
+    Args:
+        values: Array to convert
+        decimals: Decimals to round to, or None for integers
+
+    Returns:
+        Nested lists with None for NaN
+    """
+    if values.ndim > 1:
+        return [to_json_lists(row, decimals) for row in values]
+    if decimals is not None:
+        return [None if np.isnan(v) else round(v, decimals) for v in values.tolist()]
+    return [None if np.isnan(v) else int(v) for v in values.tolist()]
+
+
+def compute_aggregates(
+    results: Mapping[str, Dict[str, Any]],
+    job_lookup: Mapping[int, str],
+    default_scenario: str = DEFAULT_SCENARIO
+) -> Dict[str, Any]:
+    """
+    Compute the cross-scenario aggregates of a set of results.
+
+    Per job and metric, the minimum, maximum and mean over all scenarios
+    and the positions of the scenarios with the minimum and maximum. Per
+    scenario, the totals of every metric and addedValueChangePercent, their
+    difference from the default scenario, and the rank of every scenario by
+    the RANKED totals, where 1 is the lowest shortage or the highest added
+    value. Equal totals share a rank.
+
+    Job aggregates are arrays per metric, in AGGREGATE_METRICS order,
+    indexed by job ID, like columnar workforceChanges. Scenario aggregates
+    are arrays in the order of "scenarios". Missing values are null.
+
+    Args:
+        results: Full (not delta) scenario results by settings key
+        job_lookup: Job labels by job ID, including the total
+        default_scenario: Settings key the deltas are taken against
+
+    Returns:
+        Aggregates document
+    """
+    if not results:
+        raise ValueError("No results to aggregate")
+    keys = list(results)
+    total_id = next(i for i, name in job_lookup.items() if name == TOTAL_JOB)
+    matrix = result_matrix(results, len(job_lookup), total_id)
+
+    # Jobs without a value in any scenario give all-NaN slices
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        low = np.nanmin(matrix, axis=0)
+        high = np.nanmax(matrix, axis=0)
+        mean = np.nanmean(matrix, axis=0)
+    empty = np.isnan(low)
+    low_at = np.where(empty, np.nan, np.argmin(np.where(np.isnan(matrix), np.inf, matrix), axis=0))
+    high_at = np.where(empty, np.nan, np.argmax(np.where(np.isnan(matrix), -np.inf, matrix), axis=0))
+
+    totals = {metric: matrix[:, total_id, column] for column, metric in enumerate(AGGREGATE_METRICS)}
+    totals["addedValueChangePercent"] = np.array(
+        [result.get("addedValueChangePercent", np.nan) for result in results.values()],
+        dtype=float
+    )
+
+    if default_scenario in results:
+        default = keys.index(default_scenario)
+        deltas = {name: values - values[default] for name, values in totals.items()}
+    else:
+        logger.warning(f"Default scenario {default_scenario} missing, skipping deltas")
+        default_scenario = None
+        deltas = {}
+
+    def scenario_values(values: Dict[str, np.ndarray]) -> Dict[str, List[Any]]:
+        return {
+            name: to_json_lists(v, DECIMALS if name in PERCENTAGES else None)
+            for name, v in values.items()
+        }
+
+    # Job aggregates are transposed to (metric, job)
+    return {
+        "version": AGGREGATES_VERSION,
+        "defaultScenario": default_scenario,
+        "scenarios": keys,
+        "metrics": list(AGGREGATE_METRICS),
+        "jobs": {
+            "min": to_json_lists(low.T),
+            "max": to_json_lists(high.T),
+            "mean": to_json_lists(mean.T, DECIMALS),
+            "minScenario": to_json_lists(low_at.T),
+            "maxScenario": to_json_lists(high_at.T)
+        },
+        "totals": scenario_values(totals),
+        "deltas": scenario_values(deltas),
+        "ranks": {
+            name: to_json_lists(_rank(totals[name], ascending))
+            for name, ascending in RANKED.items()
+        }
+    }
+
+
+def write_aggregates(
+    output_dir: Path,
+    results: Mapping[str, Dict[str, Any]],
+    job_lookup: Mapping[int, str],
+    default_scenario: str = DEFAULT_SCENARIO,
+    indent: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Compute the aggregates of a set of results and write them, plain and compressed.
+
+    Args:
+        output_dir: Directory to write AGGREGATES_NAME to
+        results: Full (not delta) scenario results by settings key
+        job_lookup: Job labels by job ID, including the total
+        default_scenario: Settings key the deltas are taken against
+        indent: Number of spaces to indent with, or None to minify
+
+    Returns:
+        The aggregates that were written
+    """
+    aggregates = compute_aggregates(results, job_lookup, default_scenario)
+    write_json(output_dir / AGGREGATES_NAME, aggregates, indent=indent, depth=2)
+    logger.info(f"Wrote aggregates of {len(results)} scenarios to {output_dir / AGGREGATES_NAME}")
+    return aggregates
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Compute the cross-scenario aggregates of the published results."
+    )
+    parser.add_argument(
+        "--dir",
+        type=Path,
+        default=Path("../public"),
+        help="Directory the results were published to"
+    )
+    parser.add_argument(
+        "--pretty",
+        action="store_true",
+        help="Indent the JSON output instead of minifying it"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    results, job_lookup = load_published(args.dir)
+    write_aggregates(args.dir, results, job_lookup, indent=2 if args.pretty else None)
+
+
+if __name__ == "__main__":
+    main()
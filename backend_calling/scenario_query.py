@@ -0,0 +1,476 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import gzip
+import json
+import logging
+import math
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, TextIO, Tuple, Union
+
+import numpy as np
+
+from job_names import job_name_mapping
+from results_format import DEFAULT_SCENARIO, METRICS, unwrap_results, wrap_results
+from scenario_tensor import axis_label
+from shards import MANIFEST_NAME
+from sweep import Combination
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTPUT_DIR = Path("../public")
+# Per-job values that can be queried: the workforce metrics and the remaining shortage
+QUERY_METRICS = METRICS + ("remaining_shortage",)
+SETTINGS = Combination._fields
+FORMATS = ("csv", "json")
+
+Row = Dict[str, Any]
+
+
+def display_name(label: str) -> str:
+    """Return a published job label without its line break hints."""
+    return label.replace("\\-\n", "").replace("\n", " ")
+
+
+def _read_json(path: Path) -> Any:
+    """Read a JSON file, or its gzip version when only that was published."""
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    gz_path = path.with_name(path.name + ".gz")
+    if gz_path.exists():
+        with gzip.open(gz_path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+    raise ValueError(f"{path} does not exist")
+
+
+def _setting_label(field: str, value: Any) -> str:
+    """Return the label of a setting value, as in settings keys."""
+    if field == "productivity" and not isinstance(value, bool):
+        return str(float(value))
+    return axis_label(value)
+
+
+def _number(value: float) -> Optional[Union[int, float]]:
+    """Return a value for output: None when missing, an int when integral."""
+    if math.isnan(value):
+        return None
+    return int(value) if float(value).is_integer() else float(value)
+
+
+def load_published(output_dir: Path) -> Tuple[Dict[str, Dict[str, Any]], Dict[int, str]]:
+    """
+    Read published model results and job names.
+
+    Reads model-results.json, plain or gzipped, in either format version,
+    or the shards listed in the shard manifest when only those exist.
+
+    Args:
+        output_dir: Directory the results were published to
+
+    Returns:
+        Row format scenario results by settings key, and job labels by job ID
+    """
+    job_lookup = {int(i): name for i, name in _read_json(output_dir / "job-names.json").items()}
+    try:
+        data = _read_json(output_dir / "model-results.json")
+    except ValueError:
+        manifest = _read_json(output_dir / MANIFEST_NAME)
+        scenarios: Dict[str, Dict[str, Any]] = {}
+        for shard in manifest["shards"]:
+            scenarios.update(_read_json(output_dir / shard)["scenarios"])
+        data = wrap_results(scenarios)
+    return unwrap_results(data), job_lookup
+
+
+class ScenarioIndex:
+    """
+    In-memory index of published scenario results for fast queries.
+
+    Scenarios are indexed by every setting, jobs by their published label,
+    their label without line break hints and their original name, and all
+    per-job values are held in one (scenario, job, metric) array, so
+    filters, rankings, diffs and series never rescan the results.
+
+    Attributes:
+        keys: Settings keys, in published order
+        job_names: Job names by job ID, without line break hints
+        values: Values by scenario, job ID and QUERY_METRICS index; NaN
+            where a job has no value
+        added_value: Change in added value per hour by settings key
+    """
+
+    def __init__(self, results: Dict[str, Dict[str, Any]], job_lookup: Dict[int, str]) -> None:
+        """
+        Build the index.
+
+        Args:
+            results: Row format scenario results by settings key
+            job_lookup: Published job labels by job ID
+        """
+        self.keys = list(results)
+        self._positions = {key: i for i, key in enumerate(self.keys)}
+        self.settings = {
+            key: {field: axis_label(getattr(Combination.from_key(key), field)) for field in SETTINGS}
+            for key in self.keys
+        }
+        self.labels: Dict[str, List[str]] = {
+            field: list(dict.fromkeys(settings[field] for settings in self.settings.values()))
+            for field in SETTINGS
+        }
+        self._by_setting: Dict[str, Dict[str, List[str]]] = {field: {} for field in SETTINGS}
+        for key, settings in self.settings.items():
+            for field, label in settings.items():
+                self._by_setting[field].setdefault(label, []).append(key)
+
+        num_jobs = max(job_lookup) + 1
+        self.job_names = [display_name(job_lookup.get(i, str(i))) for i in range(num_jobs)]
+        raw_names = {published: raw for raw, published in job_name_mapping.items()}
+        self._job_ids: Dict[str, int] = {}
+        for job_id, label in job_lookup.items():
+            for name in (label, display_name(label), raw_names.get(label, label)):
+                self._job_ids[name.casefold()] = job_id
+
+        self.values = np.full((len(self.keys), num_jobs, len(QUERY_METRICS)), np.nan)
+        self.added_value: Dict[str, Optional[float]] = {}
+        for position, (key, result) in enumerate(results.items()):
+            block = self.values[position]
+            for job_id, metrics in result["workforceChanges"].items():
+                block[int(job_id), :len(METRICS)] = [metrics[metric] for metric in METRICS]
+            block[:, -1] = 0
+            for shortage in result["remainingShortages"]:
+                block[shortage["jobId"], -1] = shortage["shortage"]
+            self.added_value[key] = result.get("addedValueChangePercent")
+
+    def metric_index(self, metric: str) -> int:
+        """Return the position of a metric in QUERY_METRICS."""
+        try:
+            return QUERY_METRICS.index(metric)
+        except ValueError:
+            raise ValueError(f"Unknown metric {metric!r}, expected one of {QUERY_METRICS}")
+
+    def job_id(self, job: Union[int, str]) -> int:
+        """
+        Return the ID of a job.
+
+        Args:
+            job: Job ID, or a job name; matching ignores case and line
+                break hints, and a fragment matching a single job is enough
+
+        Returns:
+            Job ID
+        """
+        if isinstance(job, int):
+            if not 0 <= job < len(self.job_names):
+                raise ValueError(f"Job ID {job} out of range")
+            return job
+        name = job.casefold()
+        if name in self._job_ids:
+            return self._job_ids[name]
+        matches = sorted({i for known, i in self._job_ids.items() if name in known})
+        if len(matches) == 1:
+            return matches[0]
+        if not matches:
+            raise ValueError(f"Unknown job {job!r}")
+        raise ValueError(
+            f"Job {job!r} is ambiguous: {', '.join(self.job_names[i] for i in matches)}"
+        )
+
+    def filter(self, **criteria: Union[Any, Sequence[Any]]) -> List[str]:
+        """
+        Return the settings keys of scenarios matching all criteria.
+
+        Args:
+            **criteria: Label or list of labels per setting, such as
+                priority="defense" or productivity=[0.5, 1.0]
+
+        Returns:
+            Matching settings keys, in published order
+        """
+        matching = None
+        for field, wanted in criteria.items():
+            if field not in SETTINGS:
+                raise ValueError(f"Unknown setting {field!r}, expected any of {SETTINGS}")
+            if wanted is None:
+                continue
+            if not isinstance(wanted, (list, tuple)):
+                wanted = [wanted]
+            keys = set()
+            for label in wanted:
+                keys.update(self._by_setting[field].get(_setting_label(field, label), ()))
+            matching = keys if matching is None else matching & keys
+        if matching is None:
+            return list(self.keys)
+        return [key for key in self.keys if key in matching]
+
+    def resolve(self, **settings: Any) -> str:
+        """
+        Return the settings key of a single scenario.
+
+        Settings that are not given are taken from DEFAULT_SCENARIO.
+
+        Args:
+            **settings: Label per setting
+
+        Returns:
+            Settings key of the scenario
+        """
+        combination = Combination.from_key(DEFAULT_SCENARIO)
+        labels = {field: axis_label(getattr(combination, field)) for field in SETTINGS}
+        labels.update(
+            (field, _setting_label(field, value))
+            for field, value in settings.items() if value is not None
+        )
+        key = "-".join(labels[field] for field in SETTINGS)
+        if key not in self._positions:
+            raise ValueError(f"No published scenario {key!r}")
+        return key
+
+    def scenarios(self, keys: Iterable[str]) -> List[Row]:
+        """Return the settings and added value change of scenarios."""
+        return [
+            {"key": key, **self.settings[key], "addedValueChangePercent": self.added_value[key]}
+            for key in keys
+        ]
+
+    def rank(
+        self,
+        key: str,
+        metric: str,
+        top: int = 10,
+        ascending: bool = False,
+        include_total: bool = False
+    ) -> List[Row]:
+        """
+        Rank the jobs of a scenario by a metric.
+
+        Args:
+            key: Settings key of the scenario
+            metric: Metric to rank by
+            top: Number of jobs to return
+            ascending: Rank the lowest values first
+            include_total: Rank the total row along with the jobs
+
+        Returns:
+            Rows with the rank, job and value
+        """
+        if key not in self._positions:
+            raise ValueError(f"No published scenario {key!r}")
+        values = self.values[self._positions[key], :, self.metric_index(metric)]
+        job_ids = [
+            i for i in np.flatnonzero(~np.isnan(values))
+            if include_total or self.job_names[i] != "Totaal"
+        ]
+        order = sorted(job_ids, key=lambda i: (values[i] if ascending else -values[i], i))
+        return [
+            {"rank": rank, "jobId": int(i), "job": self.job_names[i], metric: _number(values[i])}
+            for rank, i in enumerate(order[:top], start=1)
+        ]
+
+    def diff(
+        self,
+        key_a: str,
+        key_b: str,
+        metrics: Optional[Sequence[str]] = None,
+        top: Optional[int] = None
+    ) -> List[Row]:
+        """
+        Compare the per-job values of two scenarios.
+
+        Args:
+            key_a: Settings key of the first scenario
+            key_b: Settings key of the second scenario
+            metrics: Metrics to compare, defaults to all
+            top: Number of rows to return, defaults to all
+
+        Returns:
+            Rows for every changed job and metric, largest change first
+        """
+        for key in (key_a, key_b):
+            if key not in self._positions:
+                raise ValueError(f"No published scenario {key!r}")
+        columns = [self.metric_index(m) for m in (metrics or QUERY_METRICS)]
+        a = self.values[self._positions[key_a]][:, columns]
+        b = self.values[self._positions[key_b]][:, columns]
+        change = b - a
+        changed = np.argwhere((change != 0) & ~(np.isnan(a) & np.isnan(b)))
+        rows = [
+            {
+                "jobId": int(job_id),
+                "job": self.job_names[job_id],
+                "metric": QUERY_METRICS[columns[column]],
+                "a": _number(a[job_id, column]),
+                "b": _number(b[job_id, column]),
+                "change": _number(change[job_id, column])
+            }
+            for job_id, column in changed
+        ]
+        rows.sort(key=lambda row: -abs(row["change"]) if row["change"] is not None else 0)
+        return rows[:top] if top is not None else rows
+
+    def series(self, job: Union[int, str], dimension: str, metric: str, **settings: Any) -> List[Row]:
+        """
+        Return a job's value across every label of one setting.
+
+        Args:
+            job: Job ID or name
+            dimension: Setting to vary
+            metric: Metric to return
+            **settings: Label of the other settings, defaulting to
+                DEFAULT_SCENARIO
+
+        Returns:
+            Row per published label of the setting
+        """
+        if dimension not in SETTINGS:
+            raise ValueError(f"Unknown setting {dimension!r}, expected one of {SETTINGS}")
+        job_id = self.job_id(job)
+        column = self.metric_index(metric)
+        rows = []
+        for label in self.labels[dimension]:
+            try:
+                key = self.resolve(**{**settings, dimension: label})
+            except ValueError:
+                continue
+            value = self.values[self._positions[key], job_id, column]
+            rows.append({dimension: label, "key": key, "job": self.job_names[job_id], metric: _number(value)})
+        return rows
+
+
+@lru_cache(maxsize=4)
+def _cached_index(directory: str, stamp: Tuple[Tuple[str, int], ...]) -> ScenarioIndex:
+    """Build the index of a directory for one version of its files."""
+    results, job_lookup = load_published(Path(directory))
+    return ScenarioIndex(results, job_lookup)
+
+
+def load_index(output_dir: Union[str, Path] = DEFAULT_OUTPUT_DIR) -> ScenarioIndex:
+    """
+    Return the index of published results, building it once per session.
+
+    The index is rebuilt when any published results file changes.
+
+    Args:
+        output_dir: Directory the results were published to
+
+    Returns:
+        Scenario index
+    """
+    directory = Path(output_dir).resolve()
+    stamp = tuple(
+        (path.name, path.stat().st_mtime_ns)
+        for name in ("job-names.json", "model-results.json", MANIFEST_NAME)
+        for path in (directory / name, directory / f"{name}.gz")
+        if path.exists()
+    )
+    return _cached_index(str(directory), stamp)
+
+
+def write_rows(rows: List[Row], fmt: str = "csv", stream: TextIO = sys.stdout) -> None:
+    """
+    Write query results as CSV or JSON.
+
+    Args:
+        rows: Rows with the same fields
+        fmt: One of FORMATS
+        stream: Stream to write to
+    """
+    if fmt == "json":
+        json.dump(rows, stream, ensure_ascii=False, indent=2)
+        stream.write("\n")
+    elif fmt == "csv":
+        if rows:
+            writer = csv.DictWriter(stream, fieldnames=list(rows[0]), lineterminator="\n")
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {FORMATS}")
+
+
+def _add_settings(parser: argparse.ArgumentParser, multiple: bool = False) -> None:
+    """Add a flag for every setting."""
+    for field in SETTINGS:
+        parser.add_argument(
+            f"--{field.replace('_', '-')}",
+            dest=field,
+            nargs="+" if multiple else None,
+            help=f"{field.replace('_', ' ').capitalize()} label, as in settings keys"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Query the published model results.")
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=DEFAULT_OUTPUT_DIR,
+        help="Directory the results were published to"
+    )
+    parser.add_argument("--format", choices=FORMATS, default="csv", help="Output format")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scenarios = commands.add_parser("filter", help="List the scenarios matching settings")
+    _add_settings(scenarios, multiple=True)
+
+    rank = commands.add_parser(
+        "rank",
+        help="Rank the jobs of a scenario; unset settings come from the default scenario"
+    )
+    _add_settings(rank)
+    rank.add_argument("--metric", choices=QUERY_METRICS, default="shortage", help="Metric to rank by")
+    rank.add_argument("--top", type=int, default=10, help="Number of jobs to list")
+    rank.add_argument("--ascending", action="store_true", help="List the lowest values first")
+    rank.add_argument("--include-total", action="store_true", help="Rank the total row as well")
+
+    diff = commands.add_parser("diff", help="Compare the per-job values of two scenarios")
+    diff.add_argument("a", help="Settings key of the first scenario")
+    diff.add_argument("b", help="Settings key of the second scenario")
+    diff.add_argument("--metric", choices=QUERY_METRICS, nargs="+", help="Metrics to compare")
+    diff.add_argument("--top", type=int, help="Number of changes to list")
+
+    series = commands.add_parser(
+        "series",
+        help="List a job's value across one setting; other settings come from the default scenario"
+    )
+    _add_settings(series)
+    series.add_argument("--job", required=True, help="Job name or ID")
+    series.add_argument("--across", choices=SETTINGS, required=True, help="Setting to vary")
+    series.add_argument("--metric", choices=QUERY_METRICS, default="shortage", help="Metric to list")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    index = load_index(args.output_dir)
+    settings = {field: getattr(args, field, None) for field in SETTINGS}
+
+    if args.command == "filter":
+        rows = index.scenarios(index.filter(**settings))
+    elif args.command == "rank":
+        rows = index.rank(
+            index.resolve(**settings),
+            args.metric,
+            top=args.top,
+            ascending=args.ascending,
+            include_total=args.include_total
+        )
+    elif args.command == "diff":
+        rows = index.diff(args.a, args.b, args.metric, args.top)
+    else:
+        job = int(args.job) if args.job.isdigit() else args.job
+        settings.pop(args.across)
+        rows = index.series(job, args.across, args.metric, **settings)
+    write_rows(rows, args.format)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Sequence, Union
+
+import numpy as np
+
+from results_format import METRICS, encode_result
+from sweep import Combination
+
+logger = logging.getLogger(__name__)
+
+TENSOR_VERSION = 1
+DEFAULT_NAME = "scenario-tensor"
+# Axes of the tensor; the scenario axes are the fields of Combination
+SCENARIO_AXES = Combination._fields
+AXES = SCENARIO_AXES + ("job", "metric")
+# Metrics along the last axis: the workforce metrics and the remaining shortage
+TENSOR_METRICS = METRICS + ("remaining_shortage",)
+# Value of jobs without workforce changes and of scenarios without a result
+MISSING = np.iinfo(np.int64).min
+
+# A label, a list of labels, or an integer position on the job axis
+Selector = Union[Any, Sequence[Any]]
+
+
+def axis_label(value: Any) -> str:
+    """Return the axis label of a combination field value, as in settings keys."""
+    if isinstance(value, bool):
+        return "with" if value else "without"
+    if isinstance(value, Enum):
+        return value.value
+    return str(value)
+
+
+def scenario_axes(combinations: Sequence[Combination]) -> Dict[str, List[str]]:
+    """
+    Return the labels of the scenario axes, in grid order.
+
+    Args:
+        combinations: Combinations of the grid, in grid order
+
+    Returns:
+        Labels of every field of Combination, in order of first appearance
+    """
+    return {
+        field: list(dict.fromkeys(axis_label(getattr(c, field)) for c in combinations))
+        for field in SCENARIO_AXES
+    }
+
+
+def write_tensor(
+    output_dir: Path,
+    results: Mapping[str, Dict[str, Any]],
+    combinations: Sequence[Combination],
+    job_lookup: Mapping[int, str],
+    name: str = DEFAULT_NAME
+) -> Path:
+    """
+    Write scenario results as a memory-mappable integer tensor.
+
+    The tensor has one axis per combination field, then the job ID and the
+    metric, and is saved as <name>.npy. Its axis labels are written to
+    <name>.json. Values absent from a result, and every value of a
+    combination without a result, are MISSING. That includes the remaining
+    shortage of jobs without workforce changes; jobs with workforce changes
+    that remainingShortages does not list have no shortage left, which is
+    0. Both files are replaced in one step, so readers never see a partial
+    tensor.
+
+    Args:
+        output_dir: Directory to write the files to
+        results: Scenario results in row or columnar format, by settings key
+        combinations: Combinations of the grid, in grid order
+        job_lookup: Job names by job ID, including the total
+        name: Base name of the files
+
+    Returns:
+        Path of the tensor file
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    axes = scenario_axes(combinations)
+    num_jobs = len(job_lookup)
+    axes["job"] = [job_lookup[i] for i in range(num_jobs)]
+    axes["metric"] = list(TENSOR_METRICS)
+    positions = {axis: {label: i for i, label in enumerate(labels)} for axis, labels in axes.items()}
+
+    path = output_dir / f"{name}.npy"
+    temp = output_dir / f".{name}.npy.tmp"
+    tensor = np.lib.format.open_memmap(
+        temp,
+        mode="w+",
+        dtype=np.int64,
+        shape=tuple(len(axes[axis]) for axis in AXES)
+    )
+    tensor[...] = MISSING
+
+    written = 0
+    for combination in combinations:
+        result = results.get(combination.key)
+        if result is None:
+            continue
+        if isinstance(result["workforceChanges"], dict):
+            result = encode_result(result, num_jobs)
+
+        index = tuple(
+            positions[field][axis_label(getattr(combination, field))]
+            for field in SCENARIO_AXES
+        )
+        block = tensor[index]
+        for column, values in enumerate(result["workforceChanges"]):
+            block[:, column] = [MISSING if v is None else v for v in values]
+        shortages = result["remainingShortages"]
+        block[:, -1] = np.where(block[:, 0] == MISSING, MISSING, 0)
+        block[shortages["jobId"], -1] = shortages["shortage"]
+        written += 1
+
+    tensor.flush()
+    del tensor
+    os.replace(temp, path)
+
+    sidecar = output_dir / f"{name}.json"
+    temp = output_dir / f".{name}.json.tmp"
+    with open(temp, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "version": TENSOR_VERSION,
+                "dtype": "int64",
+                "missing": int(MISSING),
+                "axes": [{"name": axis, "labels": axes[axis]} for axis in AXES]
+            },
+            f,
+            ensure_ascii=False,
+            indent=2
+        )
+    os.replace(temp, sidecar)
+
+    logger.info(f"Wrote {written} scenarios to tensor {path} with shape {tuple(map(len, axes.values()))}")
+    return path
+
+
+class ScenarioTensor:
+    """
+    Read-only access to a scenario tensor written by write_tensor().
+
+    The tensor is memory-mapped, so opening it reads only the small label
+    file, and a selection reads only the pages it touches. Selections name
+    their axes and labels, like settings keys do:
+
+        tensor = ScenarioTensor.open("../raw_data")
+        tensor.select(job="Artsen", metric="shortage", steering="with")
+
+    returns the shortage of one job at every productivity rate, hours,
+    priority and non-source category, with the government steering.
+
+    Attributes:
+        array: Memory-mapped tensor with axes AXES
+        axes: Labels of every axis, by axis name
+    """
+
+    def __init__(self, array: np.ndarray, axes: Dict[str, List[str]]) -> None:
+        """
+        Initialize the accessor.
+
+        Args:
+            array: Tensor with axes AXES
+            axes: Labels of every axis, by axis name
+        """
+        shape = tuple(len(axes[axis]) for axis in AXES)
+        if array.shape != shape:
+            raise ValueError(f"Tensor shape {array.shape} does not match its labels {shape}")
+        self.array = array
+        self.axes = axes
+        self._positions = {
+            axis: {label: i for i, label in enumerate(labels)}
+            for axis, labels in axes.items()
+        }
+
+    @classmethod
+    def open(cls, directory: Union[str, Path], name: str = DEFAULT_NAME) -> ScenarioTensor:
+        """
+        Memory-map a tensor and read its labels.
+
+        Args:
+            directory: Directory containing the tensor files
+            name: Base name of the files
+
+        Returns:
+            Accessor for the tensor
+        """
+        directory = Path(directory)
+        with open(directory / f"{name}.json", "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        if sidecar.get("version") != TENSOR_VERSION:
+            raise ValueError(f"Unsupported tensor version {sidecar.get('version')!r}")
+        axes = {axis["name"]: axis["labels"] for axis in sidecar["axes"]}
+        return cls(np.load(directory / f"{name}.npy", mmap_mode="r"), axes)
+
+    def index(self, axis: str, label: Any) -> int:
+        """
+        Return the position of a label on an axis.
+
+        Args:
+            axis: Name of the axis
+            label: Label as in settings keys; field values such as enum
+                members, booleans and floats are converted, and integers
+                on the job axis are taken as job IDs
+
+        Returns:
+            Position on the axis
+        """
+        if axis not in self._positions:
+            raise ValueError(f"Unknown axis {axis!r}, expected one of {AXES}")
+        if axis == "job" and isinstance(label, (int, np.integer)) and not isinstance(label, bool):
+            if not 0 <= label < len(self.axes["job"]):
+                raise ValueError(f"Job ID {label} out of range")
+            return int(label)
+        if axis == "productivity" and isinstance(label, (int, float)):
+            label = float(label)
+        position = self._positions[axis].get(axis_label(label))
+        if position is None:
+            raise ValueError(f"Unknown {axis} {label!r}, expected one of {self.axes[axis]}")
+        return position
+
+    def select(self, masked: bool = False, **criteria: Selector) -> np.ndarray:
+        """
+        Return a slice of the tensor.
+
+        Every keyword names an axis. A single label removes the axis from
+        the result, a list of labels keeps it with those entries in that
+        order, and axes that are not named are kept whole. Single labels
+        and whole axes give a view of the memory-mapped file.
+
+        Args:
+            masked: Return a masked array with MISSING values masked
+            **criteria: Label or list of labels per axis name
+
+        Returns:
+            Selected values, with the remaining axes in AXES order
+        """
+        unknown = set(criteria) - set(AXES)
+        if unknown:
+            raise ValueError(f"Unknown axes {sorted(unknown)}, expected any of {AXES}")
+
+        basic = []
+        lists = []
+        for axis in AXES:
+            selector = criteria.get(axis)
+            if selector is None:
+                basic.append(slice(None))
+            elif isinstance(selector, (list, tuple)):
+                basic.append(slice(None))
+                lists.append((axis, [self.index(axis, label) for label in selector]))
+            else:
+                basic.append(self.index(axis, selector))
+
+        values = self.array[tuple(basic)]
+        kept = [axis for axis, selector in zip(AXES, basic) if isinstance(selector, slice)]
+        for axis, positions in lists:
+            values = np.take(values, positions, axis=kept.index(axis))
+        if masked:
+            return np.ma.masked_equal(values, MISSING)
+        return values
+
+    def remaining_axes(self, **criteria: Selector) -> List[str]:
+        """Return the axes of the result of select() for the same criteria."""
+        return [
+            axis for axis in AXES
+            if criteria.get(axis) is None or isinstance(criteria[axis], (list, tuple))
+        ]
+
+    def scenario(self, key: str) -> np.ndarray:
+        """
+        Return the (job, metric) values of a scenario.
+
+        Args:
+            key: Settings key such as "1.0-with-everyone-standard-standard"
+
+        Returns:
+            View of the scenario's values
+        """
+        combination = Combination.from_key(key)
+        return self.select(**{field: getattr(combination, field) for field in SCENARIO_AXES})
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Build the scenario tensor from the raw model results."
+    )
+    parser.add_argument(
+        "--input-dir",
+        type=Path,
+        default=Path("../raw_data"),
+        help="Directory with raw-model-results.json and raw-job-names.json"
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        help="Directory to write the tensor to, defaults to the input directory"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    with open(args.input_dir / "raw-job-names.json", "r", encoding="utf-8") as f:
+        job_lookup = {int(i): name for i, name in json.load(f).items()}
+    with open(args.input_dir / "raw-model-results.json", "r", encoding="utf-8") as f:
+        results = json.load(f)
+
+    combinations = [Combination.from_key(key) for key in results]
+    write_tensor(args.output_dir or args.input_dir, results, combinations, job_lookup)
+
+
+if __name__ == "__main__":
+    main()
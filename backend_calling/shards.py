@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from output_writer import iter_json_chunks, write_json
+from results_format import DEFAULT_SCENARIO, FORMAT_VERSION, wrap_results
+from sweep import Combination
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GROUP_BY = ("productivity", "steering")
+MANIFEST_NAME = "model-results-manifest.json"
+SHARD_DIR = "scenarios"
+
+
+def parse_group_by(value: str) -> Optional[Tuple[str, ...]]:
+    """
+    Parse the --shard-by command line value.
+
+    Args:
+        value: "none", "scenario", or a comma separated list of Combination fields
+
+    Returns:
+        Fields to group scenarios by, or None to disable sharding
+    """
+    if value == "none":
+        return None
+    if value == "scenario":
+        return Combination._fields
+    fields = tuple(field.strip() for field in value.split(","))
+    unknown = [field for field in fields if field not in Combination._fields]
+    if unknown:
+        raise ValueError(
+            f"Unknown shard fields {unknown}, expected any of {Combination._fields}"
+        )
+    return fields
+
+
+def _group_name(combination: Combination, group_by: Sequence[str]) -> str:
+    """Return the shard name for a combination."""
+    parts = []
+    for field in group_by:
+        value = getattr(combination, field)
+        if field == "steering":
+            parts.append("with" if value else "without")
+        else:
+            parts.append(str(getattr(value, "value", value)))
+    return "-".join(parts)
+
+
+def write_sharded_results(
+    output_dir: Path,
+    scenarios: Dict[str, Dict[str, Any]],
+    group_by: Sequence[str] = DEFAULT_GROUP_BY,
+    default_scenario: str = DEFAULT_SCENARIO,
+    job_names: str = "job-names.json",
+    indent: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Write columnar scenarios as shard files plus a manifest.
+
+    Scenarios are grouped into shards by the given Combination fields. The
+    default scenario always gets a shard of its own, so first paint only
+    needs that file. Shard file names include a content hash, so clients
+    can cache them indefinitely; shards from earlier runs are removed.
+
+    Args:
+        output_dir: Directory to write the manifest to
+        scenarios: Columnar scenario results by settings key
+        group_by: Combination fields to group scenarios by
+        default_scenario: Settings key of the scenario shown first
+        job_names: Path of the job names file, relative to the manifest
+        indent: Number of spaces to indent with, or None to minify
+
+    Returns:
+        The manifest that was written
+    """
+    groups: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for key, scenario in scenarios.items():
+        if key == default_scenario:
+            name = "default"
+        else:
+            name = _group_name(Combination.from_key(key), group_by)
+        groups.setdefault(name, {})[key] = scenario
+
+    shard_dir = output_dir / SHARD_DIR
+    shard_dir.mkdir(parents=True, exist_ok=True)
+
+    shards: List[str] = []
+    index: Dict[str, int] = {}
+    for name, group in groups.items():
+        shard = wrap_results(group)
+        digest = hashlib.sha256(
+            "".join(iter_json_chunks(shard, depth=2)).encode("utf-8")
+        ).hexdigest()[:12]
+        file_name = f"{name}.{digest}.json"
+        write_json(shard_dir / file_name, shard, indent=indent, depth=2)
+
+        index.update({key: len(shards) for key in group})
+        shards.append(f"{SHARD_DIR}/{file_name}")
+
+    # Remove shards no longer referenced by the manifest
+    current = {Path(shard).name for shard in shards}
+    current.update(f"{name}.gz" for name in list(current))
+    for path in shard_dir.iterdir():
+        if path.name not in current:
+            path.unlink()
+
+    manifest = {
+        "version": FORMAT_VERSION,
+        "defaultScenario": default_scenario if default_scenario in scenarios else None,
+        "jobNames": job_names,
+        "shards": shards,
+        "scenarios": index
+    }
+    write_json(output_dir / MANIFEST_NAME, manifest, indent=indent)
+    logger.info(f"Wrote {len(scenarios)} scenarios in {len(shards)} shards")
+    return manifest
@@ -0,0 +1,434 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from requesting_api import BackendRequest
+from response_cache import ResponseCache, request_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_NUM_JOBS = 112
+# Positive transition targets per source job in synthetic responses
+SYNTHETIC_TARGETS = 8
+LATENCY_DISTRIBUTIONS = ("fixed", "exponential", "lognormal")
+ERROR_STATUSES = (500, 502, 503)
+INTEGER = re.compile(r"-?\d+")
+
+
+def _scalar(value: str) -> Any:
+    """Return a query string value as the scalar it was encoded from."""
+    if value in ("True", "False"):
+        return value == "True"
+    if INTEGER.fullmatch(value):
+        return int(value)
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def query_params(query: str) -> Dict[str, Any]:
+    """
+    Decode a query string into the request parameters it was built from.
+
+    Requests encode booleans and numbers with str(), so those are restored
+    to their type; every other value stays a string.
+
+    Args:
+        query: URL-encoded query string
+
+    Returns:
+        Request parameters by name
+    """
+    return {name: _scalar(value) for name, value in parse_qsl(query, keep_blank_values=True)}
+
+
+def query_key(query: str, url: str = BackendRequest.BASE_URL) -> str:
+    """
+    Return the response cache request key of a query.
+
+    Args:
+        query: URL-encoded query string
+        url: URL of the endpoint the query was recorded against
+
+    Returns:
+        Request key, as from request_key()
+    """
+    return request_key(url, query_params(query))
+
+
+def synthetic_response(job_names: List[str], seed: str) -> Dict[str, Any]:
+    """
+    Build a random optimize response shaped like the real one.
+
+    The same seed always gives the same response, so repeated requests for
+    a scenario agree with each other.
+
+    Args:
+        job_names: Names of the jobs in the response
+        seed: Seed for the random values, such as the query string
+
+    Returns:
+        Response with shortages, a full transition matrix, shortage
+        components and added value figures
+    """
+    rng = random.Random(hashlib.sha256(seed.encode("utf-8")).digest())
+
+    transitions = {}
+    for source in job_names:
+        row = dict.fromkeys(job_names, 0.0)
+        for target in rng.sample(job_names, min(SYNTHETIC_TARGETS, len(job_names))):
+            if target != source:
+                row[target] = rng.lognormvariate(4, 1.5)
+        transitions[source] = row
+
+    components = {}
+    for name in job_names:
+        workforce = rng.uniform(1_000, 200_000)
+        components[name] = {
+            "workforce_2024": workforce,
+            "net_change_2035": rng.gauss(0, workforce * 0.05),
+            "transitions_in": sum(transitions[source][name] for source in job_names),
+            "transitions_out": sum(transitions[name].values()),
+            "excess_workers": max(0.0, rng.gauss(0, workforce * 0.02)),
+            "shortage": max(0.0, rng.gauss(0, workforce * 0.03)),
+            "productivity": rng.uniform(0, workforce * 0.02),
+            "demand_change_2035": rng.gauss(0, workforce * 0.1),
+            "vacancies_labour_friction": rng.uniform(0, workforce * 0.03)
+        }
+
+    no_transition = rng.uniform(50, 70)
+    return {
+        "shortages_by_job": {
+            name: components[name]["shortage"] for name in job_names
+        },
+        "transitions": transitions,
+        "shortage_components": components,
+        "added_value_per_hour_no_transition": no_transition,
+        "added_value_per_hour_transition_shortages_filled": no_transition * rng.uniform(1.0, 1.1)
+    }
+
+
+class OptimizeStub:
+    """
+    Stand-in for the /optimize/ endpoint of the optimization API.
+
+    Serves recorded or synthetic responses after a simulated processing
+    time, fails a fraction of requests with a server error, and throttles
+    requests above a maximum rate with 429 and a Retry-After.
+
+    Attributes:
+        statuses: Number of responses sent by status code
+    """
+
+    def __init__(
+        self,
+        job_names: Optional[List[str]] = None,
+        recorded: Optional[Dict[str, Dict[str, Any]]] = None,
+        recorded_url: str = BackendRequest.BASE_URL,
+        latency: float = 0.0,
+        latency_distribution: str = "fixed",
+        latency_sigma: float = 0.5,
+        error_rate: float = 0.0,
+        max_rate: Optional[float] = None,
+        retry_after: float = 1.0,
+        seed: Optional[int] = None
+    ) -> None:
+        """
+        Initialize the stub.
+
+        Args:
+            job_names: Job names of synthetic responses, defaults to
+                DEFAULT_NUM_JOBS generated names
+            recorded: Recorded responses by request key, to serve instead
+                of synthetic ones; a request without a recorded response
+                gets a 404
+            recorded_url: URL of the endpoint the responses were recorded
+                against, which is part of their request keys
+            latency: Mean seconds before a response is sent
+            latency_distribution: One of LATENCY_DISTRIBUTIONS
+            latency_sigma: Standard deviation of the log of the latency,
+                for the lognormal distribution
+            error_rate: Fraction of requests failing with a server error
+            max_rate: Requests per second above which requests are
+                throttled, or None to never throttle
+            retry_after: Seconds sent in the Retry-After of a throttled request
+            seed: Seed for latencies and errors, for reproducible runs
+        """
+        if latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(
+                f"Unknown latency distribution {latency_distribution!r}, "
+                f"expected one of {LATENCY_DISTRIBUTIONS}"
+            )
+        self.job_names = job_names or [f"Job {i:03d}" for i in range(DEFAULT_NUM_JOBS)]
+        self.recorded = recorded
+        self.recorded_url = recorded_url
+        self.latency = latency
+        self.latency_distribution = latency_distribution
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.max_rate = max_rate
+        self.retry_after = retry_after
+        self.statuses: Counter = Counter()
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent: deque = deque()
+        self._bodies: Dict[str, bytes] = {}
+
+    def _sample_latency(self) -> float:
+        """Return the simulated processing time of a request."""
+        if self.latency <= 0:
+            return 0.0
+        if self.latency_distribution == "exponential":
+            return self._rng.expovariate(1 / self.latency)
+        if self.latency_distribution == "lognormal":
+            mu = math.log(self.latency) - self.latency_sigma ** 2 / 2
+            return self._rng.lognormvariate(mu, self.latency_sigma)
+        return self.latency
+
+    def _throttled(self) -> bool:
+        """Record a request and return whether it exceeds the maximum rate."""
+        if self.max_rate is None:
+            return False
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] >= 1.0:
+            self._recent.popleft()
+        if len(self._recent) >= self.max_rate:
+            return True
+        self._recent.append(now)
+        return False
+
+    def _body(self, query: str) -> Optional[bytes]:
+        """Return the encoded response for a query string, None if none was recorded."""
+        # Encoding under the lock builds every body once, even when the
+        # same query arrives on several threads at the same time
+        with self._lock:
+            body = self._bodies.get(query)
+            if body is None:
+                if self.recorded is not None:
+                    response = self.recorded.get(query_key(query, self.recorded_url))
+                    if response is None:
+                        return None
+                else:
+                    response = synthetic_response(self.job_names, query)
+                body = json.dumps(response).encode("utf-8")
+                self._bodies[query] = body
+        return body
+
+    def respond(self, query: str) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        Produce the response to an optimize request.
+
+        Blocks for the simulated processing time, so it should be called
+        from a request handler thread.
+
+        Args:
+            query: Query string of the request
+
+        Returns:
+            Status code, headers and body
+        """
+        with self._lock:
+            throttled = self._throttled()
+            delay = self._sample_latency()
+            failed = self._rng.random() < self.error_rate
+
+        if throttled:
+            status, headers = 429, {"Retry-After": f"{self.retry_after:g}"}
+            body = b'{"detail": "Too many requests"}'
+        else:
+            time.sleep(delay)
+            if failed:
+                status, headers = self._rng.choice(ERROR_STATUSES), {}
+                body = b'{"detail": "Simulated server error"}'
+            else:
+                status, headers, body = 200, {}, self._body(query)
+                if body is None:
+                    status, body = 404, b'{"detail": "No recorded response"}'
+
+        with self._lock:
+            self.statuses[status] += 1
+        return status, headers, body
+
+    def summary(self) -> str:
+        """Return a one line summary of the responses sent."""
+        counts = ", ".join(f"{count} x {status}" for status, count in sorted(self.statuses.items()))
+        return f"Stub server: {sum(self.statuses.values())} requests ({counts or 'none'})"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Request handler passing /optimize/ requests to the server's stub."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if url.path.rstrip("/") != "/optimize":
+            status, headers, body = 404, {}, b'{"detail": "Not Found"}'
+        else:
+            status, headers, body = self.server.stub.respond(url.query)
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format % args)
+
+
+def start_server(
+    stub: OptimizeStub,
+    host: str = DEFAULT_HOST,
+    port: int = 0,
+    background: bool = True
+) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Create a server for a stub, serving from a background thread.
+
+    Args:
+        stub: Stub answering the requests
+        host: Address to listen on
+        port: Port to listen on, 0 for any free port
+        background: Whether to start serving from a background thread;
+            otherwise the caller runs serve_forever()
+
+    Returns:
+        The server, to shut down when done, and the URL of its optimize endpoint
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.stub = stub
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}/optimize/"
+
+
+def load_recorded(cache_path: Path) -> Dict[str, Dict[str, Any]]:
+    """Return all responses in a response cache database, by request key."""
+    if not cache_path.exists():
+        raise ValueError(f"Response cache {cache_path} does not exist")
+    cache = ResponseCache(cache_path, ttl=None)
+    try:
+        return dict(cache.iter_items())
+    finally:
+        cache.close()
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the optimize API.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument(
+        "--recorded",
+        type=Path,
+        help="Response cache database with recorded responses to serve"
+    )
+    parser.add_argument(
+        "--recorded-url",
+        default=BackendRequest.BASE_URL,
+        help="URL of the endpoint the responses were recorded against"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=DEFAULT_NUM_JOBS,
+        help="Number of jobs in synthetic responses"
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=1.0,
+        help="Mean seconds before a response is sent"
+    )
+    parser.add_argument(
+        "--latency-distribution",
+        choices=LATENCY_DISTRIBUTIONS,
+        default="lognormal",
+        help="Distribution of the response latency"
+    )
+    parser.add_argument(
+        "--latency-sigma",
+        type=float,
+        default=0.5,
+        help="Standard deviation of the log latency, for the lognormal distribution"
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests failing with a 5xx status"
+    )
+    parser.add_argument(
+        "--max-rate",
+        type=float,
+        help="Requests per second above which requests get a 429"
+    )
+    parser.add_argument(
+        "--retry-after",
+        type=float,
+        default=1.0,
+        help="Seconds sent in the Retry-After header of a 429"
+    )
+    parser.add_argument("--seed", type=int, help="Seed for latencies and errors")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    recorded = load_recorded(args.recorded) if args.recorded else None
+    if args.recorded:
+        if not recorded:
+            raise ValueError(f"No recorded responses in {args.recorded}")
+        logger.info(f"Serving {len(recorded)} recorded responses")
+
+    stub = OptimizeStub(
+        job_names=[f"Job {i:03d}" for i in range(args.jobs)],
+        recorded=recorded,
+        recorded_url=args.recorded_url,
+        latency=args.latency,
+        latency_distribution=args.latency_distribution,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        max_rate=args.max_rate,
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+    server, url = start_server(stub, args.host, args.port, background=False)
+    logger.info(f"Serving on {url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(stub.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+from __future__ import annotations
+
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import product
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from http_client import HttpClient
+from requesting_api import BackendRequest, HoursWorked, JobPriority, NonSourceJobs
+from response_cache import ResponseCache, request_key
+from run_profiler import RunProfiler, timed
+from sweep_metrics import SweepMetrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 4
+# Assumed seconds per optimize call when estimating the runtime of a sweep
+DEFAULT_LATENCY_ESTIMATE = 60.0
+
+# Order in which fields are stepped towards the baseline in delta encoding
+DELTA_ORDER = ("productivity", "non_source", "priority", "hours", "steering")
+
+
+class Combination(NamedTuple):
+    """A single point in the scenario parameter grid."""
+    productivity: float
+    steering: bool
+    hours: HoursWorked
+    priority: JobPriority
+    non_source: NonSourceJobs
+
+    @property
+    def key(self) -> str:
+        """Return the settings key used in the published results."""
+        return (
+            f"{self.productivity}-{'with' if self.steering else 'without'}-"
+            f"{self.hours.value}-{self.priority.value}-{self.non_source.value}"
+        )
+
+    @classmethod
+    def from_key(cls, key: str) -> Combination:
+        """
+        Parse a settings key back into a combination.
+
+        Category values may contain hyphens themselves, so each part is
+        matched against the known values of its category.
+
+        Args:
+            key: Settings key such as "1.0-with-part-time-standard-ambitious-only"
+
+        Returns:
+            The combination for the key
+        """
+        productivity, steering, rest = key.split("-", 2)
+        values = []
+        for category in (HoursWorked, JobPriority):
+            for member in sorted(category, key=lambda m: -len(m.value)):
+                if rest.startswith(member.value + "-"):
+                    values.append(member)
+                    rest = rest[len(member.value) + 1:]
+                    break
+            else:
+                raise ValueError(f"Invalid settings key {key!r}")
+        return cls(
+            float(productivity),
+            steering == "with",
+            values[0],
+            values[1],
+            NonSourceJobs(rest)
+        )
+
+    def step_towards(self, other: Combination) -> Combination:
+        """
+        Return the neighbouring combination one step closer to another.
+
+        The first field that differs, in DELTA_ORDER, is set to the value of
+        the other combination. Productivity comes first, so a scenario's
+        nearest neighbour is the same settings at another productivity rate.
+
+        Args:
+            other: Combination to step towards
+
+        Returns:
+            Combination differing from this one in a single field
+        """
+        for field in DELTA_ORDER:
+            if getattr(self, field) != getattr(other, field):
+                return self._replace(**{field: getattr(other, field)})
+        return self
+
+    def describe(self) -> str:
+        """Return a human readable description for log messages."""
+        return (
+            f"prod={self.productivity}, "
+            f"steer={'with' if self.steering else 'without'}, "
+            f"hours={self.hours.value}, priority={self.priority.value}, "
+            f"non_source={self.non_source.value}"
+        )
+
+
+def build_combinations(
+    productivity_rates: Iterable[float],
+    steering_options: Iterable[bool],
+    work_hours: Iterable[HoursWorked],
+    job_priorities: Iterable[JobPriority],
+    non_source_jobs: Iterable[NonSourceJobs]
+) -> List[Combination]:
+    """Return all parameter combinations in grid order."""
+    return [
+        Combination(*values)
+        for values in product(
+            productivity_rates,
+            steering_options,
+            work_hours,
+            job_priorities,
+            non_source_jobs
+        )
+    ]
+
+
+def delta_parents(keys: Iterable[str], baseline: str) -> Dict[str, str]:
+    """
+    Pick the scenario each scenario is delta encoded against.
+
+    Every scenario's parent is its nearest neighbour towards the baseline
+    that is available, so the parents form a tree rooted at the baseline.
+
+    Args:
+        keys: Settings keys of the available scenarios
+        baseline: Settings key of the scenario stored in full
+
+    Returns:
+        Dictionary of parent settings key by settings key; scenarios without
+        a parent, including the baseline, are left out
+    """
+    available = set(keys)
+    if baseline not in available:
+        return {}
+
+    target = Combination.from_key(baseline)
+    parents = {}
+    for key in available:
+        if key == baseline:
+            continue
+        parent = Combination.from_key(key).step_towards(target)
+        while parent.key not in available and parent != target:
+            parent = parent.step_towards(target)
+        parents[key] = parent.key
+    return parents
+
+
+class SweepPlan:
+    """
+    The unique requests of a sweep.
+
+    Combinations whose canonical request parameters are equal need only
+    one request: the first of them in grid order is fetched, and its
+    response is used for the others.
+
+    Attributes:
+        groups: Combinations sharing a request, by the combination fetched
+            for them, which is the first of each group
+        keys: Request key of every fetched combination
+        cached: Number of unique requests already in the response cache
+    """
+
+    def __init__(
+        self,
+        groups: Dict[Combination, List[Combination]],
+        keys: Dict[Combination, str],
+        cached: int = 0
+    ) -> None:
+        self.groups = groups
+        self.keys = keys
+        self.cached = cached
+
+    @property
+    def combinations(self) -> int:
+        """Number of combinations in the sweep."""
+        return sum(len(group) for group in self.groups.values())
+
+    @property
+    def unique(self) -> int:
+        """Number of unique requests."""
+        return len(self.groups)
+
+    def fetched(self) -> List[Combination]:
+        """Return the combinations to fetch, in grid order."""
+        return list(self.groups)
+
+    def expand(self, fetched: Iterable[Combination]) -> List[Combination]:
+        """Return the combinations answered by fetched combinations."""
+        return [combination for f in fetched for combination in self.groups[f]]
+
+    def estimate(
+        self,
+        latency: float = DEFAULT_LATENCY_ESTIMATE,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_rate: Optional[float] = None
+    ) -> float:
+        """
+        Estimate the seconds needed to fetch the requests not in the cache.
+
+        Args:
+            latency: Seconds per optimize call
+            max_workers: Maximum number of requests in flight
+            max_rate: Maximum requests per second, if limited
+
+        Returns:
+            Estimated runtime in seconds, ignoring retries
+        """
+        calls = self.unique - self.cached
+        seconds = calls * latency / max_workers
+        if max_rate is not None:
+            seconds = max(seconds, calls / max_rate)
+        return seconds
+
+    def summary(self) -> str:
+        """Return a one line summary for the log."""
+        return (
+            f"Sweep plan: {self.combinations} combinations, {self.unique} unique "
+            f"requests ({self.combinations - self.unique} duplicates), "
+            f"{self.cached} cached, {self.unique - self.cached} API calls"
+        )
+
+
+class ScenarioFetcher:
+    """
+    Fetches the optimizer response for a combination.
+
+    Responses are served from the response cache when possible; requests
+    that reach the API are paced by the rate limiter of the HTTP client.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[ResponseCache] = None,
+        client: Optional[HttpClient] = None,
+        base_url: Optional[str] = None,
+        profiler: Optional[RunProfiler] = None,
+        metrics: Optional[SweepMetrics] = None
+    ) -> None:
+        """
+        Initialize the fetcher.
+
+        Args:
+            cache: Response cache to read from and write to, if any
+            client: HTTP client sending the requests, defaults to the client
+                shared by all requests
+            base_url: URL of the optimize endpoint, defaults to
+                BackendRequest.BASE_URL
+            profiler: Profiler recording the stage timings, if any
+            metrics: Sweep metrics counting fetches and cache hits, if any
+        """
+        self.cache = cache
+        self.client = client
+        self.base_url = base_url
+        self.profiler = profiler
+        self.metrics = metrics
+        self._planned: Dict[Combination, Tuple[BackendRequest, str]] = {}
+
+    def __call__(self, combination: Combination) -> Dict[str, Any]:
+        """Return the API response for a combination."""
+        if self.metrics is not None:
+            self.metrics.fetch_started()
+        try:
+            if self.profiler is None:
+                return self._fetch(combination)
+            with self.profiler.combination(combination.key):
+                return self._fetch(combination)
+        finally:
+            if self.metrics is not None:
+                self.metrics.fetch_finished()
+
+    def prepare(self, combination: Combination) -> Tuple[BackendRequest, str]:
+        """Return the request for a combination and its request key."""
+        with timed("params"):
+            request = BackendRequest(
+                government_steering=combination.steering,
+                productivity_increase=combination.productivity,
+                hours_worked=combination.hours,
+                job_priority=combination.priority,
+                non_source_jobs=combination.non_source,
+                client=self.client,
+                base_url=self.base_url
+            )
+            return request, request_key(request.BASE_URL, request.params)
+
+    def plan(self, combinations: Iterable[Combination]) -> SweepPlan:
+        """
+        Build the requests of all combinations and group equal ones.
+
+        The requests of the combinations to fetch are kept, so they are not
+        built again when fetched. Building them is attributed to the
+        profiler's combinations, like fetching.
+
+        Args:
+            combinations: Combinations of the sweep, in grid order
+
+        Returns:
+            Plan with one combination to fetch per unique request
+        """
+        groups: Dict[Combination, List[Combination]] = {}
+        keys: Dict[Combination, str] = {}
+        first: Dict[str, Combination] = {}
+        for combination in combinations:
+            if self.profiler is None:
+                request, key = self.prepare(combination)
+            else:
+                with self.profiler.combination(combination.key):
+                    request, key = self.prepare(combination)
+            fetched = first.setdefault(key, combination)
+            if fetched == combination:
+                groups[combination] = []
+                keys[combination] = key
+                self._planned[combination] = (request, key)
+            groups[fetched].append(combination)
+
+        cached = 0
+        if self.cache is not None:
+            cached = sum(self.cache.contains(key) for key in first)
+        return SweepPlan(groups, keys, cached)
+
+    def _fetch(self, combination: Combination) -> Dict[str, Any]:
+        """Return the API response for a combination from the cache or the API."""
+        planned = self._planned.pop(combination, None)
+        request, key = planned if planned is not None else self.prepare(combination)
+
+        if self.cache is not None:
+            with timed("cache"):
+                response = self.cache.get(key)
+            if self.metrics is not None:
+                self.metrics.cache_lookup(response is not None)
+            if response is not None:
+                return response
+
+        response = request.make_request()
+        if self.cache is not None:
+            with timed("cache"):
+                self.cache.put(key, response)
+        return response
+
+
+def run_sweep(
+    combinations: List[Combination],
+    fetch: Callable[[Combination], Dict[str, Any]],
+    handle: Callable[[Combination, Dict[str, Any]], None],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    on_error: Optional[Callable[[Combination, Exception], None]] = None
+) -> List[Combination]:
+    """
+    Fetch all combinations concurrently and hand each response to a callback.
+
+    Responses are passed to ``handle`` on the calling thread in completion
+    order, so the callbacks do not need to be thread-safe. On an interrupt
+    the requests that have not started yet are cancelled.
+
+    Args:
+        combinations: Combinations to fetch
+        fetch: Function returning the API response for a combination
+        handle: Function processing a combination and its response
+        max_workers: Maximum number of requests in flight at the same time
+        on_error: Function called with each combination that failed
+
+    Returns:
+        Combinations that failed to fetch or process, in grid order
+    """
+    if max_workers < 1:
+        raise ValueError(f"max_workers must be at least 1, got {max_workers}")
+
+    total = len(combinations)
+    failed = []
+    completed = 0
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {
+            executor.submit(fetch, combination): combination
+            for combination in combinations
+        }
+        for future in as_completed(futures):
+            combination = futures[future]
+            completed += 1
+            logger.info(
+                f"Processing combination {completed}/{total}: "
+                f"{combination.describe()}"
+            )
+            try:
+                handle(combination, future.result())
+            except Exception as e:
+                logger.error(f"Error processing combination {combination.key}: {str(e)}")
+                failed.append(combination)
+                if on_error is not None:
+                    on_error(combination, e)
+    except BaseException:
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+
+    order = {combination: i for i, combination in enumerate(combinations)}
+    return sorted(failed, key=order.__getitem__)
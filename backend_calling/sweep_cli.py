@@ -0,0 +1,494 @@
+from __future__ import annotations
+
+import argparse
+import logging
+from contextlib import nullcontext
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from checkpoint import DEFAULT_CHECKPOINT_DIR, CheckpointLog
+from http_client import (
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_READ_TIMEOUT,
+    HttpClient
+)
+from input_manifest import InputManifest
+from job_registry import JobRegistry, registry_path, response_job_names
+from rate_limiter import DEFAULT_INITIAL_RATE, DEFAULT_MAX_RATE, DEFAULT_MIN_RATE, RateLimiter
+from response_arrays import DEFAULT_JOB_TRANSITIONS
+from response_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_SIZE, DEFAULT_TTL, ResponseCache
+from results_format import pad_result
+from run_profiler import RunProfiler, timed
+from sweep import (
+    DEFAULT_LATENCY_ESTIMATE,
+    DEFAULT_MAX_WORKERS,
+    Combination,
+    ScenarioFetcher,
+    run_sweep
+)
+from sweep_metrics import DEFAULT_INTERVAL, SweepMetrics
+
+logger = logging.getLogger(__name__)
+
+# Turns a response into a result, given the job IDs by name, the job ID of
+# the total and the number of transitions to keep per job
+ProcessResponse = Callable[[Dict[str, Any], Dict[str, int], int, int], Dict[str, Any]]
+# Writes the job lookup and results of a run, given the input manifest
+WriteResults = Callable[[Dict[int, str], Dict[str, Dict[str, Any]], InputManifest], None]
+
+
+def parse_rate(value: str) -> float:
+    """
+    Parse a --rate or --max-rate command line value.
+
+    Args:
+        value: Requests per second
+
+    Returns:
+        The rate, at least the lowest rate the limiter backs off to
+    """
+    try:
+        rate = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid rate {value!r}")
+    if not rate >= DEFAULT_MIN_RATE:
+        raise argparse.ArgumentTypeError(
+            f"rate must be at least {DEFAULT_MIN_RATE:g} requests/s, got {value}"
+        )
+    return rate
+
+
+def generate_model_data(
+    combinations: List[Combination],
+    process: ProcessResponse,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    cache: Optional[ResponseCache] = None,
+    checkpoint: Optional[CheckpointLog] = None,
+    resume: bool = False,
+    job_top_k: int = DEFAULT_JOB_TRANSITIONS,
+    client: Optional[HttpClient] = None,
+    base_url: Optional[str] = None,
+    profiler: Optional[RunProfiler] = None,
+    metrics: Optional[SweepMetrics] = None,
+    manifest: Optional[InputManifest] = None,
+    incremental: bool = False,
+    registry: Optional[JobRegistry] = None
+) -> Tuple[Dict[int, str], Dict[str, Dict[str, Any]]]:
+    """
+    Fetch and process the results of all parameter combinations.
+
+    Args:
+        combinations: Combinations to generate, in grid order
+        process: Function turning a response into a result
+        max_workers: Maximum number of API requests in flight at the same time
+        cache: Response cache to read from and write to, if any
+        checkpoint: Checkpoint log recording the progress, if any
+        resume: Whether to skip the combinations completed in the checkpoint
+        job_top_k: Transitions to keep per job
+        client: HTTP client sending the requests
+        base_url: URL of the optimize endpoint
+        profiler: Profiler recording the stage timings, if any
+        metrics: Live sweep metrics, if any
+        manifest: Manifest of the inputs every result was built from, if any
+        incremental: Like resume, but also rebuild completed combinations
+            whose inputs changed
+        registry: Registry of the job IDs, defaults to the one of base_url
+
+    Returns:
+        Job names by job ID, and the results by settings key in grid order
+    """
+    processed = {}
+    pending = combinations
+
+    # Job IDs are kept stable across runs by the registry
+    if registry is None:
+        registry = JobRegistry(registry_path(base_url))
+    registry.load()
+
+    # Pick up the job lookup and completed results of an earlier run
+    if manifest is not None and (resume or incremental):
+        manifest.load()
+    if checkpoint is not None and (resume or incremental):
+        state = checkpoint.load()
+        if state.job_lookup is not None:
+            if registry.adopt(state.job_lookup):
+                processed.update(state.results)
+            else:
+                logger.warning("Checkpoint job IDs differ from the job registry, refetching its results")
+        if incremental and manifest is not None:
+            completed = [c for c in combinations if c.key in processed]
+            stale = manifest.stale(completed)
+            changed = manifest.changed_inputs(completed)
+            logger.info(
+                f"{len(stale)} of {len(completed)} completed scenarios are stale"
+                + (f"; changed inputs: {', '.join(changed)}" if changed else "")
+            )
+            for combination in stale:
+                del processed[combination.key]
+        pending = [c for c in combinations if c.key not in processed]
+        logger.info(
+            f"Resuming from checkpoint: {len(processed)} completed, "
+            f"{len(state.failures)} failed, {len(pending)} to fetch"
+        )
+    elif checkpoint is not None:
+        checkpoint.reset()
+    if checkpoint is not None and registry.names:
+        checkpoint.record_lookup(registry.job_lookup)
+
+    fetch = ScenarioFetcher(
+        cache=cache,
+        client=client,
+        base_url=base_url,
+        profiler=profiler,
+        metrics=metrics
+    )
+    plan = fetch.plan(pending)
+    logger.info(plan.summary())
+
+    profile = profiler.combination if profiler is not None else lambda key: nullcontext()
+    id_lookup = registry.id_lookup
+
+    def handle(combination: Combination, response: Dict[str, Any]) -> None:
+        nonlocal id_lookup
+        with profile(combination.key):
+            added = registry.register(response_job_names(response))
+            if added:
+                logger.info(f"Registered {len(added)} new jobs: {', '.join(added)}")
+                id_lookup = registry.id_lookup
+                if checkpoint is not None:
+                    checkpoint.record_lookup(registry.job_lookup)
+
+            # Process response
+            with timed("process"):
+                result = process(response, id_lookup, registry.total_id, job_top_k)
+            for member in plan.groups[combination]:
+                processed[member.key] = result
+                if checkpoint is not None:
+                    with timed("checkpoint"):
+                        checkpoint.record_result(member.key, result)
+                if manifest is not None:
+                    manifest.record(member)
+        if metrics is not None:
+            metrics.combination_done(True)
+
+    def on_error(combination: Combination, error: Exception) -> None:
+        if checkpoint is not None:
+            for member in plan.groups[combination]:
+                checkpoint.record_failure(member.key, str(error))
+        if metrics is not None:
+            metrics.combination_done(False)
+
+    if metrics is not None:
+        metrics.start(plan.unique, skipped=len(combinations) - len(pending))
+
+    try:
+        failed = plan.expand(run_sweep(
+            plan.fetched(),
+            fetch,
+            handle,
+            max_workers=max_workers,
+            on_error=on_error
+        ))
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+        if manifest is not None:
+            manifest.save()
+
+    # An interrupted run keeps its new jobs in the checkpoint, which a
+    # resumed run adopts, so only a finished run extends the registry
+    registry.save()
+
+    if failed:
+        logger.warning(
+            f"{len(failed)} combinations failed: "
+            f"{', '.join(c.key for c in failed)}. Rerun with --resume to retry them."
+        )
+
+    # Responses complete out of order; restore grid order for stable output
+    results = {
+        combination.key: pad_result(processed[combination.key], registry.num_jobs)
+        for combination in combinations
+        if combination.key in processed
+    }
+
+    return registry.job_lookup, results
+
+
+def add_sweep_arguments(parser: argparse.ArgumentParser, name: str) -> None:
+    """
+    Add the options shared by every generator script to a parser.
+
+    Args:
+        parser: Parser of the script
+        name: Name of the script's checkpoint and manifest files
+    """
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help="Maximum number of API requests in flight at the same time"
+    )
+    parser.add_argument(
+        "--report",
+        type=Path,
+        help="Write a JSON run report with per-combination stage timings"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Run every combination under cProfile; statistics are written next to the report"
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Trace memory allocations and add the largest to the report"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the number of unique API calls and the estimated runtime, then exit"
+    )
+    parser.add_argument(
+        "--latency-estimate",
+        type=float,
+        default=DEFAULT_LATENCY_ESTIMATE,
+        help="Assumed seconds per API call for the --dry-run runtime estimate"
+    )
+    parser.add_argument(
+        "--metrics-file",
+        type=Path,
+        help="Keep live sweep metrics in this file, in the Prometheus text format"
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=DEFAULT_INTERVAL,
+        help="Seconds between updates of the metrics file"
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="Serve live sweep metrics on this port at /metrics"
+    )
+    parser.add_argument(
+        "--base-url",
+        help="URL of the optimize endpoint, such as a local stub_server.py"
+    )
+    parser.add_argument(
+        "--rate",
+        type=parse_rate,
+        default=DEFAULT_INITIAL_RATE,
+        help="API requests per second to start with; adjusted to how the API responds"
+    )
+    parser.add_argument(
+        "--max-rate",
+        type=parse_rate,
+        default=DEFAULT_MAX_RATE,
+        help="Highest number of API requests per second"
+    )
+    parser.add_argument(
+        "--connect-timeout",
+        type=float,
+        default=DEFAULT_CONNECT_TIMEOUT,
+        help="Seconds to wait for a connection to the API"
+    )
+    parser.add_argument(
+        "--read-timeout",
+        type=float,
+        default=DEFAULT_READ_TIMEOUT,
+        help="Seconds to wait for the API to respond"
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=DEFAULT_MAX_RETRIES,
+        help="Number of times a failed API request is repeated"
+    )
+    parser.add_argument(
+        "--job-transitions",
+        type=int,
+        default=DEFAULT_JOB_TRANSITIONS,
+        help="Inbound and outbound transitions to keep per job, 0 to leave them out"
+    )
+    parser.add_argument(
+        "--pretty",
+        action="store_true",
+        help="Indent the JSON output instead of minifying it"
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        default=DEFAULT_CHECKPOINT_DIR / f"{name}.jsonl",
+        help="Path to the checkpoint log of processed combinations"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip combinations completed in the checkpoint and retry failed ones"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "Like --resume, but also rebuild completed combinations whose input "
+            "workbooks, code or options changed since they were recorded"
+        )
+    )
+    parser.add_argument(
+        "--manifest",
+        type=Path,
+        default=DEFAULT_CHECKPOINT_DIR / f"{name}-inputs.json",
+        help="Path to the manifest of the inputs every result was built from"
+    )
+    parser.add_argument(
+        "--registry",
+        "--job-registry",
+        type=Path,
+        help=(
+            "Path to the registry that keeps job IDs stable across runs; defaults to "
+            "the committed registry for the production API and to one per URL otherwise"
+        )
+    )
+    parser.add_argument(
+        "--cache-path",
+        type=Path,
+        default=DEFAULT_CACHE_PATH,
+        help="Path to the response cache database"
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_TTL / 3600,
+        help="Maximum age of cached responses in hours"
+    )
+    parser.add_argument(
+        "--cache-max-size",
+        type=float,
+        default=DEFAULT_MAX_SIZE / 1024 / 1024,
+        help="Maximum size of the response cache in MB"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the response cache"
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Ignore cached responses and fetch everything from the API"
+    )
+
+
+def run_generator(
+    args: argparse.Namespace,
+    combinations: List[Combination],
+    process: ProcessResponse,
+    code: Sequence[str],
+    write: WriteResults
+) -> None:
+    """
+    Run a generator script: sweep all combinations, then write the results.
+
+    With --dry-run only the number of unique API calls and the estimated
+    runtime are printed.
+
+    Args:
+        args: Arguments parsed with the options of add_sweep_arguments()
+        combinations: Combinations to generate, in grid order
+        process: Function turning a response into a result
+        code: Modules of the script that shape every result
+        write: Function writing the job lookup and results
+    """
+    profiler = RunProfiler(cprofile=args.profile, trace_memory=args.trace_memory)
+    limiter = RateLimiter(
+        initial_rate=min(args.rate, args.max_rate),
+        max_rate=args.max_rate
+    )
+    metrics = SweepMetrics(limiter=limiter)
+    client = HttpClient(
+        pool_size=max(args.max_workers, DEFAULT_POOL_SIZE),
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        max_retries=args.retries,
+        limiter=limiter,
+        metrics=metrics
+    )
+    manifest = InputManifest(
+        args.manifest,
+        code=tuple(code) + (Path(__file__).name,),
+        options={"base_url": args.base_url, "job_transitions": args.job_transitions}
+    )
+    cache = None
+    if not args.no_cache:
+        cache = ResponseCache(
+            args.cache_path,
+            ttl=args.cache_ttl * 3600,
+            max_size=int(args.cache_max_size * 1024 * 1024),
+            refresh=args.refresh
+        )
+
+    try:
+        if args.dry_run:
+            if args.resume or args.incremental:
+                completed = CheckpointLog(args.checkpoint).load().results
+                stale = set()
+                if args.incremental:
+                    manifest.load()
+                    stale = set(manifest.stale(c for c in combinations if c.key in completed))
+                combinations = [
+                    c for c in combinations if c.key not in completed or c in stale
+                ]
+            fetch = ScenarioFetcher(cache=cache, client=client, base_url=args.base_url)
+            plan = fetch.plan(combinations)
+            seconds = plan.estimate(args.latency_estimate, args.max_workers, args.max_rate)
+            print(plan.summary())
+            print(
+                f"Estimated runtime: {timedelta(seconds=round(seconds))} at "
+                f"{args.latency_estimate:g}s per call with {args.max_workers} workers "
+                f"and at most {args.max_rate:g} requests/s"
+            )
+            return
+
+        if args.metrics_file is not None:
+            metrics.start_writer(args.metrics_file, args.metrics_interval)
+        if args.metrics_port is not None:
+            metrics.serve(args.metrics_port)
+        logger.info("Starting data generation...")
+        job_lookup, results = generate_model_data(
+            combinations,
+            process,
+            max_workers=args.max_workers,
+            cache=cache,
+            checkpoint=CheckpointLog(args.checkpoint),
+            resume=args.resume,
+            job_top_k=args.job_transitions,
+            client=client,
+            base_url=args.base_url,
+            profiler=profiler,
+            metrics=metrics,
+            manifest=manifest,
+            incremental=args.incremental,
+            registry=JobRegistry(args.registry or registry_path(args.base_url))
+        )
+        logger.info(limiter.summary())
+        logger.info(profiler.summary())
+        if args.report is not None:
+            profiler.write(args.report)
+        if cache is not None:
+            logger.info(cache.summary())
+
+        write(job_lookup, results, manifest)
+
+    except Exception as e:
+        logger.error(f"Error in main execution: {str(e)}")
+        raise
+    finally:
+        metrics.close()
+        profiler.close()
+        client.close()
+        if cache is not None:
+            cache.close()
@@ -0,0 +1,327 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, List, Optional, Tuple, Union
+
+from rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_INTERVAL = 5.0
+# Upper bounds in seconds of the request latency histogram buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+class SweepMetrics:
+    """
+    Live progress and throughput counters of a sweep.
+
+    The sweep, the scenario fetcher and the HTTP client report into the
+    same instance from any thread. render() formats the current values in
+    the OpenMetrics text format, which Prometheus scrapes and which is
+    readable as is; they can be written to a file every few seconds with
+    start_writer() or served over HTTP with serve().
+    """
+
+    def __init__(self, limiter: Optional[RateLimiter] = None) -> None:
+        """
+        Initialize the metrics.
+
+        Args:
+            limiter: Rate limiter whose current rate is reported, if any
+        """
+        self.limiter = limiter
+        self.total = 0
+        self.skipped = 0
+        self.completed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.response_bytes = 0
+        self.statuses: Counter = Counter()
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+        self.latency_count = 0
+
+        self._lock = threading.Lock()
+        self._created = time.time()
+        self._started: Optional[float] = None
+        self._stop = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def start(self, total: int, skipped: int = 0) -> None:
+        """
+        Mark the start of the sweep.
+
+        Args:
+            total: Number of combinations to fetch in this run
+            skipped: Number of combinations already completed by an
+                earlier run, which are not fetched again
+        """
+        with self._lock:
+            self.total = total
+            self.skipped = skipped
+            self._started = time.time()
+
+    def fetch_started(self) -> None:
+        """Record that a combination started fetching."""
+        with self._lock:
+            self.in_flight += 1
+
+    def fetch_finished(self) -> None:
+        """Record that a combination stopped fetching, with or without a response."""
+        with self._lock:
+            self.in_flight -= 1
+
+    def cache_lookup(self, hit: bool) -> None:
+        """Record a response cache lookup."""
+        with self._lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+    def request(self, status: Optional[int], latency: float, size: int = 0) -> None:
+        """
+        Record an HTTP request attempt.
+
+        Args:
+            status: HTTP status code, or None when no response was received
+            latency: Seconds the attempt took
+            size: Bytes in the response body
+        """
+        with self._lock:
+            self.statuses["none" if status is None else str(status)] += 1
+            self.response_bytes += size
+            self.latency_sum += latency
+            self.latency_count += 1
+            index = bisect_left(LATENCY_BUCKETS, latency)
+            if index < len(self.latency_buckets):
+                self.latency_buckets[index] += 1
+
+    def combination_done(self, ok: bool) -> None:
+        """Record that a combination was processed, or failed."""
+        with self._lock:
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    def eta(self) -> Optional[float]:
+        """
+        Return the projected seconds until the sweep completes.
+
+        Projects the average rate at which combinations finished so far
+        onto the remaining ones.
+
+        Returns:
+            Seconds remaining, or None before the first combination finished
+        """
+        with self._lock:
+            return self._eta(time.time())
+
+    def _eta(self, now: float) -> Optional[float]:
+        done = self.completed + self.failed
+        if self._started is None or done == 0:
+            return None
+        return (self.total - done) * (now - self._started) / done
+
+    def render(self) -> str:
+        """Return the current values in the OpenMetrics text format."""
+        lines: List[str] = []
+
+        def metric(name: str, kind: str, help: str, *samples: Tuple[str, Any]) -> None:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, value in samples:
+                lines.append(f"{name}{suffix} {value}")
+
+        with self._lock:
+            now = time.time()
+            eta = self._eta(now)
+            hits, lookups = self.cache_hits, self.cache_hits + self.cache_misses
+
+            metric(
+                "sweep_combinations", "gauge",
+                "Combinations to fetch in this run.",
+                ("", self.total)
+            )
+            metric(
+                "sweep_combinations_skipped", "gauge",
+                "Combinations completed by an earlier run.",
+                ("", self.skipped)
+            )
+            metric(
+                "sweep_combinations_completed", "counter",
+                "Combinations fetched and processed.",
+                ("_total", self.completed)
+            )
+            metric(
+                "sweep_combinations_failed", "counter",
+                "Combinations that failed to fetch or process.",
+                ("_total", self.failed)
+            )
+            metric(
+                "sweep_combinations_in_flight", "gauge",
+                "Combinations being fetched.",
+                ("", self.in_flight)
+            )
+            metric(
+                "sweep_requests", "counter",
+                "HTTP request attempts by status code.",
+                *((f'_total{{status="{status}"}}', n) for status, n in sorted(self.statuses.items()))
+            )
+            cumulative, buckets = 0, []
+            for bound, n in zip(LATENCY_BUCKETS, self.latency_buckets):
+                cumulative += n
+                buckets.append((f'_bucket{{le="{bound}"}}', cumulative))
+            metric(
+                "sweep_request_duration_seconds", "histogram",
+                "Duration of HTTP request attempts.",
+                *buckets,
+                ('_bucket{le="+Inf"}', self.latency_count),
+                ("_sum", round(self.latency_sum, 6)),
+                ("_count", self.latency_count)
+            )
+            metric(
+                "sweep_response_bytes", "counter",
+                "Bytes received in response bodies.",
+                ("_total", self.response_bytes)
+            )
+            metric(
+                "sweep_cache_hits", "counter",
+                "Responses served from the response cache.",
+                ("_total", hits)
+            )
+            metric(
+                "sweep_cache_misses", "counter",
+                "Response cache lookups that went to the API.",
+                ("_total", self.cache_misses)
+            )
+            metric(
+                "sweep_cache_hit_ratio", "gauge",
+                "Fraction of response cache lookups that were hits.",
+                ("", round(hits / lookups, 6) if lookups else 0)
+            )
+            if self.limiter is not None:
+                metric(
+                    "sweep_rate_limit_requests_per_second", "gauge",
+                    "Current request rate allowed by the rate limiter.",
+                    ("", round(self.limiter.rate, 6))
+                )
+            metric(
+                "sweep_start_time_seconds", "gauge",
+                "Unix time the sweep started.",
+                ("", round(self._started or self._created, 3))
+            )
+            if eta is not None:
+                metric(
+                    "sweep_eta_seconds", "gauge",
+                    "Projected seconds until all combinations are done.",
+                    ("", round(eta, 3))
+                )
+                metric(
+                    "sweep_projected_completion_time_seconds", "gauge",
+                    "Projected Unix time at which all combinations are done.",
+                    ("", round(now + eta, 3))
+                )
+
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Union[str, Path]) -> None:
+        """
+        Write the current values to a file.
+
+        The file is replaced in one step, so readers never see a partial file.
+
+        Args:
+            path: Path of the metrics file
+        """
+        path = Path(path)
+        temp = path.with_name(f".{path.name}.tmp")
+        temp.write_text(self.render(), encoding="utf-8")
+        os.replace(temp, path)
+
+    def start_writer(self, path: Union[str, Path], interval: float = DEFAULT_INTERVAL) -> None:
+        """
+        Rewrite the metrics file from a background thread until close().
+
+        Args:
+            path: Path of the metrics file
+            interval: Seconds between writes
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        def run() -> None:
+            while not self._stop.wait(interval):
+                try:
+                    self.write(path)
+                except OSError as e:
+                    logger.warning(f"Could not write metrics to {path}: {str(e)}")
+            self.write(path)
+
+        self.write(path)
+        self._writer = threading.Thread(target=run, name="sweep-metrics", daemon=True)
+        self._writer.start()
+        logger.info(f"Writing sweep metrics to {path} every {interval:g}s")
+
+    def serve(self, port: int, host: str = DEFAULT_HOST) -> str:
+        """
+        Serve the metrics over HTTP from a background thread until close().
+
+        Args:
+            port: Port to listen on, 0 for any free port
+            host: Address to listen on
+
+        Returns:
+            URL of the metrics endpoint
+        """
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.metrics = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        url = f"http://{host}:{self._server.server_port}/metrics"
+        logger.info(f"Serving sweep metrics on {url}")
+        return url
+
+    def close(self) -> None:
+        """Write the final values and stop the writer thread and the server."""
+        self._stop.set()
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Request handler serving the metrics of the server's sweep."""
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0].rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format % args)
@@ -0,0 +1,14 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+@pytest.fixture
+def backend_dir(monkeypatch):
+    """Run the test from backend_calling, which the input paths are relative to."""
+    monkeypatch.chdir(BACKEND_DIR)
+    return BACKEND_DIR
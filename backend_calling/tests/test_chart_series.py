@@ -0,0 +1,133 @@
+import math
+import random
+
+import pytest
+
+from chart_series import chart_series
+from results_format import METRICS
+
+# A port of src/components/visualization/Waterfall/utils.ts, one job at a time
+
+
+def ts_round(value):
+    """Math.round rounds halves up."""
+    return math.floor(value + 0.5)
+
+
+def round_small_values(value):
+    return 0 if abs(value) < 20 else value
+
+
+def process_left_data(data):
+    total = 0
+    processed = []
+    for item in data:
+        base = total
+        value = round_small_values(item["value"])
+        total += value
+        processed.append({**item, "value": value, "base": base})
+    return processed
+
+
+def process_right_data(data):
+    rounded = [{**item, "value": round_small_values(item["value"])} for item in data]
+    total = sum(item["value"] for item in rounded)
+    processed = []
+    for item in rounded:
+        total -= item["value"]
+        processed.append({**item, "base": total})
+    return processed
+
+
+def get_supply_data(d):
+    return [
+        {"value": round_small_values(ts_round(d["labor_supply"]))},
+        {"value": round_small_values(ts_round(d["net_labor_change"]))},
+    ]
+
+
+def get_demand_data(d):
+    return [
+        {"value": round_small_values(ts_round(d[name]))}
+        for name in ("productivity", "expansion_demand", "reduction_demand", "vacancies", "labor_supply")
+    ]
+
+
+def get_gap_data(d):
+    total_supply = d["labor_supply"] + d["net_labor_change"]
+    total_demand = (
+        d["labor_supply"] + d["vacancies"] + d["expansion_demand"]
+        + d["reduction_demand"] + d["productivity"]
+    )
+    superfluous = d["superfluous_workers"] - d["transitions_out"]
+    return [
+        {"value": round_small_values(ts_round(total_supply)), "base": 0},
+        {"value": round_small_values(ts_round(superfluous) * -1), "base": ts_round(total_supply)},
+        {"value": round_small_values(ts_round(d["transitions_in"])), "base": total_supply - superfluous},
+        {
+            "value": round_small_values(ts_round(d["shortage"])),
+            "base": total_supply - superfluous + d["transitions_in"]
+        },
+        {"value": round_small_values(ts_round(total_demand)), "base": 0},
+    ]
+
+
+def calculate_waterfall_minimum(d):
+    def find_min_point(data):
+        return min(
+            item["base"] if item["value"] >= 0 else item["base"] + item["value"]
+            for item in data
+        )
+
+    return min(
+        find_min_point(process_left_data(get_supply_data(d))),
+        find_min_point(process_right_data(get_demand_data(d))),
+        find_min_point(get_gap_data(d)),
+    )
+
+
+@pytest.fixture
+def result():
+    """A columnar result with negative and small values, and a job without data."""
+    rng = random.Random(24)
+    num_jobs = 40
+    changes = [
+        [rng.choice([rng.randint(-5000, 5000), rng.randint(-25, 25)]) for _ in range(num_jobs)]
+        for _ in METRICS
+    ]
+    for column in changes:
+        column[7] = None
+    return {
+        "workforceChanges": changes,
+        "remainingShortages": {"jobId": [0, 1], "shortage": [10, 30]},
+        "topTransitions": {"sourceJobId": [], "targetJobId": [], "amount": []},
+    }
+
+
+def test_minimum_matches_the_frontend(result):
+    job_lookup = {i: f"Job {i}" for i in range(40)}
+
+    series = chart_series(result, job_lookup)
+
+    for job_id, minimum in enumerate(series["min"]):
+        if job_id == 7:
+            assert minimum is None
+            continue
+        metrics = {name: column[job_id] for name, column in zip(METRICS, result["workforceChanges"])}
+        assert minimum == calculate_waterfall_minimum(metrics)
+    assert any(minimum < 0 for minimum in series["min"] if minimum is not None)
+
+
+def test_waterfall_bars_match_the_frontend(result):
+    series = chart_series(result, {i: f"Job {i}" for i in range(40)})
+    supply = series["waterfall"]["supply"]
+    demand = series["waterfall"]["demand"]
+
+    metrics = {name: column[3] for name, column in zip(METRICS, result["workforceChanges"])}
+    left = process_left_data(get_supply_data(metrics))
+    right = process_right_data(get_demand_data(metrics))
+    assert [step[3] for step in supply["value"]] == [item["value"] for item in left]
+    assert [step[3] for step in supply["base"]] == [item["base"] for item in left]
+    assert [step[3] for step in demand["value"]] == [item["value"] for item in right]
+    assert [step[3] for step in demand["base"]] == [item["base"] for item in right]
+    assert series["shortageBars"]["jobId"] == [1, 0]
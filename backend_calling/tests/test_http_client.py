@@ -0,0 +1,95 @@
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import http_client
+from http_client import HttpClient
+
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    """Answers every request with the next status and headers of the script."""
+
+    def do_GET(self):
+        status, headers = self.server.script.pop(0)
+        self.server.requests += 1
+        body = b'{"ok": true}' if status == 200 else b'{"detail": "error"}'
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ScriptedHandler)
+    server.script = []
+    server.requests = 0
+    server.url = f"http://127.0.0.1:{server.server_port}/optimize/"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record the backoff delays instead of sleeping."""
+    sleeps = []
+    monkeypatch.setattr(http_client, "time", types.SimpleNamespace(
+        monotonic=time.monotonic,
+        time=time.time,
+        sleep=sleeps.append
+    ))
+    return sleeps
+
+
+def test_server_errors_are_retried(server, sleeps):
+    server.script = [(503, {}), (500, {}), (200, {})]
+    client = HttpClient(max_retries=3, backoff_base=0)
+
+    response = client.get(server.url)
+
+    assert response.json() == {"ok": True}
+    assert server.requests == 3
+    assert client.retries == 2
+    client.close()
+
+
+def test_too_many_requests_waits_for_retry_after(server, sleeps):
+    server.script = [(429, {"Retry-After": "7"}), (200, {})]
+    client = HttpClient(max_retries=3, backoff_base=0)
+
+    assert client.get(server.url).status_code == 200
+    assert sleeps == [7.0]
+    client.close()
+
+
+def test_client_errors_are_not_retried(server, sleeps):
+    server.script = [(400, {}), (200, {})]
+    client = HttpClient(max_retries=3, backoff_base=0)
+
+    with pytest.raises(requests.HTTPError):
+        client.get(server.url)
+    assert server.requests == 1
+    assert sleeps == []
+    client.close()
+
+
+def test_last_failure_is_raised(server, sleeps):
+    server.script = [(502, {}), (502, {}), (502, {})]
+    client = HttpClient(max_retries=2, backoff_base=0)
+
+    with pytest.raises(requests.HTTPError):
+        client.get(server.url)
+    assert server.requests == 3
+    assert len(sleeps) == 2
+    client.close()
@@ -0,0 +1,49 @@
+import shutil
+
+import pytest
+
+import input_manifest
+from input_manifest import LABEL_CODE, SCENARIO_CODE, InputManifest
+from requesting_api import HoursWorked, JobPriority, NonSourceJobs
+from sweep import build_combinations
+
+
+@pytest.fixture
+def code_dir(backend_dir, tmp_path, monkeypatch):
+    """Copy the fingerprinted modules to a directory the test may change."""
+    code_dir = tmp_path / "code"
+    code_dir.mkdir()
+    for name in SCENARIO_CODE + LABEL_CODE:
+        shutil.copy(backend_dir / name, code_dir / name)
+    monkeypatch.setattr(input_manifest, "CODE_DIR", code_dir)
+    return code_dir
+
+
+@pytest.mark.parametrize(
+    "module",
+    ["results_format.py", "workbook_cache.py", "sweep.py", "job_registry.py"]
+)
+def test_changed_module_makes_every_scenario_stale(code_dir, tmp_path, module):
+    combinations = build_combinations(
+        [1.0],
+        [True, False],
+        [HoursWorked.EVERYONE, HoursWorked.PART_TIME],
+        [JobPriority.STANDARD],
+        [NonSourceJobs.STANDARD]
+    )
+    path = tmp_path / "manifest.json"
+    manifest = InputManifest(path)
+    for combination in combinations:
+        manifest.record(combination)
+    manifest.save()
+
+    unchanged = InputManifest(path)
+    unchanged.load()
+    assert unchanged.stale(combinations) == []
+
+    with open(code_dir / module, "a", encoding="utf-8") as f:
+        f.write("\n# changed\n")
+    changed = InputManifest(path)
+    changed.load()
+    assert changed.stale(combinations) == combinations
+    assert changed.changed_inputs(combinations) == [module]
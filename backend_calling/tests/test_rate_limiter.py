@@ -0,0 +1,56 @@
+import argparse
+
+import pytest
+
+from rate_limiter import DEFAULT_MIN_RATE, RateLimiter
+from sweep_cli import add_sweep_arguments
+
+
+def test_healthy_responses_raise_the_rate():
+    limiter = RateLimiter(initial_rate=1.0, increase=0.5)
+    limiter.record(200, 0.1)
+
+    assert limiter.rate == 1.5
+    assert limiter.latency == 0.1
+
+
+@pytest.mark.parametrize("status", [400, 404, 422])
+def test_client_errors_leave_the_rate_alone(status):
+    limiter = RateLimiter(initial_rate=1.0, increase=0.5)
+    for _ in range(10):
+        limiter.record(status, 5.0)
+
+    assert limiter.rate == 1.0
+    assert limiter.slowdowns == 0
+    assert limiter.latency is None
+
+
+@pytest.mark.parametrize("status", [None, 429, 503])
+def test_failures_cut_the_rate(status):
+    limiter = RateLimiter(initial_rate=1.0, decrease=0.5)
+    limiter.record(status, 0.1)
+
+    assert limiter.rate == 0.5
+    assert limiter.slowdowns == 1
+
+
+@pytest.fixture
+def parser():
+    parser = argparse.ArgumentParser()
+    add_sweep_arguments(parser, "test")
+    return parser
+
+
+def test_rate_options_are_parsed(parser):
+    args = parser.parse_args(["--rate", "0.5", "--max-rate", "10"])
+
+    assert (args.rate, args.max_rate) == (0.5, 10.0)
+
+
+@pytest.mark.parametrize("option", ["--rate", "--max-rate"])
+@pytest.mark.parametrize("value", [str(DEFAULT_MIN_RATE / 2), "0", "-1", "fast"])
+def test_rates_below_the_minimum_are_rejected(parser, capsys, option, value):
+    with pytest.raises(SystemExit):
+        parser.parse_args([option, value])
+
+    assert option in capsys.readouterr().err
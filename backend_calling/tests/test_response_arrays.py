@@ -0,0 +1,67 @@
+import random
+
+import numpy as np
+import pytest
+
+from response_arrays import _top_per_row, job_transitions, response_arrays
+
+
+def brute_force_top(amounts, row_ids, column_ids, num_jobs, top_k):
+    """Sort every row in full and keep its first top_k transitions."""
+    rows = dict(zip(row_ids.tolist(), amounts.tolist()))
+    offsets, job_ids, kept = [0], [], []
+    for job_id in range(num_jobs):
+        entries = [
+            (amount, position) for position, amount in enumerate(rows.get(job_id, []))
+            if amount >= 0
+        ]
+        # Stable: equal amounts keep their column order
+        entries = sorted(entries, key=lambda entry: -entry[0])[:top_k]
+        job_ids.extend(int(column_ids[position]) for _, position in entries)
+        kept.extend(amount for amount, _ in entries)
+        offsets.append(len(job_ids))
+    return {"offsets": offsets, "jobId": job_ids, "amount": kept}
+
+
+@pytest.mark.parametrize("top_k", [1, 2, 4, 6, 10])
+def test_top_per_row_matches_a_full_sort(top_k):
+    rng = np.random.default_rng(top_k)
+    for _ in range(20):
+        # Few distinct amounts, so most rows have ties; -1 marks no transition
+        amounts = rng.choice([-1, 0, 3, 3, 5, 8], size=(5, 6))
+        row_ids = rng.permutation(8)[:5]
+        column_ids = rng.permutation(8)[:6]
+
+        assert _top_per_row(amounts, row_ids, column_ids, 8, top_k) == brute_force_top(
+            amounts, row_ids, column_ids, 8, top_k
+        )
+
+
+def test_job_transitions_match_a_full_sort():
+    rng = random.Random(1)
+    names = [f"Job {i}" for i in range(6)]
+    # Job 6 has no transitions at all
+    id_lookup = dict(zip(names, [3, 0, 5, 1, 4, 2]))
+    # Amounts that round to equal values, and self transitions, are included
+    transitions = {
+        source: {target: rng.choice([0, 0.3, 1.5, 2.5, 4, 4.2, 9]) for target in names}
+        for source in names
+    }
+    response = {"shortages_by_job": {}, "shortage_components": {}, "transitions": transitions}
+
+    tables = job_transitions(response_arrays(response, id_lookup), 7, top_k=3)
+
+    for direction, pairs in (
+        ("outbound", lambda job: [(other, transitions[job][other]) for other in names]),
+        ("inbound", lambda job: [(other, transitions[other][job]) for other in names]),
+    ):
+        table = tables[direction]
+        for job in names:
+            expected = sorted(
+                [(id_lookup[other], round(amount)) for other, amount in pairs(job)
+                 if amount > 0 and other != job],
+                key=lambda entry: -entry[1]
+            )[:3]
+            start, end = table["offsets"][id_lookup[job]:id_lookup[job] + 2]
+            assert list(zip(table["jobId"][start:end], table["amount"][start:end])) == expected
+        assert table["offsets"][6] == table["offsets"][7] == len(table["jobId"])
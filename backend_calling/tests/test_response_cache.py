@@ -0,0 +1,80 @@
+import json
+import zlib
+
+import pytest
+
+import response_cache
+from response_cache import ResponseCache, request_key
+
+RESPONSE = {"shortages_by_job": {"Job 1": 1.5}, "transitions": {}}
+SIZE = len(zlib.compress(json.dumps(RESPONSE).encode("utf-8")))
+
+
+class Clock:
+    """Stands in for the time module, with a time that only moves when told."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache, "time", clock)
+    return clock
+
+
+def test_request_key_ignores_parameter_order():
+    url = "https://example.com/optimize/"
+    params = {"a": 1, "b": '{"x": 1, "y": [1, 2]}', "c": True}
+    reordered = {"c": True, "b": '{"y": [1, 2], "x": 1}', "a": 1}
+
+    assert request_key(url, params) == request_key(url, reordered)
+    assert request_key(url, params) != request_key(url, {**params, "a": 2})
+    assert request_key(url, params) != request_key("https://example.com/other/", params)
+
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "cache.sqlite3", ttl=60, max_size=None)
+    cache.put("key", RESPONSE)
+
+    clock.now += 60
+    assert cache.contains("key")
+    assert cache.get("key") == RESPONSE
+
+    clock.now += 1
+    assert not cache.contains("key")
+    assert cache.get("key") is None
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 1, 1)
+    cache.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "cache.sqlite3", ttl=None, max_size=2 * SIZE)
+    cache.put("a", RESPONSE)
+    clock.now += 1
+    cache.put("b", RESPONSE)
+    clock.now += 1
+    assert cache.get("a") == RESPONSE
+    clock.now += 1
+
+    cache.put("c", RESPONSE)
+
+    assert [key for key, _ in cache.iter_items()] == ["a", "c"]
+    assert cache.evictions == 1
+    cache.close()
+
+
+def test_refresh_ignores_cached_entries(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    cache = ResponseCache(path)
+    cache.put("key", RESPONSE)
+    cache.close()
+
+    refreshing = ResponseCache(path, refresh=True)
+    assert not refreshing.contains("key")
+    assert refreshing.get("key") is None
+    refreshing.close()
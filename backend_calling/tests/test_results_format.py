@@ -0,0 +1,106 @@
+from requesting_api import HoursWorked, JobPriority, NonSourceJobs
+from results_format import (
+    DEFAULT_SCENARIO,
+    METRICS,
+    decode_result,
+    encode_deltas,
+    encode_result,
+    pad_result,
+    resolve_deltas,
+    unwrap_results,
+    wrap_results
+)
+from sweep import build_combinations, delta_parents
+
+
+def metrics(offset):
+    return {metric: offset + i for i, metric in enumerate(METRICS)}
+
+
+ROW_RESULT = {
+    "remainingShortages": [{"jobId": 2, "shortage": 40}, {"jobId": 0, "shortage": 25}],
+    "topTransitions": [{"sourceJobId": 0, "targetJobId": 2, "amount": 120}],
+    # Job 1 has no workforce changes, job 3 is the total
+    "workforceChanges": {"0": metrics(0), "2": metrics(100), "3": metrics(200)},
+    "jobTransitions": {
+        "outbound": {"offsets": [0, 1, 1, 1, 1], "jobId": [2], "amount": [120]},
+        "inbound": {"offsets": [0, 0, 0, 1, 1], "jobId": [0], "amount": [120]}
+    },
+    "addedValueChangePercent": 0.12
+}
+
+
+def test_encode_decode_round_trip():
+    encoded = encode_result(ROW_RESULT, 4)
+
+    assert encoded["remainingShortages"] == {"jobId": [2, 0], "shortage": [40, 25]}
+    assert encoded["topTransitions"] == {"sourceJobId": [0], "targetJobId": [2], "amount": [120]}
+    assert len(encoded["workforceChanges"]) == len(METRICS)
+    assert encoded["workforceChanges"][1] == [1, None, 101, 201]
+    assert decode_result(encoded) == ROW_RESULT
+
+
+def test_decode_follows_the_published_metric_order():
+    encoded = encode_result(ROW_RESULT, 4)
+    reordered = dict(encoded, workforceChanges=encoded["workforceChanges"][::-1])
+
+    assert decode_result(reordered, METRICS[::-1]) == ROW_RESULT
+
+
+def test_pad_result_extends_the_job_arrays():
+    encoded = encode_result(ROW_RESULT, 4)
+
+    padded = pad_result(encoded, 6)
+
+    assert all(column[4:] == [None, None] for column in padded["workforceChanges"])
+    assert [column[:4] for column in padded["workforceChanges"]] == encoded["workforceChanges"]
+    for direction in ("outbound", "inbound"):
+        table = padded["jobTransitions"][direction]
+        assert table["offsets"] == encoded["jobTransitions"][direction]["offsets"] + [1, 1]
+    assert decode_result(padded)["workforceChanges"] == ROW_RESULT["workforceChanges"]
+    # The input is left as it was
+    assert len(encoded["workforceChanges"][0]) == 4
+
+
+def test_pad_result_keeps_results_that_are_long_enough():
+    encoded = encode_result(ROW_RESULT, 4)
+
+    assert pad_result(encoded, 4) is encoded
+
+
+def test_delta_chains_resolve_when_parents_are_missing():
+    combinations = build_combinations(
+        [0.5, 1.0, 1.5],
+        [True, False],
+        [HoursWorked.EVERYONE],
+        [JobPriority.STANDARD],
+        [NonSourceJobs.STANDARD, NonSourceJobs.AMBITIOUS_ONLY]
+    )
+    missing = {"1.0-with-everyone-standard-ambitious-only", "1.0-without-everyone-standard-standard"}
+    keys = [c.key for c in combinations if c.key not in missing]
+    base = encode_result(ROW_RESULT, 4)
+    scenarios = {}
+    for i, key in enumerate(keys):
+        # Every scenario changes a different value of the same base
+        columns = [list(column) for column in base["workforceChanges"]]
+        columns[i % len(METRICS)][2] += i + 1
+        scenarios[key] = dict(base, workforceChanges=columns, addedValueChangePercent=i / 100)
+
+    parents = delta_parents(keys, DEFAULT_SCENARIO)
+    encoded = encode_deltas(scenarios, parents)
+
+    assert "base" not in encoded[DEFAULT_SCENARIO]
+    assert all(encoded[key]["base"] == parent for key, parent in parents.items())
+    assert set(parents.values()) <= set(keys)
+    # Skip the missing neighbours to reach the baseline
+    assert parents["1.5-with-everyone-standard-ambitious-only"] == DEFAULT_SCENARIO
+    assert parents["1.0-without-everyone-standard-ambitious-only"] == DEFAULT_SCENARIO
+    # Goes through another delta encoded scenario
+    assert parents["1.5-without-everyone-standard-ambitious-only"] == (
+        "1.0-without-everyone-standard-ambitious-only"
+    )
+    assert "base" in encoded["1.0-without-everyone-standard-ambitious-only"]
+    assert resolve_deltas(encoded) == scenarios
+    assert unwrap_results(wrap_results(encoded)) == {
+        key: decode_result(scenario) for key, scenario in scenarios.items()
+    }
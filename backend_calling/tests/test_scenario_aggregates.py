@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from results_format import DEFAULT_SCENARIO, METRICS
+from scenario_aggregates import AGGREGATE_METRICS, _rank, compute_aggregates
+
+JOB_LOOKUP = {0: "Job A", 1: "Job B", 2: "Totaal"}
+SHORTAGE = AGGREGATE_METRICS.index("shortage")
+REMAINING = AGGREGATE_METRICS.index("remaining_shortage")
+
+
+def columnar_result(shortages, remaining, added_value):
+    """Build a columnar result with the given shortage per job; None for jobs without data."""
+    changes = [[None if s is None else 0 for s in shortages] for _ in METRICS]
+    changes[METRICS.index("shortage")] = list(shortages)
+    return {
+        "workforceChanges": changes,
+        "remainingShortages": {"jobId": list(remaining), "shortage": list(remaining.values())},
+        "topTransitions": {"sourceJobId": [], "targetJobId": [], "amount": []},
+        "addedValueChangePercent": added_value
+    }
+
+
+@pytest.fixture
+def aggregates():
+    results = {
+        DEFAULT_SCENARIO: columnar_result([10, 5, 15], {0: 4}, 1.5),
+        "0.5-with-everyone-standard-standard": columnar_result([30, 5, 35], {0: 6, 1: 2}, 0.5),
+        # Job B has no data; the total ties with the default scenario
+        "1.5-with-everyone-standard-standard": columnar_result([10, None, 15], {}, 2.0),
+    }
+    return compute_aggregates(results, JOB_LOOKUP)
+
+
+def test_job_aggregates_match_hand_computed_values(aggregates):
+    jobs = aggregates["jobs"]
+
+    # Job A shortage: 10, 30, 10; the first of equal values wins
+    assert jobs["min"][SHORTAGE][0] == 10
+    assert jobs["max"][SHORTAGE][0] == 30
+    assert jobs["mean"][SHORTAGE][0] == round(50 / 3, 4)
+    assert jobs["minScenario"][SHORTAGE][0] == 0
+    assert jobs["maxScenario"][SHORTAGE][0] == 1
+
+    # Job B shortage: 5, 5 and missing, which drops out of the mean
+    assert jobs["min"][SHORTAGE][1] == 5
+    assert jobs["max"][SHORTAGE][1] == 5
+    assert jobs["mean"][SHORTAGE][1] == 5
+
+    # Job A remaining shortage: 4, 6 and 0, as scenario 3 does not list it
+    assert jobs["min"][REMAINING][0] == 0
+    assert jobs["max"][REMAINING][0] == 6
+    assert jobs["mean"][REMAINING][0] == round(10 / 3, 4)
+    assert jobs["minScenario"][REMAINING][0] == 2
+
+    # Job B remaining shortage: 0 and 2; missing where B has no data
+    assert jobs["min"][REMAINING][1] == 0
+    assert jobs["max"][REMAINING][1] == 2
+    assert jobs["mean"][REMAINING][1] == 1
+
+
+def test_scenario_totals_deltas_and_ranks(aggregates):
+    assert aggregates["defaultScenario"] == DEFAULT_SCENARIO
+    assert aggregates["totals"]["shortage"] == [15, 35, 15]
+    assert aggregates["totals"]["remaining_shortage"] == [4, 8, 0]
+    assert aggregates["deltas"]["shortage"] == [0, 20, 0]
+    assert aggregates["deltas"]["addedValueChangePercent"] == [0.0, -1.0, 0.5]
+    # Equal totals share a rank, and the next rank is skipped
+    assert aggregates["ranks"]["shortage"] == [1, 3, 1]
+    assert aggregates["ranks"]["addedValueChangePercent"] == [2, 3, 1]
+
+
+def test_rank_is_competition_rank_and_skips_nan():
+    values = np.array([3.0, np.nan, 1.0, 3.0, 2.0])
+
+    ascending = _rank(values, ascending=True)
+    descending = _rank(values, ascending=False)
+
+    np.testing.assert_array_equal(ascending, [3, np.nan, 1, 3, 2])
+    np.testing.assert_array_equal(descending, [1, np.nan, 4, 1, 3])
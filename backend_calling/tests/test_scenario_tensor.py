@@ -0,0 +1,98 @@
+import json
+
+import numpy as np
+import pytest
+
+from generate_data import process_single_response
+from job_registry import TOTAL_JOB, JobRegistry, response_job_names
+from output_writer import write_json
+from requesting_api import HoursWorked, JobPriority, NonSourceJobs
+from results_format import METRICS
+from scenario_tensor import MISSING, TENSOR_METRICS, ScenarioTensor, write_tensor
+from stub_server import synthetic_response
+from sweep import build_combinations
+
+
+@pytest.fixture
+def raw_data(tmp_path):
+    """Write raw results of a small grid, as generate_data.py does."""
+    combinations = build_combinations(
+        [0.5, 1.0],
+        [True, False],
+        [HoursWorked.EVERYONE, HoursWorked.PART_TIME],
+        [JobPriority.STANDARD],
+        [NonSourceJobs.STANDARD]
+    )
+    names = [f"Job {i}" for i in range(8)]
+    registry = JobRegistry(tmp_path / "registry.json")
+    # Registered by an earlier run, but absent from these responses
+    registry.register(names + ["Job 8"])
+
+    results = {}
+    # The last combination has no result
+    for combination in combinations[:-1]:
+        response = synthetic_response(names, combination.key)
+        registry.register(response_job_names(response))
+        results[combination.key] = process_single_response(
+            response, registry.id_lookup, registry.total_id
+        )
+    write_json(tmp_path / "raw-model-results.json", results, compressed=False)
+    write_json(tmp_path / "raw-job-names.json", registry.job_lookup, compressed=False)
+    return tmp_path, combinations
+
+
+def test_tensor_round_trips_the_raw_results(raw_data):
+    directory, combinations = raw_data
+    with open(directory / "raw-model-results.json", "r", encoding="utf-8") as f:
+        results = json.load(f)
+    with open(directory / "raw-job-names.json", "r", encoding="utf-8") as f:
+        job_lookup = {int(i): name for i, name in json.load(f).items()}
+
+    write_tensor(directory, results, combinations, job_lookup)
+    tensor = ScenarioTensor.open(directory)
+
+    absent = next(i for i, name in job_lookup.items() if name == "Job 8")
+    for combination in combinations[:-1]:
+        result = results[combination.key]
+        shortages = {s["jobId"]: s["shortage"] for s in result["remainingShortages"]}
+        for job_id in job_lookup:
+            selected = tensor.select(
+                job=job_id,
+                productivity=combination.productivity,
+                steering=combination.steering,
+                hours=combination.hours,
+                priority=combination.priority,
+                non_source=combination.non_source
+            )
+            changes = result["workforceChanges"].get(str(job_id))
+            if changes is None:
+                assert job_id == absent
+                assert (selected == MISSING).all()
+                continue
+            assert selected.tolist() == [changes[m] for m in METRICS] + [shortages.get(job_id, 0)]
+
+    missing = tensor.scenario(combinations[-1].key)
+    assert (missing == MISSING).all()
+
+
+def test_masked_selections_tell_missing_from_zero(raw_data):
+    directory, combinations = raw_data
+    with open(directory / "raw-model-results.json", "r", encoding="utf-8") as f:
+        results = json.load(f)
+    with open(directory / "raw-job-names.json", "r", encoding="utf-8") as f:
+        job_lookup = {int(i): name for i, name in json.load(f).items()}
+    write_tensor(directory, results, combinations, job_lookup)
+    tensor = ScenarioTensor.open(directory)
+
+    shortage = tensor.select(masked=True, metric="remaining_shortage", steering="with")
+
+    assert tensor.remaining_axes(metric="remaining_shortage", steering="with") == [
+        "productivity", "hours", "priority", "non_source", "job"
+    ]
+    absent = next(i for i, name in job_lookup.items() if name == "Job 8")
+    assert shortage.mask[..., absent].all()
+    # The total is never listed in remainingShortages, so it is a real 0
+    total = next(i for i, name in job_lookup.items() if name == TOTAL_JOB)
+    assert not shortage.mask[..., total].any()
+    assert (shortage[..., total] == 0).all()
+    assert len(TENSOR_METRICS) == tensor.array.shape[-1]
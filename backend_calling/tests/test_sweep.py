@@ -0,0 +1,24 @@
+from requesting_api import HoursWorked, JobPriority, NonSourceJobs
+from run_profiler import RunProfiler
+from sweep import ScenarioFetcher, build_combinations
+
+
+def test_plan_records_request_stages(backend_dir):
+    combinations = build_combinations(
+        [1.0],
+        [True, False],
+        [HoursWorked.EVERYONE],
+        [JobPriority.STANDARD],
+        [NonSourceJobs.STANDARD]
+    )
+    profiler = RunProfiler()
+    fetch = ScenarioFetcher(profiler=profiler)
+
+    plan = fetch.plan(combinations)
+
+    assert len(plan.groups) == 2
+    stages = profiler.report()["stages"]
+    assert "params" in stages and "excel" in stages
+    assert set(profiler.records) == {c.key for c in combinations}
+    summary = profiler.summary()
+    assert "  params" in summary and "  excel" in summary
@@ -0,0 +1,64 @@
+import pytest
+
+from generate_jsons import process_single_response
+from job_registry import DEFAULT_REGISTRY_PATH, JobRegistry, registry_path
+from requesting_api import BackendRequest, HoursWorked, JobPriority, NonSourceJobs
+from stub_server import OptimizeStub, start_server
+from sweep import build_combinations
+from sweep_cli import generate_model_data
+
+
+@pytest.fixture
+def stub_url():
+    server, url = start_server(OptimizeStub(latency=0))
+    yield url
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def combinations():
+    return build_combinations(
+        [1.0],
+        [True, False],
+        [HoursWorked.EVERYONE],
+        [JobPriority.STANDARD],
+        [NonSourceJobs.STANDARD]
+    )
+
+
+def test_registry_path_keeps_other_endpoints_out_of_the_committed_registry():
+    assert registry_path() == DEFAULT_REGISTRY_PATH
+    assert registry_path(BackendRequest.BASE_URL) == DEFAULT_REGISTRY_PATH
+    stub = registry_path("http://127.0.0.1:8000/optimize/")
+    assert stub != DEFAULT_REGISTRY_PATH
+    assert stub == registry_path("http://127.0.0.1:8000/optimize/")
+    assert stub != registry_path("http://127.0.0.1:8001/optimize/")
+
+
+def test_finished_run_saves_the_registry(backend_dir, tmp_path, stub_url, combinations):
+    registry = JobRegistry(tmp_path / "registry.json")
+
+    job_lookup, results = generate_model_data(
+        combinations,
+        process_single_response,
+        base_url=stub_url,
+        registry=registry
+    )
+
+    assert list(results) == [c.key for c in combinations]
+    saved = JobRegistry(registry.path)
+    saved.load()
+    assert saved.job_lookup == job_lookup
+
+
+def test_interrupted_run_does_not_save_the_registry(backend_dir, tmp_path, stub_url, combinations):
+    def interrupt(*args):
+        raise KeyboardInterrupt
+
+    registry = JobRegistry(tmp_path / "registry.json")
+    with pytest.raises(KeyboardInterrupt):
+        generate_model_data(combinations, interrupt, base_url=stub_url, registry=registry)
+
+    assert registry.names
+    assert not registry.path.exists()
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from run_profiler import timed
+
+logger = logging.getLogger(__name__)
+
+SheetName = Union[str, int]
+Columns = Dict[str, List[Any]]
+CacheKey = Tuple[str, SheetName, Optional[int]]
+FileStamp = Tuple[int, int]
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_PATH = Path(__file__).resolve().parent / "data" / "workbook-snapshot.json"
+
+# Every sheet BackendRequest reads, as (file, sheet, skiprows)
+SNAPSHOT_SHEETS: List[CacheKey] = [
+    ("data/Scenario - met overheidssturing.xlsx", "Labor Demand", None),
+    ("data/Scenario - met overheidssturing.xlsx", "Constraints", None),
+    ("data/Scenario - zonder overheidssturing.xlsx", "Labor Demand", None),
+    ("data/Scenario - zonder overheidssturing.xlsx", "Constraints", None),
+    ("data/Priority and non-source jobs (categories).xlsx", 0, 1),
+    ("data/Priority and non-source jobs (categories).xlsx", "Non-source jobs", 1),
+    ("data/Deeltijdfactor.xlsx", 0, None),
+]
+
+_cache: Dict[CacheKey, Tuple[FileStamp, Columns]] = {}
+_hashes: Dict[str, Tuple[FileStamp, str]] = {}
+_snapshot: Optional[Dict[str, Any]] = None
+_lock = threading.RLock()
+
+
+def _file_stamp(path: Path) -> FileStamp:
+    """Return the modification time and size used to detect file changes."""
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _file_hash(path: Path, stamp: FileStamp) -> str:
+    """Return the SHA-256 of a file, hashing it again only when it changed."""
+    entry = _hashes.get(str(path))
+    if entry is None or entry[0] != stamp:
+        entry = (stamp, hashlib.sha256(path.read_bytes()).hexdigest())
+        _hashes[str(path)] = entry
+    return entry[1]
+
+
+def _snapshot_name(path: Path) -> str:
+    """Return the name of a workbook inside the snapshot."""
+    return os.path.relpath(path, SNAPSHOT_PATH.parent)
+
+
+def _sheet_name(sheet_name: SheetName, skiprows: Optional[int]) -> str:
+    """Return the name of a sheet inside the snapshot."""
+    return json.dumps([sheet_name, skiprows])
+
+
+def _load_snapshot() -> Dict[str, Any]:
+    """Load the snapshot from disk, starting a new one if it is unusable."""
+    global _snapshot
+    if _snapshot is None:
+        try:
+            with open(SNAPSHOT_PATH, "r", encoding="utf-8") as f:
+                _snapshot = json.load(f)
+            if _snapshot.get("version") != SNAPSHOT_VERSION:
+                raise ValueError(f"unsupported version {_snapshot.get('version')}")
+        except FileNotFoundError:
+            _snapshot = {"version": SNAPSHOT_VERSION, "workbooks": {}}
+        except ValueError as e:
+            logger.warning(f"Ignoring workbook snapshot {SNAPSHOT_PATH}: {str(e)}")
+            _snapshot = {"version": SNAPSHOT_VERSION, "workbooks": {}}
+    return _snapshot
+
+
+def _save_snapshot() -> None:
+    """Write the snapshot to disk atomically."""
+    tmp_path = SNAPSHOT_PATH.with_name(SNAPSHOT_PATH.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(_load_snapshot(), f, ensure_ascii=False)
+    os.replace(tmp_path, SNAPSHOT_PATH)
+
+
+def _parse_sheet(
+    path: Path,
+    sheet_name: SheetName,
+    skiprows: Optional[int]
+) -> Columns:
+    """Parse a sheet with pandas into lists of values, with None for blanks."""
+    import pandas as pd
+
+    df = pd.read_excel(path, sheet_name=sheet_name, skiprows=skiprows)
+    return {
+        str(column): [None if pd.isna(v) else v for v in df[column].tolist()]
+        for column in df.columns
+    }
+
+
+def _snapshot_columns(
+    path: Path,
+    stamp: FileStamp,
+    sheet_name: SheetName,
+    skiprows: Optional[int]
+) -> Columns:
+    """Return a sheet from the snapshot, rebuilding it if the workbook changed."""
+    workbooks = _load_snapshot()["workbooks"]
+    name = _snapshot_name(path)
+    sheet = _sheet_name(sheet_name, skiprows)
+    digest = _file_hash(path, stamp)
+
+    workbook = workbooks.get(name)
+    if workbook is None or workbook["sha256"] != digest:
+        workbook = {"sha256": digest, "sheets": {}}
+        workbooks[name] = workbook
+
+    if sheet not in workbook["sheets"]:
+        logger.info(f"Compiling sheet {sheet_name!r} of {name} into snapshot")
+        workbook["sheets"][sheet] = _parse_sheet(path, sheet_name, skiprows)
+        _save_snapshot()
+
+    return workbook["sheets"][sheet]
+
+
+def read_columns(
+    file_path: Union[str, Path],
+    sheet_name: SheetName = 0,
+    skiprows: Optional[int] = None
+) -> Columns:
+    """
+    Read an Excel sheet as a mapping of column name to list of values.
+
+    Sheets are served from memory, then from the compiled snapshot, and are
+    only parsed from the workbook when its content hash no longer matches
+    the snapshot. Cached sheets are checked against the modification time
+    and size of the workbook on every call. Empty cells are returned as None.
+
+    Args:
+        file_path: Path to the Excel file
+        sheet_name: Name or index of the sheet to read
+        skiprows: Number of rows to skip at the start of the sheet
+
+    Returns:
+        Dictionary of column values, in sheet order
+    """
+    path = Path(file_path).resolve()
+    key = (str(path), sheet_name, skiprows)
+
+    # Holding the lock while loading keeps concurrent sweeps from parsing
+    # the same sheet twice
+    with timed("excel"), _lock:
+        stamp = _file_stamp(path)
+        entry = _cache.get(key)
+        if entry is None or entry[0] != stamp:
+            entry = (stamp, _snapshot_columns(path, stamp, sheet_name, skiprows))
+            _cache[key] = entry
+
+    return {column: list(values) for column, values in entry[1].items()}
+
+
+def clear_cache() -> None:
+    """Drop all sheets cached in memory."""
+    global _snapshot
+    with _lock:
+        _cache.clear()
+        _hashes.clear()
+        _snapshot = None
+
+
+def compile_snapshot() -> None:
+    """Compile every sheet BackendRequest reads into the snapshot."""
+    with _lock:
+        for file_path, sheet_name, skiprows in SNAPSHOT_SHEETS:
+            read_columns(file_path, sheet_name, skiprows)
+    logger.info(f"Workbook snapshot up to date at {SNAPSHOT_PATH}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(
+        description="Compile the Excel inputs into a snapshot for fast startup."
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild the snapshot from scratch"
+    )
+    args = parser.parse_args()
+    if args.force and SNAPSHOT_PATH.exists():
+        SNAPSHOT_PATH.unlink()
+    compile_snapshot()
@@ -117,16 +117,32 @@ export const MainContent = ({ settings }: MainContentProps) => {
   useEffect(() => {
     if (!isInitialized) return;
 
+    // Ignore results that arrive after the settings changed again
+    let cancelled = false;
     const loader = DataLoader.getInstance();
     const settingsKey = generateSettingsKey(settings);
-    const result = loader.getResultForSettings(settingsKey);
-    
-    if (result) {
-      const transformedResult = loader.transformResult(result);
-      setResultData(transformedResult);
-    } else {
-      setResultData(null);
-    }
+
+    const loadResult = async () => {
+      try {
+        const result = await loader.loadResultForSettings(settingsKey);
+        if (cancelled) return;
+
+        if (result) {
+          const transformedResult = loader.transformResult(result);
+          setResultData(transformedResult);
+        } else {
+          setResultData(null);
+        }
+      } catch (error) {
+        console.error('Failed to load scenario:', error);
+        if (!cancelled) setResultData(null);
+      }
+    };
+
+    loadResult();
+    return () => {
+      cancelled = true;
+    };
   }, [settings, isInitialized]);
 
   const charts = [
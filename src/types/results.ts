@@ -31,10 +31,24 @@ export interface WorkforceMetrics {
   vacancies: number;
 }
 
+// Largest transitions of every job as an offsets table indexed by job id:
+// the transitions of job i are entries offsets[i] up to offsets[i + 1]
+export interface JobTransitionTable {
+  offsets: number[];
+  jobId: number[];  // Target of outbound, source of inbound transitions
+  amount: number[];
+}
+
+export interface JobTransitions {
+  outbound: JobTransitionTable;
+  inbound: JobTransitionTable;
+}
+
 export interface ModelResult {
   remainingShortages: JobShortage[];
   topTransitions: JobTransition[];
   workforceChanges: { [jobId: number]: WorkforceMetrics };
+  jobTransitions?: JobTransitions;  // Absent when generated without them
   addedValueChangePercent: number;
 }
 
@@ -49,6 +63,26 @@ export interface TransformedResult {
   addedValueChangePercent: number;
 }
 
+// Columnar encoding of a ModelResult (model results format version 2)
+export interface ColumnarModelResult {
+  remainingShortages: { jobId: number[]; shortage: number[] };
+  topTransitions: { sourceJobId: number[]; targetJobId: number[]; amount: number[] };
+  workforceChanges: (number | null)[][];  // One array per metric, indexed by job id
+  jobTransitions?: JobTransitions;
+  addedValueChangePercent: number;
+}
+
+// Columnar scenario stored as the difference from another scenario
+export interface ColumnarDelta {
+  base: SettingsKey;
+  remainingShortages?: ColumnarModelResult['remainingShortages'];
+  topTransitions?: ColumnarModelResult['topTransitions'];
+  // Changed entries as [jobIds, values] by metric index, or all arrays in full
+  workforceChanges?: { [metric: string]: [number[], (number | null)[]] } | (number | null)[][];
+  jobTransitions?: JobTransitions;
+  addedValueChangePercent?: number;
+}
+
 // Create a type for our settings key
 export type SettingsKey = string; // e.g. "1.0-with-everyone-standard-standard"
 
@@ -57,6 +91,38 @@ export interface ModelResults {
   [key: SettingsKey]: ModelResult;
 }
 
+// Versioned container for columnar results
+export interface ColumnarModelResults {
+  version: 2;
+  metrics: (keyof WorkforceMetrics)[];  // Order of the workforceChanges arrays
+  scenarios: { [key: SettingsKey]: ColumnarModelResult | ColumnarDelta };
+}
+
+// Index of the scenario shard files
+export interface ResultsManifest {
+  version: 2;
+  defaultScenario: SettingsKey | null;  // Scenario stored in a shard of its own
+  jobNames: string;  // Paths are relative to the manifest
+  shards: string[];
+  scenarios: { [key: SettingsKey]: number };  // Index into shards
+}
+
+// Bars of one waterfall chart: one array per step, indexed by job ID
+export interface WaterfallSeries {
+  value: (number | null)[][];
+  base: (number | null)[][];
+}
+
+// Chart-ready series of a scenario, as drawn by the waterfall and shortage charts
+export interface ChartSeries {
+  version: 1;
+  steps: { supply: string[]; demand: string[]; gap: string[] };  // Order of the step arrays
+  waterfall: { supply: WaterfallSeries; demand: WaterfallSeries; gap: WaterfallSeries };
+  max: (number | null)[];  // Highest bar top per job ID
+  min: (number | null)[];  // Lowest bar bottom per job ID, as calculateWaterfallMinimum
+  shortageBars: { jobId: number[]; label: string[]; shortage: number[] };  // Largest first
+}
+
 // Job name lookup table
 export interface JobNameLookup {
   [key: number]: string;
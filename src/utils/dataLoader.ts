@@ -1,10 +1,26 @@
-import type { ModelResults, JobNameLookup, ModelResult, TransformedResult } from '../types/results';
+import type {
+  ModelResults,
+  JobNameLookup,
+  ModelResult,
+  TransformedResult,
+  ColumnarModelResult,
+  ColumnarDelta,
+  ColumnarModelResults,
+  ResultsManifest,
+  SettingsKey,
+  WorkforceMetrics
+} from '../types/results';
 import { inflate } from 'pako';
 
 export class DataLoader {
   private static instance: DataLoader;
   private jobNameLookup: JobNameLookup = {};
   private results: ModelResults = {};
+  private encoded: { [key: SettingsKey]: ColumnarModelResult | ColumnarDelta } = {};
+  private metrics: (keyof WorkforceMetrics)[] = [];
+  private manifest: ResultsManifest | null = null;
+  private manifestRequest: Promise<ResultsManifest | null> | null = null;
+  private shardRequests = new Map<number, Promise<void>>();
   private initialized = false;
 
   private constructor() {}
@@ -21,10 +37,10 @@ export class DataLoader {
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`);
     }
-    
+
     const arrayBuffer = await response.arrayBuffer();
     const uint8Array = new Uint8Array(arrayBuffer);
-    
+
     try {
       // Attempt to decompress as gzip
       const decompressed = inflate(uint8Array, { to: 'string' });
@@ -37,34 +53,159 @@ export class DataLoader {
     }
   }
 
+  private async fetchData(path: string, warn = true): Promise<any> {
+    const basePath = import.meta.env.BASE_URL;
+
+    // Try the gzipped file first
+    try {
+      return await this.fetchAndDecompress(`${basePath}data/${path}.gz`);
+    } catch (error) {
+      if (warn) {
+        console.warn(`Gzipped ${path} not available or failed to decompress, falling back to uncompressed`, error);
+      }
+    }
+    return this.fetchAndDecompress(`${basePath}data/${path}`);
+  }
+
+  private setResults(results: ModelResults | ColumnarModelResults) {
+    // Columnar results are decoded per scenario on first use
+    if (typeof results.version === 'number') {
+      if (results.version !== 2) {
+        throw new Error(`Unsupported model results version ${results.version}`);
+      }
+      const columnar = results as ColumnarModelResults;
+      Object.assign(this.encoded, columnar.scenarios);
+      this.metrics = columnar.metrics;
+    } else {
+      Object.assign(this.results, results as ModelResults);
+    }
+  }
+
+  private decodeResult(encoded: ColumnarModelResult, metrics: (keyof WorkforceMetrics)[]): ModelResult {
+    const { remainingShortages, topTransitions, workforceChanges } = encoded;
+    const decodedChanges: { [jobId: number]: WorkforceMetrics } = {};
+
+    workforceChanges[0].forEach((value, jobId) => {
+      if (value === null) return;
+      const jobMetrics = {} as WorkforceMetrics;
+      metrics.forEach((metric, index) => {
+        jobMetrics[metric] = workforceChanges[index][jobId] as number;
+      });
+      decodedChanges[jobId] = jobMetrics;
+    });
+
+    return {
+      remainingShortages: remainingShortages.jobId.map((jobId, i) => ({
+        jobId,
+        shortage: remainingShortages.shortage[i]
+      })),
+      topTransitions: topTransitions.sourceJobId.map((sourceJobId, i) => ({
+        sourceJobId,
+        targetJobId: topTransitions.targetJobId[i],
+        amount: topTransitions.amount[i]
+      })),
+      workforceChanges: decodedChanges,
+      jobTransitions: encoded.jobTransitions,
+      addedValueChangePercent: encoded.addedValueChangePercent
+    };
+  }
+
+  private applyDelta(base: ColumnarModelResult, delta: ColumnarDelta): ColumnarModelResult {
+    const changes = delta.workforceChanges;
+    let workforceChanges = base.workforceChanges;
+    if (Array.isArray(changes)) {
+      workforceChanges = changes;
+    } else if (changes) {
+      workforceChanges = base.workforceChanges.map(column => column.slice());
+      Object.entries(changes).forEach(([metric, [jobIds, values]]) => {
+        const column = workforceChanges[Number(metric)];
+        jobIds.forEach((jobId, i) => {
+          column[jobId] = values[i];
+        });
+      });
+    }
+    return {
+      remainingShortages: delta.remainingShortages ?? base.remainingShortages,
+      topTransitions: delta.topTransitions ?? base.topTransitions,
+      workforceChanges,
+      jobTransitions: delta.jobTransitions ?? base.jobTransitions,
+      addedValueChangePercent: delta.addedValueChangePercent ?? base.addedValueChangePercent
+    };
+  }
+
+  private resolveColumnar(settingsKey: SettingsKey): ColumnarModelResult {
+    // Deltas are resolved against their base, which may be a delta itself
+    const encoded = this.encoded[settingsKey];
+    if (!('base' in encoded)) return encoded;
+    const resolved = this.applyDelta(this.resolveColumnar(encoded.base), encoded);
+    this.encoded[settingsKey] = resolved;
+    return resolved;
+  }
+
+  private missingBase(settingsKey: SettingsKey): SettingsKey | null {
+    // First scenario in the base chain that has not been loaded yet
+    let key = settingsKey;
+    while (this.encoded[key]) {
+      const encoded = this.encoded[key];
+      if (!('base' in encoded)) return null;
+      key = encoded.base;
+    }
+    return key;
+  }
+
+  private fetchManifest(): Promise<ResultsManifest | null> {
+    // Fetched once, so a missing manifest is only requested and reported once
+    if (!this.manifestRequest) {
+      this.manifestRequest = this.fetchData('model-results-manifest.json', false)
+        .then(manifest => manifest.version === 2 ? manifest : null)
+        .catch(error => {
+          console.warn('Scenario manifest not available, falling back to the full results file', error);
+          return null;
+        });
+    }
+    return this.manifestRequest;
+  }
+
+  private loadShard(index: number): Promise<void> {
+    let request = this.shardRequests.get(index);
+    if (!request) {
+      request = this.fetchData(this.manifest!.shards[index]).then(shard => this.setResults(shard));
+      // Allow a failed shard to be requested again
+      request.catch(() => this.shardRequests.delete(index));
+      this.shardRequests.set(index, request);
+    }
+    return request;
+  }
+
   async initialize() {
     if (this.initialized) return;
 
     try {
-      const basePath = import.meta.env.BASE_URL;
-      
-      // Try gzipped files first
-      try {
-        const [results, lookup] = await Promise.all([
-          this.fetchAndDecompress(`${basePath}data/model-results.json.gz`),
-          this.fetchAndDecompress(`${basePath}data/job-names.json.gz`)
+      // With a manifest only the job names and the default scenario are
+      // loaded up front; other shards are fetched on demand
+      const manifest = await this.fetchManifest();
+      if (manifest) {
+        this.manifest = manifest;
+        const defaultShard = manifest.defaultScenario !== null
+          ? manifest.scenarios[manifest.defaultScenario]
+          : undefined;
+
+        const [lookup] = await Promise.all([
+          this.fetchData(manifest.jobNames),
+          defaultShard !== undefined ? this.loadShard(defaultShard) : Promise.resolve()
         ]);
 
-        this.results = results;
         this.jobNameLookup = lookup;
         this.initialized = true;
         return;
-      } catch (error) {
-        console.warn('Gzipped files not available or failed to decompress, falling back to uncompressed', error);
       }
 
-      // Fallback to uncompressed files
       const [results, lookup] = await Promise.all([
-        this.fetchAndDecompress(`${basePath}data/model-results.json`),
-        this.fetchAndDecompress(`${basePath}data/job-names.json`)
+        this.fetchData('model-results.json'),
+        this.fetchData('job-names.json')
       ]);
 
-      this.results = results;
+      this.setResults(results);
       this.jobNameLookup = lookup;
       this.initialized = true;
     } catch (error) {
@@ -77,9 +218,33 @@ export class DataLoader {
     if (!this.initialized) {
       throw new Error('DataLoader not initialized');
     }
+    if (!this.results[settingsKey] && this.encoded[settingsKey]) {
+      if (this.missingBase(settingsKey) !== null) return null;
+      // Encoded scenarios are kept, as other scenarios may be deltas against them
+      this.results[settingsKey] = this.decodeResult(this.resolveColumnar(settingsKey), this.metrics);
+    }
     return this.results[settingsKey] || null;
   }
 
+  async loadResultForSettings(settingsKey: string): Promise<ModelResult | null> {
+    if (!this.initialized) {
+      throw new Error('DataLoader not initialized');
+    }
+    if (this.manifest && !this.results[settingsKey]) {
+      // Load the shards holding the scenario and the bases it is encoded against
+      let missing = this.missingBase(settingsKey);
+      while (missing !== null) {
+        const shard = this.manifest.scenarios[missing];
+        if (shard === undefined) break;
+        await this.loadShard(shard);
+        const next = this.missingBase(settingsKey);
+        if (next === missing) break;
+        missing = next;
+      }
+    }
+    return this.getResultForSettings(settingsKey);
+  }
+
   transformResult(result: ModelResult): TransformedResult {
     return {
       remainingShortages: result.remainingShortages.map(shortage => ({
@@ -91,14 +256,13 @@ export class DataLoader {
         targetJob: this.jobNameLookup[transition.targetJobId],
         amount: transition.amount
       })),
-      workforceChanges: Object.entries(result.workforceChanges).reduce(
-        (acc, [jobId, metrics]) => ({
-          ...acc,
-          [this.jobNameLookup[Number(jobId)]]: metrics
-        }),
-        {}
+      // Built in one pass; spreading the accumulator is quadratic in the number of jobs
+      workforceChanges: Object.fromEntries(
+        Object.entries(result.workforceChanges).map(
+          ([jobId, metrics]) => [this.jobNameLookup[Number(jobId)], metrics]
+        )
       ),
       addedValueChangePercent: result.addedValueChangePercent
     };
   }
-}
\ No newline at end of file
+}